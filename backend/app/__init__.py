@@ -0,0 +1,4 @@
+from .startup import startup_report
+
+# Before any other app module, so their imports are timed too
+startup_report.install()
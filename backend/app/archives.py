@@ -0,0 +1,111 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import IO, Callable, Iterator, List, Optional, Tuple
+
+from .extraction import SUPPORTED_EXTENSIONS, file_extension
+from .fingerprints import content_hasher
+
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "10000"))
+BULK_MAX_EXPANDED_MB = int(os.getenv("BULK_MAX_EXPANDED_MB", "4096"))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+COPY_BLOCK = 1024 * 1024
+
+
+class ArchiveMember:
+    """A file to ingest: either a plain upload or a member copied out of an archive"""
+
+    def __init__(self, filename: str, path: Optional[str] = None, size: int = 0, error: Optional[str] = None,
+                 content_hash: Optional[str] = None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.error = error
+        self.content_hash = content_hash
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _iter_zip(path: str) -> Iterator[Tuple[str, int, Callable[[], IO[bytes]]]]:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.open(info)
+
+
+def _iter_tar(path: str) -> Iterator[Tuple[str, int, Callable[[], IO[bytes]]]]:
+    # Iterating the TarFile reads headers as it goes, so compressed archives
+    # are streamed from disk rather than indexed up front
+    with tarfile.open(path, "r:*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member)
+
+
+def _copy_member(open_member: Callable[[], IO[bytes]], dest: str, limit: int) -> Tuple[int, str]:
+    """Copy and hash at most ``limit`` bytes; the declared size in the header is not trusted"""
+    copied = 0
+    digest = content_hasher()
+    with open_member() as source, open(dest, "wb") as target:
+        while True:
+            block = source.read(COPY_BLOCK)
+            if not block:
+                return copied, digest.hexdigest()
+            copied += len(block)
+            if copied > limit:
+                raise ValueError("member exceeds the size limit")
+            digest.update(block)
+            target.write(block)
+
+
+def expand_archive(path: str, filename: str, workdir: str, max_member_bytes: int,
+                   max_files: int = BULK_MAX_FILES,
+                   max_expanded_bytes: int = BULK_MAX_EXPANDED_MB * 1024 * 1024) -> List[ArchiveMember]:
+    """Copy the supported members of a zip or tar archive into ``workdir``
+
+    Members are written under generated names, so paths inside the archive
+    never reach the filesystem. Unsupported or oversized members are
+    returned with an ``error`` instead of failing the whole archive.
+    """
+    members: List[ArchiveMember] = []
+    expanded = 0
+    iterate = _iter_zip if filename.lower().endswith(".zip") else _iter_tar
+    try:
+        for name, declared_size, open_member in iterate(path):
+            extension = file_extension(name)
+            if extension not in SUPPORTED_EXTENSIONS:
+                members.append(ArchiveMember(name, error=f"Unsupported file type: {extension}"))
+                continue
+            if len(members) >= max_files:
+                raise ValueError(f"archive has more than {max_files} files")
+            if declared_size > max_member_bytes:
+                members.append(ArchiveMember(name, error="File size exceeds the per-file limit"))
+                continue
+            remaining = max_expanded_bytes - expanded
+            fd, dest = tempfile.mkstemp(prefix="member-", suffix=f".{extension}", dir=workdir)
+            os.close(fd)
+            try:
+                size, content_hash = _copy_member(open_member, dest, min(max_member_bytes, remaining))
+            except ValueError:
+                os.unlink(dest)
+                if remaining < max_member_bytes:
+                    raise ValueError(f"archive expands beyond {max_expanded_bytes // (1024 * 1024)}MB")
+                members.append(ArchiveMember(name, error="File size exceeds the per-file limit"))
+                continue
+            expanded += size
+            members.append(ArchiveMember(name, dest, size, content_hash=content_hash))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        members.append(ArchiveMember(filename, error=f"Invalid archive: {str(e)}"))
+    except ValueError as e:
+        members.append(ArchiveMember(filename, error=f"Archive rejected: {str(e)}"))
+    return members
+
+
+def remove_workdir(workdir: str):
+    shutil.rmtree(workdir, ignore_errors=True)
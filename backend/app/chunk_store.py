@@ -0,0 +1,283 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from .lexical_index import file_lock, write_json
+
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "data/chunks")
+CHUNK_STORE_COMPRESSION = int(os.getenv("CHUNK_STORE_COMPRESSION", "6"))
+# Dead bytes are only reclaimed once they outnumber live bytes and this
+CHUNK_STORE_COMPACT_MIN_BYTES = int(os.getenv("CHUNK_STORE_COMPACT_MIN_MB", "16")) * 1024 * 1024
+
+# point id, document id, offset, compressed length, raw length or a delete marker
+RECORD = struct.Struct("<16s16sQIi")
+DELETE_POINT = -1
+DELETE_DOCUMENT = -2
+
+
+def id_bytes(value: Any) -> bytes:
+    """Point and document ids are UUIDs; they are stored as their 16 raw bytes"""
+    return uuid.UUID(str(value)).bytes
+
+
+class ChunkStore:
+    """Chunk texts of one index, kept next to the vector store instead of in it
+
+    ``chunks.<gen>.dat`` holds each text zlib-compressed, back to back;
+    ``chunks.<gen>.idx`` is an append-only log of fixed-size records that
+    place a point's text in the data file or delete a point or a whole
+    document. Texts are written before their index records, so a torn write
+    leaves at most unreferenced bytes, and a torn last record is dropped on
+    open. Once dead bytes outnumber live ones, both files are rewritten
+    under the next generation and ``manifest.json`` is switched to it.
+
+    Several processes may share the directory. Writes are made under a file
+    lock, and every process catches up with records the others appended,
+    or with a new generation, before it reads.
+    """
+
+    def __init__(self, directory: str, compression: int = CHUNK_STORE_COMPRESSION,
+                 compact_min_bytes: int = CHUNK_STORE_COMPACT_MIN_BYTES):
+        self.directory = directory
+        self.compression = compression
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            self._load()
+            self._remove_stale()
+
+    def _file_lock(self):
+        return file_lock(os.path.join(self.directory, "lock"))
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def _path(self, extension: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"chunks.{generation}.{extension}")
+
+    def _manifest_generation(self) -> int:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)["generation"]
+        except FileNotFoundError:
+            return 0
+
+    def _load(self):
+        self.generation = self._manifest_generation()
+
+        # point -> (offset, length, raw length, document)
+        self.entries: Dict[bytes, Tuple[int, int, int, bytes]] = {}
+        self.documents: Dict[bytes, Set[bytes]] = {}
+        self.live_bytes = 0
+        self.raw_bytes = 0
+        self.dead_bytes = 0
+        self._data = open(self._path("dat"), "a+b")
+        self._index = open(self._path("idx"), "a+b")
+        self._index_inode = os.fstat(self._index.fileno()).st_ino
+        # Bytes of the index log applied so far
+        self._position = 0
+        self._read_log()
+
+    def _read_log(self):
+        """Apply the whole records appended to the index log since it was last read"""
+        size = os.fstat(self._index.fileno()).st_size
+        valid = size - (size - self._position) % RECORD.size
+        if valid > self._position:
+            data = os.pread(self._index.fileno(), valid - self._position, self._position)
+            for record in RECORD.iter_unpack(data):
+                self._apply(*record)
+            self._position = valid
+
+    def _remove_stale(self):
+        """Drop files of other generations and a torn last record; call with the file lock held"""
+        current = {os.path.basename(self._path("dat")), os.path.basename(self._path("idx"))}
+        for name in os.listdir(self.directory):
+            if name not in ("manifest.json", "lock") and name not in current:
+                os.unlink(os.path.join(self.directory, name))
+        if os.fstat(self._index.fileno()).st_size != self._position:
+            os.truncate(self._path("idx"), self._position)
+
+    def _catch_up(self):
+        """Take up what other processes wrote; call with the store lock held"""
+        try:
+            current = os.stat(self._path("idx")).st_ino == self._index_inode
+        except FileNotFoundError:
+            # Compacted into a new generation, or dropped, by another process
+            current = False
+        if current:
+            self._read_log()
+            return
+        # The generation read may be retired before its files are opened, in
+        # which case they are created empty; read the manifest again then
+        for _ in range(3):
+            if not os.path.isdir(self.directory):
+                return
+            self.close()
+            self._load()
+            if self._manifest_generation() == self.generation:
+                return
+
+    def _apply(self, point: bytes, document: bytes, offset: int, length: int, raw: int):
+        if raw == DELETE_DOCUMENT:
+            for member in self.documents.pop(document, set()):
+                self._forget(member)
+            return
+        self._forget(point)
+        if raw == DELETE_POINT:
+            return
+        self.entries[point] = (offset, length, raw, document)
+        self.documents.setdefault(document, set()).add(point)
+        self.live_bytes += length
+        self.raw_bytes += raw
+
+    def _forget(self, point: bytes):
+        entry = self.entries.pop(point, None)
+        if entry is None:
+            return
+        offset, length, raw, document = entry
+        self.live_bytes -= length
+        self.raw_bytes -= raw
+        self.dead_bytes += length
+        members = self.documents.get(document)
+        if members is not None:
+            members.discard(point)
+            if not members:
+                del self.documents[document]
+
+    def _append(self, records: List[Tuple[bytes, bytes, int, int, int]]):
+        data = b"".join(RECORD.pack(*record) for record in records)
+        self._index.write(data)
+        self._index.flush()
+        self._position += len(data)
+        for record in records:
+            self._apply(*record)
+
+    def put_many(self, chunks: Iterable[Tuple[str, str, str]]):
+        """Store ``(point_id, document_id, text)`` triples, replacing earlier texts of the same points"""
+        compressed = []
+        for point_id, document_id, text in chunks:
+            raw = text.encode()
+            compressed.append((id_bytes(point_id), id_bytes(document_id), zlib.compress(raw, self.compression),
+                               len(raw)))
+        if not compressed:
+            return
+        with self._file_lock(), self._lock:
+            self._catch_up()
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            records = []
+            for point, document, blob, raw in compressed:
+                records.append((point, document, offset, len(blob), raw))
+                offset += len(blob)
+            self._data.write(b"".join(blob for _, _, blob, _ in compressed))
+            self._data.flush()
+            self._append(records)
+
+    def get_many(self, point_ids: Iterable[Any]) -> Dict[str, str]:
+        """Texts of the given points, read in file order; unknown points are left out"""
+        wanted = []
+        for point_id in point_ids:
+            try:
+                wanted.append((str(point_id), id_bytes(point_id)))
+            except ValueError:
+                continue
+        texts = {}
+        with self._lock:
+            self._catch_up()
+            located = [(self.entries[point], point_id) for point_id, point in wanted if point in self.entries]
+            located.sort()
+            fd = self._data.fileno()
+            for (offset, length, _, _), point_id in located:
+                texts[point_id] = zlib.decompress(os.pread(fd, length, offset)).decode()
+        return texts
+
+    def delete_points(self, point_ids: Iterable[Any]):
+        with self._file_lock(), self._lock:
+            self._catch_up()
+            records = [(point, bytes(16), 0, 0, DELETE_POINT)
+                       for point in map(id_bytes, point_ids) if point in self.entries]
+            if records:
+                self._append(records)
+                self._maybe_compact()
+
+    def delete_documents(self, document_ids: Iterable[Any]):
+        with self._file_lock(), self._lock:
+            self._catch_up()
+            records = [(bytes(16), document, 0, 0, DELETE_DOCUMENT)
+                       for document in map(id_bytes, document_ids) if document in self.documents]
+            if records:
+                self._append(records)
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.dead_bytes <= max(self.live_bytes, self.compact_min_bytes):
+            return
+        generation = self.generation + 1
+        fd = self._data.fileno()
+        offset = 0
+        with open(self._path("dat", generation), "wb") as data, open(self._path("idx", generation), "wb") as index:
+            for point, (old_offset, length, raw, document) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+                data.write(os.pread(fd, length, old_offset))
+                index.write(RECORD.pack(point, document, offset, length, raw))
+                offset += length
+        write_json(self.manifest_path, {"generation": generation})
+        self.close()
+        self._load()
+        self._remove_stale()
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._catch_up()
+            return {
+                "chunks": len(self.entries),
+                "documents": len(self.documents),
+                "stored_bytes": self.live_bytes,
+                "text_bytes": self.raw_bytes,
+                "dead_bytes": self.dead_bytes,
+                "compression_ratio": round(self.raw_bytes / self.live_bytes, 2) if self.live_bytes else None,
+                "generation": self.generation,
+            }
+
+
+class ChunkStores:
+    """One ChunkStore per collection under ``root``, opened on first use"""
+
+    def __init__(self, root: str = CHUNK_STORE_PATH):
+        self.root = root
+        self._stores: Dict[str, ChunkStore] = {}
+        self._lock = threading.Lock()
+
+    def directory(self, index_name: str) -> str:
+        return os.path.join(self.root, quote(index_name, safe=""))
+
+    def get(self, index_name: str) -> ChunkStore:
+        with self._lock:
+            store = self._stores.get(index_name)
+            if store is None:
+                store = self._stores[index_name] = ChunkStore(self.directory(index_name))
+            return store
+
+    def drop(self, index_name: str):
+        with self._lock:
+            store = self._stores.pop(index_name, None)
+            if store is not None:
+                store.close()
+            shutil.rmtree(self.directory(index_name), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stores = dict(self._stores)
+        return {"path": self.root, "indexes": {name: store.stats() for name, store in stores.items()}}
@@ -0,0 +1,196 @@
+import re
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .embeddings import estimate_tokens
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+SENTENCE_BOUNDARY = re.compile(r"[.!?]\s+")
+
+CHUNK_SIZE_UNITS = ("characters", "tokens")
+
+
+def get_length_function(unit: str = "characters") -> Callable[[str], int]:
+    if unit == "characters":
+        return len
+    if unit == "tokens":
+        return estimate_tokens
+    raise ValueError(f"Unsupported chunk size unit: {unit}")
+
+
+def validate_chunking(chunk_size: int, chunk_overlap: int, unit: str = "characters"):
+    """Reject settings that cannot make progress"""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+    if unit not in CHUNK_SIZE_UNITS:
+        raise ValueError(f"Unsupported chunk size unit: {unit}")
+
+
+def iter_split(text: str, separator: str) -> Iterator[str]:
+    """Lazily split on ``separator``, keeping it attached to the end of each part"""
+    start = 0
+    step = len(separator)
+    while True:
+        end = text.find(separator, start)
+        if end < 0:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end + step]
+        start = end + step
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """Lazily split after sentence-ending punctuation, keeping trailing whitespace"""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def split_fixed(text: str, chunk_size: int, length: Callable[[str], int] = len) -> Iterator[str]:
+    """Yield consecutive windows no longer than ``chunk_size`` as measured by ``length``
+
+    Each window starts at ``chunk_size`` characters and, when it measures
+    longer (CJK or emoji text in tokens), is narrowed by binary search. A
+    single character that alone is too long still becomes a window, so the
+    split always progresses.
+    """
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if length(text[start:end]) > chunk_size:
+            fit, low, high = start + 1, start + 1, end - 1
+            while low <= high:
+                middle = (low + high) // 2
+                if length(text[start:middle]) <= chunk_size:
+                    fit, low = middle, middle + 1
+                else:
+                    high = middle - 1
+            end = fit
+        yield text[start:end]
+        start = end
+
+
+def split_recursive(text: str, chunk_size: int, separators: Sequence[str] = DEFAULT_SEPARATORS,
+                    length: Callable[[str], int] = len) -> Iterator[str]:
+    """Yield pieces no longer than ``chunk_size``, preferring the coarsest separator
+
+    Oversized pieces are split again with the next separator; the final empty
+    separator falls back to fixed windows. Each level scans its text once, so
+    the total work is linear in the input.
+    """
+    if length(text) <= chunk_size:
+        if text:
+            yield text
+        return
+    for i, separator in enumerate(separators):
+        if separator == "":
+            yield from split_fixed(text, chunk_size, length)
+            return
+        if separator in text:
+            for part in iter_split(text, separator):
+                if length(part) <= chunk_size:
+                    yield part
+                else:
+                    yield from split_recursive(part, chunk_size, separators[i + 1:], length)
+            return
+
+
+class ChunkStream:
+    """Incremental chunker: feed text segments as they arrive, then close
+
+    Pieces from every segment are packed into chunks of at most
+    ``chunk_size`` with ``chunk_overlap`` carried forward. The window is a
+    deque with a running length, so every piece is appended and dropped
+    exactly once and chunks can span segment boundaries.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, method: str = "recursive",
+                 unit: str = "characters", separators: Optional[Sequence[str]] = None):
+        validate_chunking(chunk_size, chunk_overlap, unit)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.method = method
+        self.length = get_length_function(unit)
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self._window: deque = deque()
+        self._lengths: deque = deque()
+        self._total = 0
+
+    def _pieces(self, segment: str) -> Iterator[str]:
+        if self.method == "recursive":
+            yield from split_recursive(segment, self.chunk_size, self.separators, self.length)
+        else:
+            for sentence in iter_sentences(segment):
+                yield from split_recursive(sentence, self.chunk_size, self.separators[3:], self.length)
+
+    def feed(self, segment: str) -> Iterator[str]:
+        """Yield the chunks completed by this segment"""
+        window, lengths = self._window, self._lengths
+        for piece in self._pieces(segment):
+            size = self.length(piece)
+            if window and self._total + size > self.chunk_size:
+                chunk = "".join(window).strip()
+                if chunk:
+                    yield chunk
+                while window and (self._total > self.chunk_overlap or self._total + size > self.chunk_size):
+                    self._total -= lengths.popleft()
+                    window.popleft()
+            window.append(piece)
+            lengths.append(size)
+            self._total += size
+
+    def close(self) -> Iterator[str]:
+        """Yield the final partial chunk"""
+        if self._window:
+            chunk = "".join(self._window).strip()
+            self._window.clear()
+            self._lengths.clear()
+            self._total = 0
+            if chunk:
+                yield chunk
+
+
+def iter_chunks(segments: Union[str, Iterable[str]], chunk_size: int, chunk_overlap: int,
+                method: str = "recursive", unit: str = "characters",
+                separators: Optional[Sequence[str]] = None) -> Iterator[str]:
+    """Stream chunks from text or from an iterable of text segments such as pages
+
+    ``recursive`` splits on paragraphs, lines, sentences and words in that
+    order; any other method packs whole sentences. Sizes are measured in
+    characters or tokens.
+    """
+    stream = ChunkStream(chunk_size, chunk_overlap, method, unit, separators)
+    if isinstance(segments, str):
+        segments = [segments]
+
+    def generate() -> Iterator[str]:
+        for segment in segments:
+            yield from stream.feed(segment)
+        yield from stream.close()
+
+    return generate()
+
+
+async def aiter_chunk_windows(segments: AsyncIterator[str], stream: ChunkStream,
+                              window_size: int) -> AsyncIterator[List[str]]:
+    """Group chunks from asynchronously produced segments into windows"""
+    pending: List[str] = []
+    async for segment in segments:
+        for chunk in stream.feed(segment):
+            pending.append(chunk)
+            if len(pending) >= window_size:
+                yield pending
+                pending = []
+    for chunk in stream.close():
+        pending.append(chunk)
+        if len(pending) >= window_size:
+            yield pending
+            pending = []
+    if pending:
+        yield pending
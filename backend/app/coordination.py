@@ -0,0 +1,232 @@
+"""Coordination between the worker processes and replicas sharing one metadata database
+
+Lets ``uvicorn --workers N`` and several backend replicas serve the same
+indexes:
+
+- a write to an index bumps its version in the database, and every other
+  process drops its cached state of that index within
+  ``COORDINATION_POLL_SECONDS``
+- locks are leases in the database, renewed while they are held, so a
+  crashed holder frees them after ``COORDINATION_LOCK_TTL_SECONDS``
+- ingestion job snapshots are stored, so any process can report a job and
+  pass a cancel request on to the process running it
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .jobs import FINISHED_STATUSES, Job, JobManager
+from .metadata_store import MetadataStore
+
+COORDINATION_ENABLED = os.getenv("COORDINATION_ENABLED", "1").lower() not in ("0", "false", "no")
+COORDINATION_POLL_SECONDS = float(os.getenv("COORDINATION_POLL_SECONDS", "1"))
+COORDINATION_LOCK_TTL_SECONDS = float(os.getenv("COORDINATION_LOCK_TTL_SECONDS", "30"))
+COORDINATION_JOB_RETENTION_SECONDS = float(os.getenv("COORDINATION_JOB_RETENTION_SECONDS", "86400"))
+
+# Longest wait between attempts to take a lease another process holds
+MAX_LOCK_BACKOFF = 1.0
+# Polls between sweeps of old finished jobs
+JOB_PRUNE_POLLS = 600
+
+INVALIDATIONS = metrics.counter("coordination_invalidations_total",
+                                "Index changes published by this process or received from others", ("source",))
+LOCK_WAIT_SECONDS = metrics.histogram("coordination_lock_wait_seconds", "Time spent waiting for a lease")
+
+
+class Coordinator:
+    """Publishes index changes, hands out leases and shares job state through the metadata database
+
+    Listeners registered with ``on_change`` are called with the name of
+    every index another process changed. With ``enabled`` false, locks are
+    only held within this process and nothing is written to the database.
+    """
+
+    def __init__(self, metadata: MetadataStore, jobs: JobManager, enabled: bool = COORDINATION_ENABLED,
+                 poll_seconds: float = COORDINATION_POLL_SECONDS, lock_ttl: float = COORDINATION_LOCK_TTL_SECONDS,
+                 job_retention: float = COORDINATION_JOB_RETENTION_SECONDS):
+        self.metadata = metadata
+        self.jobs = jobs
+        self.enabled = enabled
+        self.poll_seconds = poll_seconds
+        self.lock_ttl = lock_ttl
+        self.job_retention = job_retention
+        self.process_id = uuid.uuid4().hex
+        self.versions: Optional[Dict[str, int]] = None
+        self._listeners: List[Callable[[str], None]] = []
+        self._local_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Lease name -> owner token, for the leases held by this process
+        self._held: Dict[str, str] = {}
+        # Job id -> the last snapshot written, so unchanged finished jobs are not rewritten
+        self._saved: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.polls = 0
+        self.poll_errors = 0
+        self.published = 0
+        self.received = 0
+
+    def on_change(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+    def start(self):
+        """Start polling on the running event loop"""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling, store the final state of this process's jobs and release its leases"""
+        task, self._task = self._task, None
+        self._loop = None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        try:
+            await self.sync_jobs()
+            for name, owner in list(self._held.items()):
+                await self.metadata.execute("release_lock", name, owner)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll()
+                if self._held:
+                    await self.metadata.execute("renew_locks", list(self._held.items()), time.time() + self.lock_ttl)
+                await self.sync_jobs()
+                if self.polls % JOB_PRUNE_POLLS == 0:
+                    await self.metadata.execute("prune_jobs", FINISHED_STATUSES, time.time() - self.job_retention)
+            except Exception:
+                # The database may be briefly unreachable; try again next round
+                self.poll_errors += 1
+
+    async def publish(self, index_name: str):
+        """Tell the other processes that ``index_name`` changed; call after the change is written"""
+        if not self.enabled:
+            return
+        version = await self.metadata.execute("bump_index_version", index_name)
+        self.published += 1
+        INVALIDATIONS.inc(source="local")
+        if self.versions is not None and version == self.versions.get(index_name, 0) + 1:
+            # Nobody else wrote in between, so there is nothing to drop here
+            self.versions[index_name] = version
+
+    async def poll(self):
+        """Call the listeners for every index another process changed since the last poll"""
+        versions = await self.metadata.execute("index_versions")
+        self.polls += 1
+        previous, self.versions = self.versions, versions
+        if previous is None:
+            return
+        for name in set(previous) | set(versions):
+            if previous.get(name) != versions.get(name):
+                self.received += 1
+                INVALIDATIONS.inc(source="remote")
+                for listener in self._listeners:
+                    listener(name)
+
+    @asynccontextmanager
+    async def lock(self, name: str) -> AsyncIterator[None]:
+        """Hold ``name`` against every coroutine of every process sharing the database"""
+        local = self._local_locks.get(name)
+        if local is None:
+            local = self._local_locks[name] = asyncio.Lock()
+        async with local:
+            if not self.enabled:
+                yield
+                return
+            self.start()
+            owner = f"{self.process_id}:{uuid.uuid4().hex}"
+            started = time.perf_counter()
+            delay = 0.02
+            while not await self.metadata.execute("acquire_lock", name, owner, time.time() + self.lock_ttl,
+                                                  time.time()):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_LOCK_BACKOFF)
+            LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+            self._held[name] = owner
+            try:
+                yield
+            finally:
+                del self._held[name]
+                await self.metadata.execute("release_lock", name, owner)
+
+    async def sync_jobs(self):
+        """Store snapshots of this process's jobs and apply cancel requests made elsewhere"""
+        if not self.enabled:
+            return
+        rows: List[Tuple[str, str, str]] = []
+        unfinished = []
+        for job in list(self.jobs.jobs.values()):
+            data = json.dumps(job.as_dict(), default=str)
+            if job.finished:
+                if self._saved.get(job.id) == data:
+                    continue
+            else:
+                # Rewritten every round even when unchanged, as a heartbeat
+                unfinished.append(job.id)
+            rows.append((job.id, job.status, data))
+        if rows:
+            await self.metadata.execute("save_jobs", self.process_id, rows, time.time())
+            self._saved.update((job_id, data) for job_id, _, data in rows)
+        for job_id in set(self._saved) - set(self.jobs.jobs):
+            del self._saved[job_id]
+        if unfinished:
+            for job_id in await self.metadata.execute("cancel_requested_jobs", unfinished):
+                job = self.jobs.jobs.get(job_id)
+                if job is not None and not job.cancel_requested:
+                    self.jobs.cancel(job_id)
+
+    async def save_job(self, job: Job):
+        """Store a new job at once, so it can be polled through any process"""
+        if not self.enabled:
+            return
+        self.start()
+        data = json.dumps(job.as_dict(), default=str)
+        await self.metadata.execute("save_jobs", self.process_id, [(job.id, job.status, data)], time.time())
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Last stored snapshot of a job run by any process"""
+        if not self.enabled:
+            return None
+        row = await self.metadata.execute("get_job", job_id)
+        if row is None:
+            return None
+        job = json.loads(row["data"])
+        job["cancel_requested"] = job["cancel_requested"] or bool(row["cancel_requested"])
+        if row["status"] not in FINISHED_STATUSES and row["updated_at"] < time.time() - self.lock_ttl:
+            job["status"] = "failed"
+            job["error"] = "The process running this job stopped responding"
+        return job
+
+    async def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Ask whichever process runs a job to cancel it"""
+        if not self.enabled or not await self.metadata.execute("request_job_cancel", job_id):
+            return None
+        return await self.get_job(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "process_id": self.process_id,
+            "poll_seconds": self.poll_seconds,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "tracked_indexes": len(self.versions or {}),
+            "published": self.published,
+            "received": self.received,
+            "held_locks": len(self._held),
+        }
@@ -1,164 +1,185 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Set, NamedTuple, AsyncIterator
 import os
-import io
 import json
+import logging
 from datetime import datetime
 import uuid
+import tempfile
+import time
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import openai
-from openai import OpenAI
-
-import PyPDF2
-from docx import Document
-import openpyxl
-import markdown
-import requests
-
-indexes_storage = {}
-documents_storage = {}
-
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
-
-class CustomQdrantClient:
-    """Custom Qdrant client that uses HTTP requests instead of the Qdrant client library"""
-    
-    def __init__(self, url: str, api_key: Optional[str] = None):
-        self.base_url = url.rstrip('/')
-        self.headers = {'Content-Type': 'application/json'}
-        if api_key:
-            self.headers['api-key'] = api_key
-    
-    def get_collections(self):
-        """Get all collections"""
-        response = requests.get(f"{self.base_url}/collections", headers=self.headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Create a mock collections object that matches the Qdrant client interface
-        class MockCollections:
-            def __init__(self, collections_data):
-                self.collections = []
-                for col in collections_data.get('result', {}).get('collections', []):
-                    class MockCollection:
-                        def __init__(self, name):
-                            self.name = name
-                    self.collections.append(MockCollection(col['name']))
-        
-        return MockCollections(data)
-    
-    def get_collection(self, collection_name: str):
-        """Get a specific collection"""
-        response = requests.get(f"{self.base_url}/collections/{collection_name}", headers=self.headers, timeout=10)
-        if response.status_code == 404:
-            raise Exception(f"Collection {collection_name} not found")
-        response.raise_for_status()
-        return response.json()
-    
-    def create_collection(self, collection_name: str, vectors_config):
-        """Create a new collection"""
-        payload = {
-            "vectors": {
-                "size": vectors_config.size,
-                "distance": vectors_config.distance.value
-            }
-        }
-        response = requests.put(f"{self.base_url}/collections/{collection_name}", 
-                              headers=self.headers, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    
-    def upsert(self, collection_name: str, points):
-        """Upsert points to a collection"""
-        payload = {
-            "points": [
-                {
-                    "id": point.id,
-                    "vector": point.vector,
-                    "payload": point.payload
-                } for point in points
-            ]
-        }
-        response = requests.put(f"{self.base_url}/collections/{collection_name}/points", 
-                              headers=self.headers, json=payload, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    
-    def search(self, collection_name: str, query_vector, limit=10):
-        """Search for similar vectors"""
-        payload = {
-            "vector": query_vector,
-            "limit": limit
-        }
-        response = requests.post(f"{self.base_url}/collections/{collection_name}/points/search", 
-                               headers=self.headers, json=payload, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Create mock search results that match the Qdrant client interface
-        class MockSearchResult:
-            def __init__(self, result_data):
-                self.id = result_data['id']
-                self.score = result_data['score']
-                self.payload = result_data.get('payload', {})
-        
-        return [MockSearchResult(result) for result in data.get('result', [])]
-    
-    def delete_collection(self, collection_name: str):
-        """Delete a collection"""
-        response = requests.delete(f"{self.base_url}/collections/{collection_name}", 
-                                 headers=self.headers, timeout=10)
-        response.raise_for_status()
-        return response.json()
-
-def get_qdrant_client(url: str, api_key: Optional[str] = None):
-    """Create Qdrant client with provided connection parameters"""
+import httpx
+import numpy as np
+
+from .qdrant_http import (CustomQdrantClient, AsyncCustomQdrantClient, Distance, PointStruct, VectorParams,
+                          document_filter, payload_filter)
+from .qdrant_pool import QdrantClientRegistry
+from .embeddings import EmbeddingPipeline, EmbeddingStats, shorten_embeddings
+from .embedding_cache import EmbeddingCache
+from .chunking import ChunkStream, validate_chunking, aiter_chunk_windows
+from .extraction import SUPPORTED_EXTENSIONS, file_extension, iter_pages
+from .jobs import Job, JobManager
+from .archives import ArchiveMember, expand_archive, is_archive, remove_workdir
+from .point_batching import BatchedPointSink, DirectPointSink, PointBatcher
+from .metadata_store import MetadataStore
+from .coordination import Coordinator
+from .fingerprints import ChunkFingerprints, chunking_signature, content_hasher
+from .search_cache import SearchCache, normalize_query
+from .lexical_index import LexicalIndexes, reciprocal_rank_fusion
+from .local_vector_store import LOCAL_URL_SCHEME, LocalVectorClient, AsyncLocalVectorClient
+from .chunk_store import ChunkStores
+from .snippets import TEXT_MODES, query_terms, snippet
+from . import metrics
+from .startup import startup_report
+from .index_storage import (IndexStorage, hnsw_config, legacy_storage, load_storage, quantization_config,
+                            resolve_storage, search_params, storage_from_collection)
+
+logger = logging.getLogger(__name__)
+
+INGEST_WINDOW_CHUNKS = int(os.getenv("INGEST_WINDOW_CHUNKS", "512"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+UPLOAD_COPY_BLOCK = 1024 * 1024
+# Room in a single-file upload request for the metadata field and multipart framing
+UPLOAD_FORM_OVERHEAD = 1024 * 1024
+BULK_MAX_ARCHIVE_BYTES = int(os.getenv("BULK_MAX_ARCHIVE_MB", "1024")) * 1024 * 1024
+BULK_FILE_CONCURRENCY = int(os.getenv("BULK_FILE_CONCURRENCY", "8"))
+# Document ids matched by one filtered delete request
+DELETE_BATCH_DOCUMENTS = 1000
+# Rows read per keyset page when listing a whole index
+DOCUMENT_PAGE_SIZE = 1000
+# Largest limit for one page of documents; streaming has no limit
+DOCUMENT_MAX_PAGE_SIZE = int(os.getenv("DOCUMENT_MAX_PAGE_SIZE", "10000"))
+# Point ids per request when removing the chunks a new version dropped
+DELETE_BATCH_POINTS = 1000
+# Payload fields a search may be restricted to
+SEARCH_FILTER_FIELDS = ("document_id", "filename", "file_type")
+# Keyword-indexed in every collection, so deletes and filtered searches do not scan
+PAYLOAD_INDEX_FIELDS = ("document_id", "filename", "file_type")
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "256"))
+# hybrid fuses dense and BM25 results; lexical skips the embedding call
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+SEARCH_DEFAULT_MODE = os.getenv("SEARCH_DEFAULT_MODE", "vector")
+# Results taken from each retriever before fusion
+SEARCH_HYBRID_CANDIDATES = int(os.getenv("SEARCH_HYBRID_CANDIDATES", "50"))
+# Deepest result a search may page to (offset + limit)
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "10000"))
+# Hits whose texts are read and sent together when streaming
+SEARCH_STREAM_BLOCK = int(os.getenv("SEARCH_STREAM_BLOCK", "64"))
+# Media types of the streaming response formats
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+metadata_store = startup_report.build("metadata_store", MetadataStore)
+
+embedding_pipeline = startup_report.build("embedding_pipeline", EmbeddingPipeline)
+embedding_cache = startup_report.build("embedding_cache", EmbeddingCache)
+search_cache = startup_report.build("search_cache", SearchCache)
+lexical_indexes = startup_report.build("lexical_indexes", LexicalIndexes)
+chunk_stores = startup_report.build("chunk_stores", ChunkStores)
+ingest_jobs = startup_report.build("ingest_jobs", JobManager)
+coordinator = startup_report.build("coordinator", lambda: Coordinator(metadata_store, ingest_jobs))
+
+def forget_index(index_name: str):
+    """Drop what this process cached of an index another process changed
+
+    The lexical indexes and chunk stores catch up from disk by themselves.
+    """
+    search_cache.invalidate(index_name)
+    metadata_store.invalidate(index_name)
+
+coordinator.on_change(forget_index)
+
+UPLOAD_BYTES = metrics.counter("upload_bytes_total", "Bytes received in uploaded files")
+INGEST_ROLLBACK_FAILURES = metrics.counter("ingest_rollback_failures_total",
+                                           "Failed ingestions whose partial points could not be removed", ("index",))
+metrics.gauge("cache_hit_ratio", "Hit rate of the in-process caches since start", ("cache",), function=lambda: {
+    ("embedding",): embedding_cache.stats()["hit_rate"],
+    ("search",): search_cache.stats()["hit_rate"],
+    ("metadata",): metadata_store.stats()["document_cache_hit_rate"],
+})
+metrics.gauge("ingest_queue_depth", "Ingestion jobs waiting for a worker", function=lambda: ingest_jobs.stats()["queue_depth"])
+metrics.gauge("ingest_busy_workers", "Ingestion workers running a job", function=lambda: ingest_jobs.busy_workers)
+
+# Vector store clients by URL scheme; any other URL is a Qdrant server. Every
+# client speaks the CustomQdrantClient / AsyncCustomQdrantClient interface
+VECTOR_STORE_BACKENDS = {
+    LOCAL_URL_SCHEME: (LocalVectorClient, AsyncLocalVectorClient),
+}
+
+def vector_store_backend(url: str):
+    for scheme, backend in VECTOR_STORE_BACKENDS.items():
+        if url.startswith(scheme):
+            return backend
+    return CustomQdrantClient, AsyncCustomQdrantClient
+
+qdrant_registry = QdrantClientRegistry(
+    lambda url, api_key: vector_store_backend(url)[0](url, api_key),
+    lambda url, api_key: vector_store_backend(url)[1](url, api_key),
+)
+
+def normalize_qdrant_url(url: str) -> str:
+    """Ensure the URL has a scheme and no trailing slashes"""
+    for scheme in VECTOR_STORE_BACKENDS:
+        if url.startswith(scheme):
+            return scheme + url[len(scheme):].rstrip('/')
+    if not url.startswith(('http://', 'https://')):
+        url = f"https://{url}"
+    return url.rstrip('/')
+
+async def get_async_qdrant_client(url: str, api_key: Optional[str] = None):
+    """Get a pooled asyncio Qdrant client for the provided connection parameters"""
     try:
-        # Ensure URL has the correct format
-        if not url.startswith(('http://', 'https://')):
-            url = f"https://{url}"
-        
-        # Remove any trailing slashes
-        url = url.rstrip('/')
-        
-        # Test the connection using HTTP requests (like curl)
-        headers = {'Content-Type': 'application/json'}
-        if api_key:
-            headers['api-key'] = api_key
-        
-        # Test the collections endpoint directly
-        test_url = f"{url}/collections"
-        
-        response = requests.get(test_url, headers=headers, timeout=10)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail=f"HTTP connection failed: {response.text}")
-        
-        # Use our custom client instead of the problematic Qdrant client
-        client = CustomQdrantClient(url, api_key)
-        
-        # Test the connection by getting collections
-        collections = client.get_collections()
-        
-        return client
+        # Clients are cached per (url, api_key) and only probed when first
+        # created or after the background health check marked them unhealthy
+        return await qdrant_registry.aget(normalize_qdrant_url(url), api_key)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to connect to Qdrant: {str(e)}")
 
+def get_embedding_cache_stats():
+    """Get hit/miss/eviction counters for the embedding cache"""
+    return embedding_cache.stats()
+
+def get_search_cache_stats():
+    return search_cache.stats()
+
+def get_coordination_stats():
+    return coordinator.stats()
+
+def get_lexical_index_stats():
+    return lexical_indexes.stats()
+
+def get_chunk_store_stats():
+    return chunk_stores.stats()
+
+def get_metadata_stats():
+    """Get backend and cache statistics for the metadata store"""
+    return metadata_store.stats()
+
+def get_qdrant_pool_stats():
+    """Get per-endpoint connection reuse and health-check statistics"""
+    return qdrant_registry.stats()
+
 class DocumentMetadata(BaseModel):
     index_name: str
     description: Optional[str] = ""
     chunk_size: int = 1000
     chunk_overlap: int = 200
     chunking_method: str = "recursive"
+    chunk_size_unit: str = "characters"
+    # False returns once Qdrant has logged each batch, before it is indexed
+    upsert_wait: bool = True
+    # Only used by the upload that creates the index
+    storage: Optional[IndexStorage] = None
 
 class IndexInfo(BaseModel):
     name: str
     description: str
     document_count: int
     created_at: str
+    storage: Optional[Dict[str, Any]] = None
 
 class DocumentInfo(BaseModel):
     id: str
@@ -168,295 +189,1044 @@ class DocumentInfo(BaseModel):
     chunks_count: int
     uploaded_at: str
 
-def extract_text_from_file(file_content: bytes, filename: str) -> str:
-    """Extract text from various file types"""
-    file_extension = filename.lower().split('.')[-1]
-    
-    try:
-        if file_extension == 'pdf':
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        
-        elif file_extension == 'docx':
-            doc = Document(io.BytesIO(file_content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        
-        elif file_extension in ['xlsx', 'xls']:
-            workbook = openpyxl.load_workbook(io.BytesIO(file_content))
-            text = ""
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = " ".join([str(cell) if cell is not None else "" for cell in row])
-                    if row_text.strip():
-                        text += row_text + "\n"
-            return text
-        
-        elif file_extension == 'md':
-            text_content = file_content.decode('utf-8')
-            html = markdown.markdown(text_content)
-            import re
-            text = re.sub('<[^<]+?>', '', html)
-            return text
-        
-        elif file_extension == 'txt':
-            return file_content.decode('utf-8')
-        
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
-
-def chunk_text(text: str, chunk_size: int, chunk_overlap: int, method: str = "recursive") -> List[str]:
-    """Chunk text into smaller pieces"""
-    if method == "recursive":
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - chunk_overlap
-            if start >= len(text):
-                break
-        return chunks
-    else:
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk + sentence) < chunk_size:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
-
-async def get_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings from OpenAI or use mock embeddings for testing"""
+async def get_embeddings_with_stats(texts: List[str], dimensions: Optional[int] = None):
+    """Get an embedding matrix plus per-call throughput stats, serving repeated texts from the cache
+
+    The cache holds full-size embeddings; they are shortened to
+    ``dimensions`` for indexes that store fewer.
+    """
     try:
-        if os.getenv("OPENAI_API_KEY"):
-            response = openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=texts
-            )
-            return [embedding.embedding for embedding in response.data]
-        else:
-            import random
-            import hashlib
-            mock_embeddings = []
-            for text in texts:
-                text_hash = hashlib.md5(text.encode()).hexdigest()
-                random.seed(int(text_hash[:8], 16))
-                embedding = [random.uniform(-1, 1) for _ in range(1536)]
-                mock_embeddings.append(embedding)
-            return mock_embeddings
+        model = embedding_pipeline.model
+        cached = await embedding_cache.aget_many(model, texts)
+
+        # Embed each distinct uncached text once
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        missing_texts = list(missing)
+
+        fresh, stats = await embedding_pipeline.embed(missing_texts)
+        if missing_texts:
+            await embedding_cache.aput_many(model, missing_texts, fresh)
+
+        embeddings = np.empty((len(texts), embedding_pipeline.dimensions), dtype=np.float32)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+        for text, vector in zip(missing_texts, fresh):
+            embeddings[missing[text]] = vector
+        stats.chunks = len(texts)
+        stats.cache_hits = len(texts) - sum(len(indices) for indices in missing.values())
+        if dimensions:
+            embeddings = shorten_embeddings(embeddings, dimensions)
+        return embeddings, stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting embeddings: {str(e)}")
 
-def get_indexes():
+async def get_embeddings(texts: List[str], dimensions: Optional[int] = None) -> np.ndarray:
+    """Get embeddings from the configured provider as a float32 matrix"""
+    embeddings, _ = await get_embeddings_with_stats(texts, dimensions)
+    return embeddings
+
+async def get_indexes():
     """Get all existing indexes with document counts"""
     result = []
-    for index_name, index_data in indexes_storage.items():
+    for index_data in await metadata_store.list_indexes():
         result.append(IndexInfo(
-            name=index_name,
+            name=index_data["name"],
             description=index_data.get("description", ""),
-            document_count=len(index_data.get("documents", [])),
-            created_at=index_data.get("created_at", "")
+            document_count=index_data.get("document_count", 0),
+            created_at=index_data.get("created_at", ""),
+            storage=load_storage(index_data)
         ))
     return result
 
-def get_index_documents(index_name: str):
-    """Get all documents in a specific index"""
-    if index_name not in indexes_storage:
+def document_info(doc_data: Dict[str, Any]) -> DocumentInfo:
+    return DocumentInfo(
+        id=doc_data["id"],
+        filename=doc_data["filename"],
+        file_type=doc_data["file_type"],
+        size=doc_data["size"],
+        chunks_count=doc_data["chunks_count"],
+        uploaded_at=doc_data["uploaded_at"]
+    )
+
+async def read_document_page(index_name: str, limit: int, cursor: Optional[str]):
+    try:
+        return await metadata_store.list_documents(index_name, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def get_index_documents(index_name: str, limit: int = DOCUMENT_PAGE_SIZE, cursor: Optional[str] = None):
+    """Get one keyset page of the documents in an index in upload order, returning (documents, next_cursor)"""
+    if await metadata_store.get_index(index_name) is None:
         raise HTTPException(status_code=404, detail="Index not found")
+    if not 1 <= limit <= DOCUMENT_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {DOCUMENT_MAX_PAGE_SIZE}")
     
-    documents = []
-    for doc_id in indexes_storage[index_name].get("documents", []):
-        if doc_id in documents_storage:
-            doc_data = documents_storage[doc_id]
-            documents.append(DocumentInfo(
-                id=doc_id,
-                filename=doc_data["filename"],
-                file_type=doc_data["file_type"],
-                size=doc_data["size"],
-                chunks_count=doc_data["chunks_count"],
-                uploaded_at=doc_data["uploaded_at"]
-            ))
-    return documents
+    page, cursor = await read_document_page(index_name, limit, cursor)
+    return [document_info(doc_data) for doc_data in page], cursor
 
-async def upload_document(file: UploadFile, metadata: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
-    """Upload and process a document"""
+async def stream_index_documents(index_name: str, cursor: Optional[str] = None, stream: Optional[str] = None,
+                                 limit: Optional[int] = None):
+    """Stream the documents of an index from ``cursor`` on, reading one page at a time
+
+    Sent as one JSON array, or with ``stream`` as NDJSON or SSE ``document``
+    events and a closing ``done`` event with the count and the cursor after
+    ``limit`` documents, so memory stays flat however large the index is.
+    """
+    if await metadata_store.get_index(index_name) is None:
+        raise HTTPException(status_code=404, detail="Index not found")
+    stream = parse_stream(stream)
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+    remaining = limit
+    page_size = min(limit, DOCUMENT_PAGE_SIZE) if limit else DOCUMENT_PAGE_SIZE
+    # The first page is read up front so a bad cursor still gets a 400
+    first_page, next_cursor = await read_document_page(index_name, page_size, cursor)
+    
+    async def pages():
+        nonlocal next_cursor, remaining
+        page = first_page
+        while True:
+            yield [document_info(doc_data).model_dump() for doc_data in page]
+            if remaining is not None:
+                remaining -= len(page)
+            if next_cursor is None or remaining == 0:
+                return
+            size = min(remaining, DOCUMENT_PAGE_SIZE) if remaining else DOCUMENT_PAGE_SIZE
+            page, next_cursor = await metadata_store.list_documents(index_name, size, next_cursor)
+    
+    if stream is None:
+        return StreamingResponse(json_array(pages()), media_type="application/json")
+    
+    async def events():
+        count = 0
+        async for page in pages():
+            count += len(page)
+            yield [("document", document) for document in page]
+        yield [("done", {"count": count, "next_cursor": next_cursor})]
+    return streaming_response(events(), stream)
+
+def parse_upload_metadata(metadata: str) -> DocumentMetadata:
+    """Parse the metadata form field and reject chunking settings that cannot work"""
     try:
         metadata_obj = DocumentMetadata.parse_raw(metadata)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid metadata: {str(e)}")
     
-    file_content = await file.read()
-    if len(file_content) > 20 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size exceeds 20MB limit")
+    try:
+        validate_chunking(metadata_obj.chunk_size, metadata_obj.chunk_overlap, metadata_obj.chunk_size_unit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid chunking settings: {str(e)}")
+    
+    try:
+        resolve_storage(metadata_obj.storage, embedding_pipeline.dimensions, embedding_pipeline.shortenable)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid storage options: {str(e)}")
+    return metadata_obj
+
+def size_limit_error(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit")
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware turning away oversized request bodies before they are spooled
+
+    ``limits`` maps a path to the largest file it accepts; the whole body
+    may be ``UPLOAD_FORM_OVERHEAD`` larger. A declared Content-Length over
+    that is refused before anything is read, and a body without one is
+    counted as it arrives and cut off there.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_file = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_file is None:
+            await self.app(scope, receive, send)
+            return
+        max_body = max_file + UPLOAD_FORM_OVERHEAD
+        declared = next((value for name, value in scope.get("headers", ()) if name == b"content-length"), None)
+        if declared is not None and declared.isdigit() and int(declared) > max_body:
+            error = size_limit_error(max_file)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code,
+                                    headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    raise size_limit_error(max_file)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, directory: Optional[str] = None):
+    """Copy an upload to a temp file in blocks, returning (path, size, sha256 hex digest)"""
+    suffix = ".archive" if is_archive(file.filename) else f".{file_extension(file.filename)}"
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    size = 0
+    digest = content_hasher()
+    try:
+        with metrics.stage("upload.spool"), os.fdopen(fd, "wb") as f:
+            while True:
+                block = await file.read(UPLOAD_COPY_BLOCK)
+                if not block:
+                    break
+                size += len(block)
+                UPLOAD_BYTES.inc(len(block))
+                if size > max_bytes:
+                    raise size_limit_error(max_bytes)
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        discard_file(path)
+        raise
+    return path, size, digest.hexdigest()
+
+def discard_file(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def index_storage(index: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return load_storage(index) or legacy_storage(embedding_pipeline.dimensions)
+
+async def ensure_collection(qdrant_client, collection_name: str,
+                            options: Optional[IndexStorage] = None) -> Dict[str, Any]:
+    """Create the collection on first use and index the payload fields filters use
+
+    Returns the storage settings of the index: those on record, else those
+    of the existing collection, else the requested ones it is created with.
+    """
+    storage = load_storage(await metadata_store.get_index(collection_name))
+    try:
+        collection = await qdrant_client.get_collection(collection_name)
+    except Exception:
+        # Uploads to a new index in several workers at once must create it only once
+        async with coordinator.lock(f"collection:{collection_name}"):
+            try:
+                collection = await qdrant_client.get_collection(collection_name)
+            except Exception:
+                storage = storage or resolve_storage(options, embedding_pipeline.dimensions,
+                                                     embedding_pipeline.shortenable)
+                await qdrant_client.create_collection(
+                    collection_name=collection_name,
+                    vectors_config=VectorParams(size=storage["dimensions"], distance=Distance.COSINE,
+                                                on_disk=storage["on_disk"]),
+                    hnsw_config=hnsw_config(storage),
+                    quantization_config=quantization_config(storage)
+                )
+                collection = {}
+    storage = storage or storage_from_collection(collection.get("result", {}), embedding_pipeline.dimensions)
+    await ensure_payload_indexes(qdrant_client, collection_name,
+                                 collection.get("result", {}).get("payload_schema") or {})
+    return storage
+
+async def ensure_payload_indexes(qdrant_client, collection_name: str, payload_schema: Dict[str, Any]):
+    for field in PAYLOAD_INDEX_FIELDS:
+        if field not in payload_schema:
+            await qdrant_client.create_payload_index(collection_name, field)
+
+def document_chunking(metadata_obj: DocumentMetadata) -> str:
+    return chunking_signature(metadata_obj.chunking_method, metadata_obj.chunk_size_unit,
+                              metadata_obj.chunk_size, metadata_obj.chunk_overlap)
+
+@asynccontextmanager
+async def document_lock(index_name: str, *keys: str):
+    """Held while a file is resolved against the index and ingested, in every
+    worker, so two uploads of the same name or content cannot both create a document"""
+    async with AsyncExitStack() as stack:
+        # Sorted so two ingestions sharing several keys cannot deadlock
+        for key in sorted(set(keys)):
+            await stack.enter_async_context(coordinator.lock(f"document:{index_name}:{key}"))
+        yield
+
+async def resolve_document(metadata_obj: DocumentMetadata, filename: str,
+                           content_hash: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Match an upload against the index, returning (identical, previous)
+
+    ``identical`` is a document with the same bytes chunked the same way, so
+    there is nothing to do. Otherwise ``previous`` is the latest document
+    with the same filename, which the upload replaces as a new version.
+    """
+    identical = await metadata_store.find_document(metadata_obj.index_name, "content_hash", content_hash)
+    if identical is not None and identical["chunking"] == document_chunking(metadata_obj):
+        return identical, None
+    return None, await metadata_store.find_document(metadata_obj.index_name, "filename", filename)
+
+async def delete_points(qdrant_client, collection_name: str, point_ids: List[str]):
+    for start in range(0, len(point_ids), DELETE_BATCH_POINTS):
+        await qdrant_client.delete(collection_name, point_ids[start:start + DELETE_BATCH_POINTS])
+
+async def ingest_document(sink, path: str, filename: str, size: int, metadata_obj: DocumentMetadata,
+                          storage: Dict[str, Any], content_hash: str, job: Job, doc_id: Optional[str] = None):
+    """Ingest one spooled file unless the index already has it
+
+    An identical file is skipped. A new version of a file keeps its document
+    id, and only the chunks that changed are embedded and written.
+    """
+    async with document_lock(metadata_obj.index_name, f"name:{filename}", f"hash:{content_hash}"):
+        identical, previous = await resolve_document(metadata_obj, filename, content_hash)
+        if identical is not None:
+            return {
+                "document_id": identical["id"],
+                "filename": filename,
+                "chunks_processed": 0,
+                "embedding": EmbeddingStats().as_dict(),
+                "status": "unchanged"
+            }
+        if previous is not None:
+            doc_id = previous["id"]
+        return await index_document(sink, path, filename, size, metadata_obj, storage, content_hash,
+                                    doc_id or str(uuid.uuid4()), previous is not None, job)
+
+async def index_document(sink, path: str, filename: str, size: int, metadata_obj: DocumentMetadata,
+                         storage: Dict[str, Any], content_hash: str, doc_id: str, replacing: bool, job: Job):
+    """Extract, chunk and embed one spooled file, handing its new points to ``sink``"""
+    file_type = file_extension(filename)
     
-    text = extract_text_from_file(file_content, file.filename)
+    # Point ids are derived from chunk content, so the points of an earlier
+    # version that reappear unchanged are kept as they are
+    existing: Dict[str, Any] = {}
+    if replacing:
+        async for points in sink.client.iter_scroll(sink.collection_name, document_filter(doc_id),
+                                                    with_payload=["chunk_index"]):
+            for point in points:
+                existing[str(point.id)] = point.payload.get("chunk_index")
     
-    chunks = chunk_text(
-        text, 
-        metadata_obj.chunk_size, 
-        metadata_obj.chunk_overlap, 
-        metadata_obj.chunking_method
+    # Pages are extracted in a process pool and chunked as they arrive; each
+    # window of chunks is embedded and written before the next is built, so
+    # neither the full text nor the whole chunk list has to sit in memory
+    stream = ChunkStream(
+        metadata_obj.chunk_size,
+        metadata_obj.chunk_overlap,
+        metadata_obj.chunking_method,
+        metadata_obj.chunk_size_unit
     )
+    pages = iter_pages(path, filename, on_total=lambda total: job.advance("pages_total", total))
+    lexical = lexical_indexes.get(metadata_obj.index_name)
+    chunk_store = chunk_stores.get(metadata_obj.index_name)
+    fingerprints = ChunkFingerprints(doc_id)
+    chunks_count = 0
+    written: List[str] = []
+    moved: List[Tuple[str, Dict[str, Any]]] = []
+    embedding_stats = EmbeddingStats()
+    try:
+        async for window in aiter_chunk_windows(job.timed_iter("extract", pages, "pages_extracted"),
+                                                stream, INGEST_WINDOW_CHUNKS):
+            fresh = []
+            for chunk, point_id in zip(window, fingerprints.assign(window)):
+                if point_id in existing:
+                    if existing.pop(point_id) != chunks_count:
+                        moved.append((point_id, {"chunk_index": chunks_count}))
+                else:
+                    fresh.append((point_id, chunks_count, chunk))
+                chunks_count += 1
+            job.advance("chunks_unchanged", len(window) - len(fresh))
+            if not fresh:
+                continue
+            
+            with job.timed("embed"):
+                embeddings, window_stats = await get_embeddings_with_stats([chunk for _, _, chunk in fresh],
+                                                                           storage["dimensions"])
+            embedding_stats.merge(window_stats)
+            job.advance("chunks_embedded", len(fresh))
+            
+            # Chunk text lives in the chunk store, not the payload; it is
+            # stored before the points so a search can never hit a point
+            # whose text is missing
+            points = []
+            for (point_id, chunk_index, chunk), embedding in zip(fresh, embeddings):
+                points.append(PointStruct(
+                    id=point_id,
+                    vector=embedding.tolist(),
+                    payload={
+                        "document_id": doc_id,
+                        "chunk_index": chunk_index,
+                        "filename": filename,
+                        "file_type": file_type
+                    }
+                ))
+                written.append(point_id)
+            
+            with job.timed("upsert"):
+                await asyncio.to_thread(chunk_store.put_many,
+                                        [(point_id, doc_id, chunk) for point_id, _, chunk in fresh])
+                await asyncio.to_thread(lexical.add_many,
+                                        [(point_id, doc_id, filename, file_type, chunk) for point_id, _, chunk in fresh])
+                await sink.put(points)
+            if lexical.needs_flush:
+                await asyncio.to_thread(lexical.flush)
+        with job.timed("upsert"):
+            await sink.drain()
+    except BaseException:
+        # Failed or cancelled part-way: drop the points already written,
+        # leaving an earlier version of the document as it was
+        await sink.abort()
+        if written:
+            search_cache.invalidate(metadata_obj.index_name)
+            try:
+                if replacing:
+                    await asyncio.to_thread(lexical.delete_points, written)
+                    await asyncio.to_thread(chunk_store.delete_points, written)
+                    await delete_points(sink.client, sink.collection_name, written)
+                else:
+                    await asyncio.to_thread(lexical.delete_documents, [doc_id])
+                    await asyncio.to_thread(chunk_store.delete_documents, [doc_id])
+                    await sink.client.delete(sink.collection_name, document_filter(doc_id))
+                await coordinator.publish(metadata_obj.index_name)
+            except Exception:
+                # The original error is re-raised below; the leftovers are
+                # only reported, and deleting the document removes them
+                INGEST_ROLLBACK_FAILURES.inc(index=metadata_obj.index_name)
+                logger.exception("Rollback of %s (%s) in index %s failed; %d points may be orphaned",
+                                 filename, doc_id, metadata_obj.index_name, len(written))
+        raise
+    
+    # The new version is complete; retire what the old one no longer has
+    removed = list(existing)
+    with job.timed("upsert"):
+        if moved:
+            await sink.client.set_payloads(sink.collection_name, moved, wait=metadata_obj.upsert_wait)
+        await delete_points(sink.client, sink.collection_name, removed)
+    if removed:
+        await asyncio.to_thread(lexical.delete_points, removed)
+        await asyncio.to_thread(chunk_store.delete_points, removed)
     
-    embeddings = await get_embeddings(chunks)
+    await record_document(doc_id, filename, file_type, size, chunks_count, content_hash, metadata_obj, storage)
     
-    qdrant_client = get_qdrant_client(qdrant_url, qdrant_api_key)
-    collection_name = metadata_obj.index_name
+    return {
+        "document_id": doc_id,
+        "filename": filename,
+        "chunks_processed": chunks_count,
+        "chunks_embedded": len(written),
+        "chunks_unchanged": chunks_count - len(written),
+        "chunks_removed": len(removed),
+        "embedding": embedding_stats.as_dict(),
+        "status": "success"
+    }
+
+async def record_document(doc_id: str, filename: str, file_type: str, size: int, chunks_count: int,
+                          content_hash: str, metadata_obj: DocumentMetadata, storage: Dict[str, Any]):
+    search_cache.invalidate(metadata_obj.index_name)
+    now = datetime.now().isoformat()
+    await metadata_store.add_document({
+        "id": doc_id,
+        "filename": filename,
+        "file_type": file_type,
+        "size": size,
+        "chunks_count": chunks_count,
+        "uploaded_at": now,
+        "index_name": metadata_obj.index_name,
+        "content_hash": content_hash,
+        "chunking": document_chunking(metadata_obj)
+    }, metadata_obj.description, now, json.dumps(storage))
+    await coordinator.publish(metadata_obj.index_name)
+
+async def ingest_file(path: str, filename: str, size: int, content_hash: str, metadata_obj: DocumentMetadata,
+                      qdrant_url: str, qdrant_api_key: Optional[str], doc_id: str,
+                      job: Optional[Job] = None):
+    """Ingest one uploaded file, reporting progress on ``job``"""
+    job = job or Job("upload")
+    qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    storage = await ensure_collection(qdrant_client, metadata_obj.index_name, metadata_obj.storage)
+    sink = DirectPointSink(qdrant_client, metadata_obj.index_name,
+                           on_written=lambda count: job.advance("points_upserted", count),
+                           wait=metadata_obj.upsert_wait)
     try:
-        qdrant_client.get_collection(collection_name)
-    except:
-        qdrant_client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
-        )
-    
-    doc_id = str(uuid.uuid4())
-    
-    points = []
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-        point_id = str(uuid.uuid4())
-        points.append(PointStruct(
-            id=point_id,
-            vector=embedding,
-            payload={
-                "document_id": doc_id,
-                "chunk_index": i,
-                "text": chunk,
-                "filename": file.filename,
-                "file_type": file.filename.split('.')[-1].lower()
-            }
-        ))
+        return await ingest_document(sink, path, filename, size, metadata_obj, storage, content_hash, job, doc_id)
+    finally:
+        await asyncio.to_thread(lexical_indexes.get(metadata_obj.index_name).flush)
+
+async def ingest_bulk(uploads: List[ArchiveMember], metadata_obj: DocumentMetadata, qdrant_url: str,
+                      qdrant_api_key: Optional[str], workdir: str, job: Optional[Job] = None):
+    """Ingest many files and archive members in parallel with coalesced upserts"""
+    job = job or Job("bulk")
+    started = time.perf_counter()
+    
+    files: List[ArchiveMember] = []
+    for upload in uploads:
+        if is_archive(upload.filename):
+            files.extend(await asyncio.to_thread(expand_archive, upload.path, upload.filename, workdir,
+                                                 MAX_UPLOAD_BYTES))
+            discard_file(upload.path)
+        elif file_extension(upload.filename) not in SUPPORTED_EXTENSIONS:
+            files.append(ArchiveMember(upload.filename, error=f"Unsupported file type: {file_extension(upload.filename)}"))
+        else:
+            files.append(upload)
+    job.progress.update(files_total=len(files), files_done=0, files_unchanged=0, files_failed=0)
     
-    qdrant_client.upsert(collection_name=collection_name, points=points)
+    # One connection check and one collection check for the whole batch
+    qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    storage = await ensure_collection(qdrant_client, metadata_obj.index_name, metadata_obj.storage)
+    batcher = PointBatcher(qdrant_client, metadata_obj.index_name,
+                           on_written=lambda count: job.advance("points_upserted", count),
+                           wait=metadata_obj.upsert_wait)
+    semaphore = asyncio.Semaphore(BULK_FILE_CONCURRENCY)
     
-    documents_storage[doc_id] = {
-        "filename": file.filename,
-        "file_type": file.filename.split('.')[-1].lower(),
-        "size": len(file_content),
-        "chunks_count": len(chunks),
-        "uploaded_at": datetime.now().isoformat(),
-        "index_name": metadata_obj.index_name
+    async def run(member: ArchiveMember):
+        if member.error:
+            job.advance("files_failed")
+            return {"filename": member.filename, "status": "failed", "error": member.error}
+        async with semaphore:
+            try:
+                result = await ingest_document(BatchedPointSink(batcher), member.path, member.filename,
+                                               member.size, metadata_obj, storage, member.content_hash, job)
+            except HTTPException as e:
+                job.advance("files_failed")
+                return {"filename": member.filename, "status": "failed", "error": str(e.detail)}
+            except Exception as e:
+                job.advance("files_failed")
+                return {"filename": member.filename, "status": "failed", "error": str(e)}
+            finally:
+                discard_file(member.path)
+        job.advance("files_unchanged" if result["status"] == "unchanged" else "files_done")
+        return result
+    
+    try:
+        results = await asyncio.gather(*(run(member) for member in files))
+    finally:
+        await batcher.close()
+        await asyncio.to_thread(lexical_indexes.get(metadata_obj.index_name).flush)
+    
+    seconds = time.perf_counter() - started
+    succeeded = [result for result in results if result["status"] in ("success", "unchanged")]
+    return {
+        "files": results,
+        "files_total": len(files),
+        "files_succeeded": len(succeeded),
+        "files_unchanged": sum(result["status"] == "unchanged" for result in results),
+        "files_failed": len(files) - len(succeeded),
+        "chunks_processed": sum(result["chunks_processed"] for result in succeeded),
+        "upserts": batcher.upserts,
+        "seconds": round(seconds, 4),
+        "docs_per_second": round(len(succeeded) / seconds, 2) if seconds > 0 else None,
+        "status": "success"
     }
+
+async def upload_document(file: UploadFile, metadata: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
+    """Accept a document and queue it for ingestion, returning the job to poll"""
+    metadata_obj = parse_upload_metadata(metadata)
     
-    if metadata_obj.index_name not in indexes_storage:
-        indexes_storage[metadata_obj.index_name] = {
-            "description": metadata_obj.description,
-            "created_at": datetime.now().isoformat(),
-            "documents": []
-        }
+    if file_extension(file.filename) not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension(file.filename)}")
     
-    indexes_storage[metadata_obj.index_name]["documents"].append(doc_id)
+    # Fail fast on a bad connection rather than in the background
+    await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    
+    path, size, content_hash = await spool_upload(file)
+    filename = file.filename
+    # The job resolves the upload again under a lock; this is the id it will
+    # use unless another upload of the same file gets there first
+    identical, previous = await resolve_document(metadata_obj, filename, content_hash)
+    doc_id = (identical or previous or {}).get("id") or str(uuid.uuid4())
+    job = ingest_jobs.submit(
+        "upload",
+        lambda job: ingest_file(path, filename, size, content_hash, metadata_obj, qdrant_url, qdrant_api_key,
+                                doc_id, job),
+        details={"document_id": doc_id, "filename": filename, "index_name": metadata_obj.index_name},
+        cleanup=lambda: discard_file(path),
+    )
+    await coordinator.save_job(job)
     
     return {
+        "job_id": job.id,
         "document_id": doc_id,
-        "filename": file.filename,
-        "chunks_processed": len(chunks),
-        "status": "success"
+        "filename": filename,
+        "status": job.status
     }
 
-def delete_document(index_name: str, document_id: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
+async def upload_documents_bulk(files: List[UploadFile], metadata: str, qdrant_url: str,
+                                qdrant_api_key: Optional[str] = None):
+    """Accept many documents and/or zip/tar archives as one ingestion job"""
+    metadata_obj = parse_upload_metadata(metadata)
+    await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    
+    workdir = tempfile.mkdtemp(prefix="bulk-")
+    uploads = []
+    try:
+        for file in files:
+            limit = BULK_MAX_ARCHIVE_BYTES if is_archive(file.filename) else MAX_UPLOAD_BYTES
+            path, size, content_hash = await spool_upload(file, limit, workdir)
+            uploads.append(ArchiveMember(file.filename, path, size, content_hash=content_hash))
+    except BaseException:
+        remove_workdir(workdir)
+        raise
+    
+    job = ingest_jobs.submit(
+        "bulk",
+        lambda job: ingest_bulk(uploads, metadata_obj, qdrant_url, qdrant_api_key, workdir, job),
+        details={"index_name": metadata_obj.index_name, "uploads": [upload.filename for upload in uploads]},
+        cleanup=lambda: remove_workdir(workdir),
+    )
+    await coordinator.save_job(job)
+    
+    return {
+        "job_id": job.id,
+        "uploads_received": len(uploads),
+        "status": job.status
+    }
+
+async def get_job(job_id: str):
+    """Get status and stage progress of an ingestion job, run by this or another worker"""
+    if job_id in ingest_jobs.jobs:
+        return ingest_jobs.get(job_id).as_dict()
+    job = await coordinator.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def cancel_job(job_id: str):
+    """Cancel a queued or running ingestion job, run by this or another worker"""
+    if job_id in ingest_jobs.jobs:
+        return ingest_jobs.cancel(job_id).as_dict()
+    job = await coordinator.cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def get_job_stats():
+    """Get queue depth, per-stage latency and worker utilization of the ingestion pool"""
+    return ingest_jobs.stats()
+
+async def delete_document_points(qdrant_client, collection_name: str, document_ids: List[str]):
+    """Delete every point of the given documents with one filtered request per batch"""
+    for start in range(0, len(document_ids), DELETE_BATCH_DOCUMENTS):
+        batch = document_ids[start:start + DELETE_BATCH_DOCUMENTS]
+        selector = document_filter(batch[0] if len(batch) == 1 else batch)
+        try:
+            await qdrant_client.delete(collection_name=collection_name, points_selector=selector)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return
+            if e.response.status_code not in (400, 422):
+                raise
+            # The server rejected the filter selector; stream the matching ids
+            # and delete them page by page instead
+            async for point_ids in qdrant_client.iter_scroll_ids(collection_name, selector):
+                await qdrant_client.delete(collection_name=collection_name, points_selector=point_ids)
+
+async def delete_document(index_name: str, document_id: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
     """Delete a specific document from an index"""
-    if index_name not in indexes_storage:
+    if await metadata_store.get_index(index_name) is None:
         raise HTTPException(status_code=404, detail="Index not found")
     
-    if document_id not in documents_storage:
+    document = await metadata_store.get_document(document_id)
+    if document is None or document["index_name"] != index_name:
         raise HTTPException(status_code=404, detail="Document not found")
     
     try:
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
-        
-        qdrant_client = get_qdrant_client(qdrant_url, qdrant_api_key)
-        scroll_result = qdrant_client.scroll(
-            collection_name=index_name,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="document_id",
-                        match=MatchValue(value=document_id)
-                    )
-                ]
-            )
-        )
-        
-        point_ids = [point.id for point in scroll_result[0]]
-        if point_ids:
-            qdrant_client.delete(collection_name=index_name, points_selector=point_ids)
+        qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+        await delete_document_points(qdrant_client, index_name, [document_id])
+        await asyncio.to_thread(lexical_indexes.get(index_name).delete_documents, [document_id])
+        await asyncio.to_thread(chunk_stores.get(index_name).delete_documents, [document_id])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting from vector store: {str(e)}")
+    finally:
+        search_cache.invalidate(index_name)
     
-    del documents_storage[document_id]
-    indexes_storage[index_name]["documents"].remove(document_id)
+    await metadata_store.delete_documents(index_name, [document_id])
+    await coordinator.publish(index_name)
     
     return {"status": "success", "message": "Document deleted successfully"}
 
-def delete_index(index_name: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
+async def delete_documents(index_name: str, document_ids: List[str], qdrant_url: str,
+                           qdrant_api_key: Optional[str] = None):
+    """Delete many documents from an index in as few requests as possible"""
+    if await metadata_store.get_index(index_name) is None:
+        raise HTTPException(status_code=404, detail="Index not found")
+    
+    documents = await metadata_store.get_documents(list(dict.fromkeys(document_ids)))
+    found = [doc_id for doc_id, document in documents.items() if document["index_name"] == index_name]
+    not_found = [doc_id for doc_id in document_ids if doc_id not in found]
+    
+    if found:
+        try:
+            qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+            await delete_document_points(qdrant_client, index_name, found)
+            await asyncio.to_thread(lexical_indexes.get(index_name).delete_documents, found)
+            await asyncio.to_thread(chunk_stores.get(index_name).delete_documents, found)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error deleting from vector store: {str(e)}")
+        finally:
+            search_cache.invalidate(index_name)
+        await metadata_store.delete_documents(index_name, found)
+        await coordinator.publish(index_name)
+    
+    return {"status": "success", "deleted": found, "not_found": not_found}
+
+async def delete_index(index_name: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
     """Delete an entire index"""
-    if index_name not in indexes_storage:
+    if await metadata_store.get_index(index_name) is None:
         raise HTTPException(status_code=404, detail="Index not found")
     
     try:
-        qdrant_client = get_qdrant_client(qdrant_url, qdrant_api_key)
-        qdrant_client.delete_collection(collection_name=index_name)
+        qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+        await qdrant_client.delete_collection(collection_name=index_name)
     except Exception as e:
         pass
     
-    for doc_id in indexes_storage[index_name]["documents"]:
-        if doc_id in documents_storage:
-            del documents_storage[doc_id]
-    
-    del indexes_storage[index_name]
+    await asyncio.to_thread(lexical_indexes.drop, index_name)
+    await asyncio.to_thread(chunk_stores.drop, index_name)
+    search_cache.invalidate(index_name)
+    await metadata_store.delete_index(index_name)
+    await coordinator.publish(index_name)
     
     return {"status": "success", "message": "Index deleted successfully"}
 
+def parse_stream(stream: Any) -> Optional[str]:
+    if stream in (None, False, ""):
+        return None
+    if stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {stream}; use one of {', '.join(STREAM_MEDIA_TYPES)}")
+    return stream
+
+def encode_event(name: str, data: Any, stream: str) -> str:
+    body = json.dumps(data, ensure_ascii=False)
+    if stream == "sse":
+        return f"event: {name}\ndata: {body}\n\n"
+    return f'{{"{name}":{body}}}\n'
+
+def streaming_response(events: AsyncIterator[List[Tuple[str, Any]]], stream: str) -> StreamingResponse:
+    """Send batches of ``(event, data)`` as NDJSON lines (``{"event": data}``) or SSE events"""
+    async def body():
+        async for batch in events:
+            yield "".join(encode_event(name, data, stream) for name, data in batch)
+    # Proxies must pass each batch on as it is written
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[stream],
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def json_array(batches: AsyncIterator[List[Any]]) -> AsyncIterator[str]:
+    """Encode batches of items as one JSON array, a batch at a time"""
+    yield "["
+    separator = ""
+    async for batch in batches:
+        if batch:
+            yield separator + ",".join(json.dumps(item, ensure_ascii=False) for item in batch)
+            separator = ","
+    yield "]"
+
+def parse_search_filters(filters: Any) -> Optional[Dict[str, Any]]:
+    """Validate ``{"field": value or [values]}`` over the filterable payload fields"""
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise HTTPException(status_code=400, detail="filters must be an object")
+    for field, value in filters.items():
+        if field not in SEARCH_FILTER_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Cannot filter on {field}; use one of {', '.join(SEARCH_FILTER_FIELDS)}")
+        values = value if isinstance(value, list) else [value]
+        if not values or not all(isinstance(item, str) for item in values):
+            raise HTTPException(status_code=400, detail=f"Filter {field} must be a string or a list of strings")
+    return filters
+
+def parse_search_mode(mode: Any, default: str = SEARCH_DEFAULT_MODE) -> str:
+    mode = mode or default
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported search mode: {mode}; use one of {', '.join(SEARCH_MODES)}")
+    return mode
+
+def parse_search_page(limit: Any, offset: Any) -> Tuple[int, int]:
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be a non-negative integer")
+    if offset + limit > SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"offset + limit must not exceed {SEARCH_MAX_RESULTS}")
+    return limit, offset
+
+def parse_text_mode(text: Any, default: str = "full") -> str:
+    text = text or default
+    if text not in TEXT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported text mode: {text}; use one of {', '.join(TEXT_MODES)}")
+    return text
+
+class SearchSpec(NamedTuple):
+    query: str
+    limit: int
+    filters: Optional[Dict[str, Any]]
+    mode: str
+    offset: int = 0
+    # How much chunk text each hit carries; see snippets.TEXT_MODES
+    text: str = "full"
+
+def parse_search(query: dict, default: Optional[SearchSpec] = None) -> SearchSpec:
+    """Validate one search request; fields it leaves out come from ``default``"""
+    default = default or SearchSpec("", 10, None, SEARCH_DEFAULT_MODE)
+    limit, offset = parse_search_page(query.get("limit", default.limit), query.get("offset", default.offset))
+    return SearchSpec(
+        query=normalize_query(query.get("query", "")),
+        limit=limit,
+        filters=parse_search_filters(query["filters"]) if "filters" in query else default.filters,
+        mode=parse_search_mode(query.get("mode"), default.mode),
+        offset=offset,
+        text=parse_text_mode(query.get("text"), default.text),
+    )
+
+def search_key(qdrant_url: str, qdrant_api_key: Optional[str], index_name: str, search: SearchSpec):
+    return search_cache.key(qdrant_url, index_name, search.query, search.limit, search.filters, search.mode,
+                            search.offset, search.text, qdrant_api_key)
+
 async def search_documents(index_name: str, query: dict, qdrant_url: str, qdrant_api_key: Optional[str] = None):
-    """Search documents in an index"""
-    if index_name not in indexes_storage:
+    """Search documents in an index, answering repeated queries from the search cache
+
+    With ``stream`` set to ``ndjson`` or ``sse`` the hits are sent as they
+    are resolved instead of in one response.
+    """
+    if await metadata_store.get_index(index_name) is None:
         raise HTTPException(status_code=404, detail="Index not found")
     
-    query_text = query.get("query", "")
-    limit = query.get("limit", 10)
+    search = parse_search(query)
+    stream = parse_stream(query.get("stream"))
+    # Cached and lexical results never reach the vector store, so check the
+    # credentials here; a pooled client that passed is not probed again
+    await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    key = search_key(qdrant_url, qdrant_api_key, index_name, search)
+    if stream is not None:
+        return await stream_search(index_name, search, key, stream, qdrant_url, qdrant_api_key)
     
-    query_embeddings = await get_embeddings([query_text])
-    query_embedding = query_embeddings[0]
+    async def compute():
+        return (await run_searches(index_name, [search], qdrant_url, qdrant_api_key))[0]
+    return await search_cache.get_or_compute(key, compute)
+
+async def stream_search(index_name: str, search: SearchSpec, key, stream: str,
+                        qdrant_url: str, qdrant_api_key: Optional[str] = None) -> StreamingResponse:
+    """Stream ``hit`` events, ``SEARCH_STREAM_BLOCK`` at a time, then ``done`` with the count and next offset
+
+    Ranking finishes before the response starts, so its errors still get a
+    status code; only the texts are read while streaming, one block at a
+    time. A failure after that ends the stream with an ``error`` event.
+    """
+    cached = search_cache.lookup(key)
+    if cached is not None:
+        async def replay():
+            results = cached["results"]
+            for start in range(0, len(results), SEARCH_STREAM_BLOCK):
+                yield [("hit", hit) for hit in results[start:start + SEARCH_STREAM_BLOCK]]
+            yield [("done", {"count": len(results), "next_offset": cached["next_offset"]})]
+        return streaming_response(replay(), stream)
     
-    try:
-        qdrant_client = get_qdrant_client(qdrant_url, qdrant_api_key)
-        search_results = qdrant_client.search(
-            collection_name=index_name,
-            query_vector=query_embedding,
-            limit=limit
-        )
-        
+    ranked = await rank_searches(index_name, [search], qdrant_url, qdrant_api_key)
+    ranking = ranked.rankings[0]
+    
+    async def events():
         results = []
-        for result in search_results:
-            results.append({
-                "id": result.id,
-                "score": result.score,
-                "text": result.payload.get("text", ""),
-                "filename": result.payload.get("filename", ""),
-                "document_id": result.payload.get("document_id", "")
-            })
-        
-        return {"results": results}
+        try:
+            for start in range(0, len(ranking), SEARCH_STREAM_BLOCK):
+                block = ranking[start:start + SEARCH_STREAM_BLOCK]
+                texts = await read_texts(index_name, [point_id for point_id, _ in block], ranked,
+                                         qdrant_url, qdrant_api_key)
+                hits = format_hits(search, block, ranked, texts)
+                results.extend(hits)
+                yield [("hit", hit) for hit in hits]
+        except HTTPException as e:
+            yield [("error", {"detail": e.detail})]
+            return
+        # Pages are bounded by SEARCH_MAX_RESULTS, so keeping the hits for the cache is cheap
+        search_cache.put(key, {"results": results, "next_offset": ranked.next_offsets[0]})
+        yield [("done", {"count": len(results), "next_offset": ranked.next_offsets[0]})]
+    return streaming_response(events(), stream)
+
+def format_hit(point_id: Any, score: float, payload: Dict[str, Any], text: Optional[str],
+               text_mode: str = "full", terms: Set[str] = frozenset()) -> Dict[str, Any]:
+    text = text if text is not None else payload.get("text", "")
+    hit = {
+        "id": point_id,
+        "score": score,
+        "text": snippet(text, terms, text_mode),
+        "filename": payload.get("filename", ""),
+        "document_id": payload.get("document_id", "")
+    }
+    if text_mode == "none":
+        del hit["text"]
+    return hit
+
+class RankedSearches(NamedTuple):
+    # One page of (point id, score) per search, and the offset of the next page or None
+    rankings: List[List[Tuple[str, float]]]
+    next_offsets: List[Optional[int]]
+    payloads: Dict[str, Dict[str, Any]]
+    # Points known to still exist in the vector store
+    confirmed: Set[str]
+
+def format_hits(search: SearchSpec, ranking: List[Tuple[str, float]], ranked: RankedSearches,
+                texts: Dict[str, str]) -> List[Dict[str, Any]]:
+    terms = query_terms(search.query) if search.text in ("snippet", "highlight") else frozenset()
+    # Lexical hits whose point is gone from the vector store are dropped
+    return [format_hit(point_id, score, ranked.payloads[point_id], texts.get(point_id), search.text, terms)
+            for point_id, score in ranking if point_id in ranked.confirmed]
+
+async def rank_searches(index_name: str, searches: List[SearchSpec],
+                        qdrant_url: str, qdrant_api_key: Optional[str] = None) -> RankedSearches:
+    """Rank the requested page of every search, without reading any chunk text
+
+    The dense side of every search shares one embedding call and one Qdrant
+    request, and runs concurrently with the BM25 side in a thread. Hybrid
+    searches take extra candidates from both and fuse them by reciprocal
+    rank. Quantized indexes are searched with oversampling and rescored
+    with the full vectors. Each retriever is asked for one hit past the
+    page to tell whether another page follows.
+    """
+    lexical = lexical_indexes.get(index_name)
+    storage = index_storage(await metadata_store.get_index(index_name))
+    
+    def depth(search: SearchSpec) -> int:
+        end = search.offset + search.limit + 1
+        return max(end, SEARCH_HYBRID_CANDIDATES) if search.mode == "hybrid" else end
+    
+    dense = [i for i, search in enumerate(searches) if search.mode != "lexical"]
+    sparse = [i for i, search in enumerate(searches) if search.mode != "vector"]
+    
+    async def dense_search() -> Dict[int, List[Any]]:
+        if not dense:
+            return {}
+        with metrics.stage("search.embed"):
+            embeddings = await get_embeddings([searches[i].query for i in dense], storage["dimensions"])
+        requests = [
+            {
+                "vector": embedding,
+                "limit": depth(searches[i]),
+                "filter": payload_filter(searches[i].filters) if searches[i].filters else None,
+                "params": search_params(storage)
+            }
+            for i, embedding in zip(dense, embeddings)
+        ]
+        qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+        with metrics.stage("search.vector"):
+            if len(requests) == 1:
+                hits = [await qdrant_client.search(index_name, requests[0]["vector"].tolist(), requests[0]["limit"],
+                                                   query_filter=requests[0]["filter"], params=requests[0]["params"])]
+            else:
+                hits = await qdrant_client.search_batch(index_name, requests)
+        return dict(zip(dense, hits))
+    
+    def sparse_search() -> Dict[int, List[Tuple[str, float, Any]]]:
+        with metrics.stage("search.lexical"):
+            return {i: lexical.search(searches[i].query, depth(searches[i]), searches[i].filters) for i in sparse}
+    
+    try:
+        dense_hits, sparse_hits = await asyncio.gather(dense_search(), asyncio.to_thread(sparse_search))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    
+    payloads: Dict[str, Dict[str, Any]] = {}
+    for hits in dense_hits.values():
+        for hit in hits:
+            payloads[str(hit.id)] = hit.payload
+    confirmed = set(payloads)
+    # BM25 hits carry their document's fields, so need no vector store round trip
+    for hits in sparse_hits.values():
+        for point_id, _, document in hits:
+            if point_id not in payloads:
+                payloads[point_id] = {"document_id": document[0], "filename": document[1], "file_type": document[2]}
+    
+    rankings: List[List[Tuple[str, float]]] = []
+    next_offsets: List[Optional[int]] = []
+    for i, search in enumerate(searches):
+        if search.mode == "vector":
+            ranking = [(str(hit.id), hit.score) for hit in dense_hits[i]]
+        elif search.mode == "lexical":
+            ranking = [(point_id, score) for point_id, score, _ in sparse_hits[i]]
+        else:
+            ranking = reciprocal_rank_fusion([
+                [str(hit.id) for hit in dense_hits[i]],
+                [point_id for point_id, _, _ in sparse_hits[i]],
+            ])
+        end = search.offset + search.limit
+        rankings.append(ranking[search.offset:end])
+        next_offsets.append(end if len(ranking) > end else None)
+    return RankedSearches(rankings, next_offsets, payloads, confirmed)
+
+async def read_texts(index_name: str, point_ids: List[str], ranked: RankedSearches,
+                     qdrant_url: str, qdrant_api_key: Optional[str] = None) -> Dict[str, str]:
+    """Read the chunk texts of ranked points in one pass, confirming the points that have one
+
+    Only points written before texts left the payload need a retrieve
+    request; their payloads are updated in place.
+    """
+    with metrics.stage("search.texts"):
+        texts = await asyncio.to_thread(chunk_stores.get(index_name).get_many, point_ids)
+    ranked.confirmed.update(texts)
+    missing = [point_id for point_id in point_ids if point_id not in ranked.confirmed]
+    if missing:
+        try:
+            qdrant_client = await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+            for point in await qdrant_client.retrieve(index_name, missing):
+                ranked.payloads[str(point.id)] = point.payload
+                ranked.confirmed.add(str(point.id))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    return texts
+
+async def run_searches(index_name: str, searches: List[SearchSpec],
+                       qdrant_url: str, qdrant_api_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run searches together, returning one ``{"results", "next_offset"}`` response each"""
+    ranked = await rank_searches(index_name, searches, qdrant_url, qdrant_api_key)
+    point_ids = list(dict.fromkeys(point_id for ranking in ranked.rankings for point_id, _ in ranking))
+    texts = await read_texts(index_name, point_ids, ranked, qdrant_url, qdrant_api_key)
+    return [
+        {"results": format_hits(search, ranking, ranked, texts), "next_offset": next_offset}
+        for search, ranking, next_offset in zip(searches, ranked.rankings, ranked.next_offsets)
+    ]
+
+async def search_documents_batch(index_name: str, body: dict, qdrant_url: str, qdrant_api_key: Optional[str] = None):
+    """Answer many queries with one embedding call and one Qdrant search-batch request
+
+    Each query may set its own ``limit``, ``offset``, ``filters``, ``mode``
+    and ``text``; the top-level values are the defaults. Results and next
+    offsets come back in query order. Cached queries are answered from the
+    search cache and repeated queries are searched once.
+    """
+    if await metadata_store.get_index(index_name) is None:
+        raise HTTPException(status_code=404, detail="Index not found")
+    
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list")
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
+    default = parse_search({key: value for key, value in body.items() if key != "queries"})
+    await get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    
+    keys = []
+    searches: Dict[Any, SearchSpec] = {}
+    for query in queries:
+        if isinstance(query, str):
+            query = {"query": query}
+        if not isinstance(query, dict):
+            raise HTTPException(status_code=400, detail="Each query must be a string or an object")
+        search = parse_search(query, default)
+        key = search_key(qdrant_url, qdrant_api_key, index_name, search)
+        keys.append(key)
+        if key not in searches:
+            searches[key] = search
+    
+    responses = {}
+    for key in searches:
+        cached = search_cache.lookup(key)
+        if cached is not None:
+            responses[key] = cached
+    missing = [key for key in searches if key not in responses]
+    
+    if missing:
+        computed = await run_searches(index_name, [searches[key] for key in missing], qdrant_url, qdrant_api_key)
+        for key, response in zip(missing, computed):
+            responses[key] = response
+            search_cache.put(key, response)
+    
+    return {
+        "results": [responses[key]["results"] for key in keys],
+        "next_offsets": [responses[key]["next_offset"] for key in keys],
+    }
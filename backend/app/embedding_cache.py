@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+EMBEDDING_CACHE_DISK_MAX_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ITEMS", "0"))
+
+# SQLite limits host parameters per statement; stay well below it
+SQLITE_BATCH = 500
+
+
+def cache_key(model: str, text: str) -> bytes:
+    """Content address of an embedding: sha256 over the model name and the text"""
+    return hashlib.sha256(model.encode() + b"\0" + text.encode()).digest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: a bounded in-memory LRU over a SQLite file
+
+    Vectors are stored as float32 blobs keyed by ``cache_key``. An empty
+    ``path`` disables the disk tier; ``disk_max_items`` of 0 leaves it
+    unbounded, otherwise the oldest rows are pruned once it is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+                 disk_max_items: int = EMBEDDING_CACHE_DISK_MAX_ITEMS):
+        self.path = path
+        self.memory_items = memory_items
+        self.disk_max_items = disk_max_items
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self.writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db = db
+        return self._db
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self.memory_evictions += 1
+
+    def _lookup_memory(self, model: str, texts: Sequence[str]):
+        keys = [cache_key(model, text) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        return found, missing
+
+    def _lookup_disk(self, found: List[Optional[np.ndarray]], missing: Dict[bytes, List[int]]):
+        rows = []
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                missing_keys = list(missing)
+                for start in range(0, len(missing_keys), SQLITE_BATCH):
+                    batch = missing_keys[start:start + SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows.extend(db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall())
+        for key, blob in rows:
+            vector = np.frombuffer(blob, dtype=np.float32)
+            self._remember(key, vector)
+            for i in missing.pop(key):
+                found[i] = vector
+                self.disk_hits += 1
+        self.misses += sum(len(indices) for indices in missing.values())
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up texts, returning a float32 vector or None per text"""
+        found, missing = self._lookup_memory(model, texts)
+        if missing:
+            self._lookup_disk(found, missing)
+        return found
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Any]):
+        """Store vectors for texts in both tiers"""
+        rows = []
+        for text, vector in zip(texts, vectors):
+            array = np.asarray(vector, dtype=np.float32)
+            key = cache_key(model, text)
+            self._remember(key, array)
+            rows.append((key, array.tobytes()))
+        if not rows:
+            return
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            db.execute("BEGIN")
+            db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            db.execute("COMMIT")
+            self.writes += len(rows)
+            if self.disk_max_items:
+                self._prune(db)
+
+    def _prune(self, db: sqlite3.Connection):
+        count = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.disk_max_items
+        if excess > 0:
+            # Drop the oldest rows plus 10% headroom so pruning is not paid on every write
+            excess += self.disk_max_items // 10
+            deleted = db.execute("DELETE FROM embeddings WHERE rowid IN "
+                                 "(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)", (excess,))
+            self.disk_evictions += deleted.rowcount
+
+    async def aget_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Like get_many, but only disk lookups leave the event loop"""
+        found, missing = self._lookup_memory(model, texts)
+        if missing:
+            await asyncio.to_thread(self._lookup_disk, found, missing)
+        return found
+
+    async def aput_many(self, model: str, texts: Sequence[str], vectors: Sequence[Any]):
+        await asyncio.to_thread(self.put_many, model, texts, vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "memory_capacity": self.memory_items,
+            "disk_path": self.path or None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "memory_evictions": self.memory_evictions,
+            "disk_evictions": self.disk_evictions,
+            "writes": self.writes,
+        }
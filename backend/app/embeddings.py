@@ -0,0 +1,374 @@
+import asyncio
+import hashlib
+import importlib
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import metrics
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+MOCK_EMBEDDING_DIMENSIONS = int(os.getenv("MOCK_EMBEDDING_DIMENSIONS", "1536"))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "256"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_BACKOFF_BASE = float(os.getenv("EMBEDDING_BACKOFF_BASE", "0.5"))
+EMBEDDING_BACKOFF_MAX = float(os.getenv("EMBEDDING_BACKOFF_MAX", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+EMBEDDING_REQUEST_SECONDS = metrics.histogram("embedding_request_seconds", "Embedding provider calls, one per batch",
+                                              ("model",))
+EMBEDDING_REQUESTS = metrics.counter("embedding_requests_total", "Embedding provider calls by outcome",
+                                     ("model", "outcome"))
+EMBEDDING_IN_FLIGHT = metrics.gauge("embedding_requests_in_flight", "Embedding provider calls awaiting a response")
+EMBEDDING_TEXTS = metrics.counter("embedding_texts_total", "Texts sent to the embedding provider", ("model",))
+EMBEDDING_TOKENS = metrics.counter("embedding_tokens_total", "Estimated tokens sent to the embedding provider",
+                                   ("model",))
+
+OPENAI_MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise ~4 characters per token"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def pack_batches(token_counts: List[int], max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+                 max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS) -> List[List[int]]:
+    """Group text indices into batches bounded by item count and token count
+
+    Order is preserved; a single text larger than ``max_tokens`` gets a batch
+    of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_retryable(error: Exception) -> bool:
+    # The SDK is imported with the first client, so before that no error can be one of its own
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_delay(attempt: int, error: Optional[Exception] = None,
+                base: float = EMBEDDING_BACKOFF_BASE, cap: float = EMBEDDING_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After when present"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class EmbeddingStats:
+    """Per-call throughput numbers for an embedding run"""
+
+    def __init__(self, chunks: int = 0):
+        self.chunks = chunks
+        self.batches = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def finish(self) -> "EmbeddingStats":
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def merge(self, other: "EmbeddingStats") -> "EmbeddingStats":
+        """Accumulate another run, e.g. one window of a streamed upload"""
+        self.chunks += other.chunks
+        self.batches += other.batches
+        self.retries += other.retries
+        self.cache_hits += other.cache_hits
+        self.tokens += other.tokens
+        self.seconds += other.seconds
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "estimated_tokens": self.tokens,
+            "seconds": round(self.seconds, 4),
+            "chunks_per_second": round(self.chunks / self.seconds, 1) if self.seconds > 0 else None,
+        }
+
+
+class EmbeddingProvider:
+    """Interface for embedding backends driven by EmbeddingPipeline
+
+    Subclasses set ``model`` (used in cache keys) and ``dimensions`` and
+    implement ``embed_batch``, returning a ``(len(texts), dimensions)``
+    float32 matrix. Batching, concurrency and retries are handled by the
+    pipeline; ``is_retryable`` decides which errors are transient.
+    ``shortenable`` models keep their meaning when cut to a prefix of their
+    dimensions, so indexes may store shorter vectors.
+    """
+
+    model = "unknown"
+    dimensions = 0
+    shortenable = False
+
+    def bind(self):
+        """Called once per event loop before the first batch"""
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        return is_retryable(error)
+
+
+def openai_client():
+    import openai
+    return openai.AsyncOpenAI(max_retries=0)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI-compatible embeddings API
+
+    The endpoint honours ``OPENAI_BASE_URL``, so a local fake server can be
+    used in place of OpenAI. The SDK is only imported, and the client only
+    built, when the first batch is embedded.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, client_factory: Optional[Callable[[], Any]] = None):
+        self.model = model
+        self.dimensions = OPENAI_MODEL_DIMENSIONS.get(model, 1536)
+        self.shortenable = model.startswith("text-embedding-3")
+        self.client_factory = client_factory or openai_client
+        self._client = None
+
+    def bind(self):
+        self._client = self.client_factory()
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        response = await self._client.embeddings.create(model=self.model, input=texts)
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.asarray([item.embedding for item in data], dtype=np.float32)
+
+
+def shorten_embeddings(embeddings: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the first ``dimensions`` components of each row and rescale it to unit length
+
+    For text-embedding-3 this gives the same vectors as asking the API for
+    ``dimensions``, so one cached full-size embedding serves every index.
+    """
+    if dimensions >= embeddings.shape[1]:
+        return embeddings
+    shortened = embeddings[:, :dimensions]
+    return shortened / np.maximum(np.linalg.norm(shortened, axis=1, keepdims=True), 1e-12)
+
+
+def text_seeds(texts: List[str]) -> np.ndarray:
+    """Stable 64-bit seed per text, independent of PYTHONHASHSEED"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little") for text in texts),
+        dtype=np.uint64, count=len(texts),
+    )
+
+
+def splitmix64_uniform(seeds: np.ndarray, dimensions: int) -> np.ndarray:
+    """Counter-based splitmix64 stream per seed, mapped to float32 in [-1, 1)"""
+    with np.errstate(over="ignore"):
+        counters = np.arange(1, dimensions + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        x = seeds[:, None] + counters[None, :]
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    # The top 24 bits give an exactly representable float32 in [0, 1)
+    unit = (x >> np.uint64(40)).astype(np.float32) * np.float32(2.0 ** -24)
+    return unit * np.float32(2.0) - np.float32(1.0)
+
+
+class MockEmbeddingProvider(EmbeddingProvider):
+    """Deterministic offline embeddings for CI and load tests
+
+    Each vector depends only on its text, so results are reproducible across
+    runs and processes, and no global RNG state is touched.
+    """
+
+    shortenable = True
+
+    def __init__(self, dimensions: int = MOCK_EMBEDDING_DIMENSIONS, block_rows: int = 1024):
+        self.dimensions = dimensions
+        self.model = f"mock-splitmix64-{dimensions}"
+        self.block_rows = block_rows
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        seeds = text_seeds(texts)
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), self.block_rows):
+            out[start:start + self.block_rows] = splitmix64_uniform(seeds[start:start + self.block_rows], self.dimensions)
+        return out
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+def load_provider(spec: Optional[str] = None) -> EmbeddingProvider:
+    """Build the provider named by ``spec`` or ``EMBEDDING_PROVIDER``
+
+    ``openai`` and ``mock`` are built in; anything else is imported as
+    ``package.module:ClassName`` and instantiated without arguments. The
+    default is ``openai`` when ``OPENAI_API_KEY`` is set and ``mock`` otherwise.
+    """
+    spec = spec or EMBEDDING_PROVIDER or ("openai" if os.getenv("OPENAI_API_KEY") else "mock")
+    if spec == "openai":
+        return OpenAIEmbeddingProvider()
+    if spec == "mock":
+        return MockEmbeddingProvider()
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown embedding provider: {spec}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class EmbeddingPipeline:
+    """Batched, concurrent and retried calls to an EmbeddingProvider
+
+    Without an explicit provider, the configured one is loaded on first use.
+    """
+
+    def __init__(self, provider: Optional[EmbeddingProvider] = None,
+                 max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+                 max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+                 concurrency: int = EMBEDDING_CONCURRENCY,
+                 max_retries: int = EMBEDDING_MAX_RETRIES):
+        self._provider = provider
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    @property
+    def provider(self) -> EmbeddingProvider:
+        if self._provider is None:
+            self._provider = load_provider()
+        return self._provider
+
+    @property
+    def model(self) -> str:
+        return self.provider.model
+
+    @property
+    def dimensions(self) -> int:
+        return self.provider.dimensions
+
+    @property
+    def shortenable(self) -> bool:
+        return self.provider.shortenable
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.provider.bind()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+
+    async def embed(self, texts: List[str]):
+        """Embed texts and return (float32 matrix in input order, EmbeddingStats)"""
+        stats = EmbeddingStats(len(texts))
+        embeddings = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        if not texts:
+            return embeddings, stats.finish()
+        self._bind()
+        token_counts = [estimate_tokens(text) for text in texts]
+        stats.tokens = sum(token_counts)
+        EMBEDDING_TEXTS.inc(len(texts), model=self.model)
+        EMBEDDING_TOKENS.inc(stats.tokens, model=self.model)
+        batches = pack_batches(token_counts, self.max_items, self.max_tokens)
+        stats.batches = len(batches)
+
+        async def run(indices: List[int]):
+            async with self._semaphore:
+                vectors = await self._embed_batch([texts[i] for i in indices], stats)
+            embeddings[indices] = vectors
+
+        await asyncio.gather(*(run(indices) for indices in batches))
+        return embeddings, stats.finish()
+
+    async def _embed_batch(self, batch: List[str], stats: EmbeddingStats) -> np.ndarray:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                with EMBEDDING_IN_FLIGHT.track():
+                    vectors = await self.provider.embed_batch(batch)
+                if vectors.shape != (len(batch), self.dimensions):
+                    raise ValueError(f"Embedding provider returned shape {vectors.shape}, "
+                                     f"expected {(len(batch), self.dimensions)}")
+                self._observe(started, "ok")
+                return vectors
+            except Exception as e:
+                retrying = attempt < self.max_retries and self.provider.is_retryable(e)
+                self._observe(started, "retry" if retrying else "error")
+                if not retrying:
+                    raise
+                stats.retries += 1
+                await asyncio.sleep(retry_delay(attempt, e))
+                attempt += 1
+
+    def _observe(self, started: float, outcome: str):
+        seconds = time.perf_counter() - started
+        EMBEDDING_REQUEST_SECONDS.observe(seconds, model=self.model)
+        EMBEDDING_REQUESTS.inc(model=self.model, outcome=outcome)
+        metrics.trace_stage("embedding", seconds)
@@ -0,0 +1,561 @@
+import asyncio
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import threading
+import time
+import zipfile
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from fastapi import HTTPException
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_PDF_PAGES_PER_SHARD = int(os.getenv("EXTRACTION_PDF_PAGES_PER_SHARD", "16"))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+EXTRACTION_MAX_MEMORY_MB = int(os.getenv("EXTRACTION_MAX_MEMORY_MB", "1024"))
+EXTRACTION_SEGMENT_CHARS = int(os.getenv("EXTRACTION_SEGMENT_CHARS", "65536"))
+EXTRACTION_TEXT_SHARD_BYTES = int(os.getenv("EXTRACTION_TEXT_SHARD_KB", "1024")) * 1024
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "xlsx", "xls", "md", "txt")
+
+# Seconds a task may run past its own alarm before its worker process is killed
+HARD_TIMEOUT_GRACE = 5.0
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def file_extension(filename: str) -> str:
+    return filename.lower().split('.')[-1]
+
+
+# ---------------------------------------------------------------------------
+# Worker-side functions. These run in pool processes and import their parser
+# on first use, so the pool starts quickly and the API process never loads them.
+# ---------------------------------------------------------------------------
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _init_worker(max_memory_mb: int):
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    if max_memory_mb > 0:
+        try:
+            import resource
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _budgeted(func: Callable, seconds: float, *args):
+    """Run func under a SIGALRM deadline when called in a pool worker"""
+    in_worker = threading.current_thread() is threading.main_thread() and multiprocessing.parent_process() is not None
+    if in_worker:
+        signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.001))
+    try:
+        return func(*args)
+    finally:
+        if in_worker:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _group_lines(lines: Iterable[str], limit: int = EXTRACTION_SEGMENT_CHARS) -> Iterator[str]:
+    """Join lines into segments of roughly ``limit`` characters"""
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        current.append(line)
+        size += len(line) + 1
+        if size >= limit:
+            yield "\n".join(current) + "\n"
+            current = []
+            size = 0
+    if current:
+        yield "\n".join(current) + "\n"
+
+
+def pdf_shards(path: str) -> Tuple[int, List[Tuple[int, int]]]:
+    """(page count, page ranges to extract as separate tasks)"""
+    import PyPDF2
+    with open(path, "rb") as f:
+        page_count = len(PyPDF2.PdfReader(f).pages)
+    return page_count, [(start, min(start + EXTRACTION_PDF_PAGES_PER_SHARD, page_count))
+                        for start in range(0, page_count, EXTRACTION_PDF_PAGES_PER_SHARD)]
+
+
+def pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    import PyPDF2
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+def _map_range(f, start: int, stop: int) -> Tuple[mmap.mmap, int]:
+    """Map only bytes ``start:stop`` of a file, so a large file does not use up the worker's address space
+
+    Returns the map and the offset of ``start`` within it.
+    """
+    base = start - start % mmap.ALLOCATIONGRANULARITY
+    return mmap.mmap(f.fileno(), stop - base, access=mmap.ACCESS_READ, offset=base), start - base
+
+
+def _text_boundary(f, target: int, stop: int, separators: Sequence[bytes]) -> int:
+    """Offset just past the first separator in ``target:stop``"""
+    view, position = _map_range(f, target, stop)
+    with view:
+        base = target - position
+        for separator in separators:
+            found = view.find(separator, position)
+            if found >= 0:
+                return base + found + len(separator)
+        # No separator nearby: cut between two UTF-8 characters
+        while position < len(view) and view[position] & 0xC0 == 0x80:
+            position += 1
+        return base + position
+
+
+def _byte_ranges(path: str, separators: Sequence[bytes],
+                 shard_bytes: int = EXTRACTION_TEXT_SHARD_BYTES) -> Tuple[int, List[Tuple[int, int]]]:
+    """(range count, byte ranges of about ``shard_bytes`` that end at a separator)"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            target = start + shard_bytes
+            stop = size if target >= size else _text_boundary(f, target, min(size, target + shard_bytes), separators)
+            ranges.append((start, stop))
+            start = stop
+    return len(ranges), ranges
+
+
+def _read_range(path: str, start: int, stop: int) -> Tuple[str, bool]:
+    """Decode bytes ``start:stop`` with universal newlines; also whether the file goes on past them"""
+    with open(path, "rb") as f:
+        view, position = _map_range(f, start, stop)
+        with view:
+            text = view[position:].decode("utf-8")
+        more = stop < os.fstat(f.fileno()).st_size
+    return text.replace("\r\n", "\n").replace("\r", "\n"), more
+
+
+def text_shards(path: str) -> Tuple[int, List[Tuple[int, int]]]:
+    return _byte_ranges(path, (b"\n",))
+
+
+def text_pages(path: str, start: int, stop: int) -> List[str]:
+    return [_read_range(path, start, stop)[0]]
+
+
+def markdown_shards(path: str) -> Tuple[int, List[Tuple[int, int]]]:
+    # Cut between blocks where possible, so each shard renders on its own
+    return _byte_ranges(path, (b"\n\n", b"\n"))
+
+
+def markdown_pages(path: str, start: int, stop: int) -> List[str]:
+    import markdown
+    text, more = _read_range(path, start, stop)
+    plain = re.sub('<[^<]+?>', '', markdown.markdown(text))
+    return [plain + "\n" if more else plain]
+
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+OFFICE_DOCUMENT_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+PACKAGE_RELATIONSHIPS = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+
+def _docx_main_part(archive: zipfile.ZipFile) -> str:
+    try:
+        relationships = ElementTree.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    for relationship in relationships.iter(PACKAGE_RELATIONSHIPS):
+        if relationship.get("Type") == OFFICE_DOCUMENT_RELATIONSHIP:
+            return relationship.get("Target", "").lstrip("/")
+    return "word/document.xml"
+
+
+def _run_text(run: ElementTree.Element) -> str:
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == f"{WORD_NAMESPACE}t":
+            parts.append(child.text or "")
+        elif tag in (f"{WORD_NAMESPACE}tab", f"{WORD_NAMESPACE}ptab"):
+            parts.append("\t")
+        elif tag == f"{WORD_NAMESPACE}cr" or (
+                tag == f"{WORD_NAMESPACE}br" and child.get(f"{WORD_NAMESPACE}type", "textWrapping") == "textWrapping"):
+            parts.append("\n")
+        elif tag == f"{WORD_NAMESPACE}noBreakHyphen":
+            parts.append("-")
+    return "".join(parts)
+
+
+def _paragraph_text(paragraph: ElementTree.Element) -> str:
+    """Text of a w:p the way python-docx reads it: its runs, including those in hyperlinks"""
+    parts = []
+    for child in paragraph:
+        if child.tag == f"{WORD_NAMESPACE}r":
+            parts.append(_run_text(child))
+        elif child.tag == f"{WORD_NAMESPACE}hyperlink":
+            parts.extend(_run_text(run) for run in child.findall(f"{WORD_NAMESPACE}r"))
+    return "".join(parts)
+
+
+def docx_paragraphs(path: str) -> Iterator[str]:
+    """Body paragraphs of a .docx, parsed incrementally so the document tree is never held whole"""
+    with zipfile.ZipFile(path) as archive, archive.open(_docx_main_part(archive)) as document:
+        depth = 0
+        body: Optional[ElementTree.Element] = None
+        for event, element in ElementTree.iterparse(document, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and element.tag == f"{WORD_NAMESPACE}body":
+                    body = element
+                continue
+            depth -= 1
+            if depth == 2 and body is not None:
+                # A direct child of the body is complete; tables are skipped, as python-docx does
+                if element.tag == f"{WORD_NAMESPACE}p":
+                    yield _paragraph_text(element)
+                body.clear()
+
+
+def docx_segments(path: str) -> Iterator[str]:
+    return _group_lines(docx_paragraphs(path))
+
+
+def _sheet_lines(sheet) -> Iterator[str]:
+    for row in sheet.iter_rows(values_only=True):
+        row_text = " ".join([str(cell) if cell is not None else "" for cell in row])
+        if row_text.strip():
+            yield row_text
+
+
+def xlsx_segments(path: str) -> Iterator[str]:
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _group_lines(_sheet_lines(sheet))
+    finally:
+        workbook.close()
+
+
+def spill_segments(extractor: Callable[[str], Iterable[str]], path: str, spill_path: str) -> List[int]:
+    """Write the segments of a file to ``spill_path`` as UTF-8, returning their byte lengths
+
+    Used for formats that cannot be split into byte ranges, so a large file's
+    text goes back to the API process through the disk, a segment at a time.
+    """
+    lengths = []
+    with open(spill_path, "wb") as f:
+        for segment in extractor(path):
+            data = segment.encode("utf-8")
+            f.write(data)
+            lengths.append(len(data))
+    return lengths
+
+
+# Formats split into ranges that are extracted as parallel tasks:
+# (function returning the segment count and the ranges, function extracting one range)
+SHARDED_EXTRACTORS = {
+    "pdf": (pdf_shards, pdf_pages),
+    "md": (markdown_shards, markdown_pages),
+    "txt": (text_shards, text_pages),
+}
+
+SEGMENT_EXTRACTORS = {
+    "docx": docx_segments,
+    "xlsx": xlsx_segments,
+    "xls": xlsx_segments,
+}
+
+
+# ---------------------------------------------------------------------------
+# API-process side
+# ---------------------------------------------------------------------------
+
+class ExtractionWorkerCrashed(Exception):
+    pass
+
+
+class ExtractionHardTimeout(Exception):
+    pass
+
+
+class ExtractionBudget:
+    """Time budget shared by every pool task for one file
+
+    The clock starts when the file's first task starts running, so time
+    spent queued behind other uploads does not count against it.
+    """
+
+    def __init__(self, filename: str, seconds: float = EXTRACTION_TIMEOUT_SECONDS):
+        self.filename = filename
+        self.seconds = seconds
+        self.deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_task(self) -> float:
+        """Seconds left for a task starting now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.deadline is None:
+                self.deadline = now + self.seconds
+            return self.deadline - now
+
+    def timeout_error(self) -> HTTPException:
+        return HTTPException(status_code=400, detail=f"Extraction of {self.filename} exceeded the "
+                                                     f"{self.seconds:g}s time budget")
+
+    def memory_error(self) -> HTTPException:
+        return HTTPException(status_code=400, detail=f"Extraction of {self.filename} exceeded the "
+                                                     f"{EXTRACTION_MAX_MEMORY_MB}MB memory budget")
+
+
+class PoolTask(NamedTuple):
+    budget: ExtractionBudget
+    func: Callable
+    args: tuple
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+
+
+def _worker_main(connection, max_memory_mb: int):
+    """Run tasks sent over ``connection`` until it closes"""
+    _init_worker(max_memory_mb)
+    while True:
+        try:
+            func, seconds, args = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            reply = (True, _budgeted(func, seconds, *args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # The result or exception could not be pickled; nothing was written yet
+            connection.send((False, RuntimeError(str(e if reply[0] else reply[1]))))
+
+
+class ExtractionWorker:
+    """One worker process, fed by its own thread
+
+    The thread knows when each task starts, so it can kill this process
+    alone when a task runs past its deadline plus ``HARD_TIMEOUT_GRACE``
+    (e.g. stuck in C code the alarm cannot interrupt) and start a new one.
+    Tasks on other workers are not affected.
+    """
+
+    def __init__(self, pool: "ExtractionPool"):
+        self.pool = pool
+        self.process = None
+        self.connection = None
+        self.restarts = 0
+        self.thread = threading.Thread(target=self._serve, name="extraction-worker", daemon=True)
+        self.thread.start()
+
+    def _ensure_process(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self._stop_process()
+        context = multiprocessing.get_context("spawn")
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, self.pool.max_memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+
+    def _stop_process(self, kill: bool = False):
+        process, connection = self.process, self.connection
+        self.process = self.connection = None
+        if connection is not None:
+            connection.close()
+        if process is None:
+            return
+        if kill:
+            process.kill()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _run(self, task: PoolTask) -> Tuple[bool, Any]:
+        seconds = task.budget.start_task()
+        if seconds <= 0:
+            return False, ExtractionTimeout()
+        self._ensure_process()
+        try:
+            self.connection.send((task.func, seconds, task.args))
+            if self.connection.poll(seconds + HARD_TIMEOUT_GRACE):
+                return self.connection.recv()
+        except (EOFError, OSError):
+            # The process died, e.g. killed by the OOM killer
+            self._stop_process(kill=True)
+            self.restarts += 1
+            return False, ExtractionWorkerCrashed()
+        self._stop_process(kill=True)
+        self.restarts += 1
+        return False, ExtractionHardTimeout()
+
+    def _serve(self):
+        while True:
+            task = self.pool.tasks.get()
+            if task is None:
+                break
+            if task.future.cancelled():
+                continue
+            try:
+                ok, value = self._run(task)
+            except Exception as e:
+                ok, value = False, e
+            try:
+                task.loop.call_soon_threadsafe(_resolve, task.future, ok, value)
+            except RuntimeError:
+                # The event loop is closed
+                pass
+        self._stop_process()
+
+
+def _resolve(future: asyncio.Future, ok: bool, value: Any):
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class ExtractionPool:
+    """Worker processes started on first use, sharing one task queue"""
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS, max_memory_mb: int = EXTRACTION_MAX_MEMORY_MB):
+        self.max_memory_mb = max_memory_mb
+        self.tasks: "queue.Queue[Optional[PoolTask]]" = queue.Queue()
+        self.workers = [ExtractionWorker(self) for _ in range(max(workers, 1))]
+
+    def submit(self, budget: ExtractionBudget, func: Callable, *args) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.tasks.put(PoolTask(budget, func, args, future, loop))
+        return future
+
+    def shutdown(self):
+        """Drop queued tasks, let running ones finish and stop every worker"""
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                try:
+                    task.loop.call_soon_threadsafe(task.future.cancel)
+                except RuntimeError:
+                    pass
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.thread.join()
+
+
+_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ExtractionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def submit(budget: ExtractionBudget, func: Callable, *args) -> asyncio.Future:
+    return get_pool().submit(budget, func, *args)
+
+
+async def await_task(budget: ExtractionBudget, future: asyncio.Future):
+    try:
+        return await future
+    except (ExtractionTimeout, ExtractionHardTimeout):
+        raise budget.timeout_error()
+    except MemoryError:
+        raise budget.memory_error()
+    except ExtractionWorkerCrashed:
+        raise HTTPException(status_code=500, detail=f"Extraction worker crashed while processing {budget.filename}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+
+
+async def iter_pages(path: str, filename: str,
+                     timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+                     on_total: Optional[Callable[[int], None]] = None) -> AsyncIterator[str]:
+    """Yield extracted text segments (pages, text ranges, paragraph groups, sheet rows) in order
+
+    Parsing runs in a process pool. PDFs are sharded by page range and text
+    and markdown by byte range, and the shards run in parallel, so callers
+    can start chunking the first pages while later ones are still being
+    parsed. Other formats are parsed in one task that spills its segments to
+    disk. Either way, memory stays bounded however large the file is.
+    ``on_total`` is called with the segment count as soon as it is known.
+    """
+    extension = file_extension(filename)
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {extension}")
+    budget = ExtractionBudget(filename, timeout)
+
+    if extension in SEGMENT_EXTRACTORS:
+        spill_path = f"{path}.segments"
+        try:
+            lengths = await await_task(budget, submit(budget, spill_segments, SEGMENT_EXTRACTORS[extension],
+                                                      path, spill_path))
+            if on_total is not None:
+                on_total(len(lengths))
+            with open(spill_path, "rb") as f:
+                for length in lengths:
+                    yield f.read(length).decode("utf-8")
+        finally:
+            try:
+                os.unlink(spill_path)
+            except FileNotFoundError:
+                pass
+        return
+
+    count_shards, extract_shard = SHARDED_EXTRACTORS[extension]
+    total, shards = await await_task(budget, submit(budget, count_shards, path))
+    if on_total is not None:
+        on_total(total)
+    # Keep a bounded number of shards in flight so parsed pages do not pile
+    # up faster than the caller consumes them
+    window = max(EXTRACTION_WORKERS * 2, 1)
+    pending: List[asyncio.Future] = []
+    next_shard = 0
+    try:
+        while next_shard < len(shards) or pending:
+            while next_shard < len(shards) and len(pending) < window:
+                pending.append(submit(budget, extract_shard, path, *shards[next_shard]))
+                next_shard += 1
+            for page in await await_task(budget, pending.pop(0)):
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,47 @@
+import hashlib
+import uuid
+from typing import Dict, List, Sequence
+
+# Fixed namespace so a chunk maps to the same point id on every server
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3d2a-8b4e-5f7a-9c0d-1e2f3a4b5c6d")
+
+
+def content_hasher():
+    """Incremental sha256 for hashing a file while it is copied"""
+    return hashlib.sha256()
+
+
+def chunking_signature(method: str, unit: str, chunk_size: int, chunk_overlap: int) -> str:
+    """Identical bytes only produce identical chunks under identical settings"""
+    return f"{method}:{unit}:{chunk_size}:{chunk_overlap}"
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def point_id(doc_id: str, text_hash: str, occurrence: int = 0) -> str:
+    """Deterministic point id for the ``occurrence``-th chunk of a document with this text"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{doc_id}:{text_hash}:{occurrence}"))
+
+
+class ChunkFingerprints:
+    """Assign content-derived point ids to a document's chunks in order
+
+    Repeated chunks in one document (boilerplate, headers) are numbered by
+    occurrence so each still gets its own point, and an unchanged chunk
+    keeps its id across versions of the document.
+    """
+
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self._seen: Dict[str, int] = {}
+
+    def assign(self, chunks: Sequence[str]) -> List[str]:
+        ids = []
+        for chunk in chunks:
+            text_hash = chunk_hash(chunk)
+            occurrence = self._seen.get(text_hash, 0)
+            self._seen[text_hash] = occurrence + 1
+            ids.append(point_id(self.doc_id, text_hash, occurrence))
+        return ids
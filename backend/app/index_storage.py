@@ -0,0 +1,131 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+# Expected chunk counts up to which the small and medium presets are chosen
+INDEX_STORAGE_SMALL_MAX_CHUNKS = int(os.getenv("INDEX_STORAGE_SMALL_MAX_CHUNKS", "250000"))
+INDEX_STORAGE_MEDIUM_MAX_CHUNKS = int(os.getenv("INDEX_STORAGE_MEDIUM_MAX_CHUNKS", "5000000"))
+INDEX_STORAGE_DEFAULT_PRESET = os.getenv("INDEX_STORAGE_DEFAULT_PRESET", "small")
+
+QUANTIZATIONS = ("none", "scalar", "binary")
+
+STORAGE_PRESETS: Dict[str, Dict[str, Any]] = {
+    # Full-precision vectors and graph in RAM; nothing to rescore
+    "small": {"quantization": "none", "on_disk": False, "hnsw_m": 16, "hnsw_ef_construct": 100,
+              "hnsw_on_disk": False, "oversampling": 1.0},
+    # int8 vectors in RAM, 4x smaller; float32 originals on disk for rescoring
+    "medium": {"quantization": "scalar", "on_disk": True, "hnsw_m": 16, "hnsw_ef_construct": 128,
+               "hnsw_on_disk": False, "oversampling": 2.0},
+    # One bit per dimension in RAM, 32x smaller; originals and graph on disk
+    "large": {"quantization": "binary", "on_disk": True, "hnsw_m": 16, "hnsw_ef_construct": 200,
+              "hnsw_on_disk": True, "oversampling": 3.0},
+}
+
+
+class IndexStorage(BaseModel):
+    """Storage options of a new index; unset fields come from the preset
+
+    The preset is named, or picked from ``expected_chunks``. Options only
+    apply to the upload that creates the index and are ignored afterwards.
+    """
+    preset: Optional[str] = None
+    expected_chunks: Optional[int] = None
+    quantization: Optional[str] = None
+    on_disk: Optional[bool] = None
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    hnsw_on_disk: Optional[bool] = None
+    # Embeddings are shortened to this many dimensions (text-embedding-3 and mock only)
+    dimensions: Optional[int] = None
+    # Candidates fetched per result with the quantized vectors before rescoring
+    oversampling: Optional[float] = None
+
+
+def preset_for_size(expected_chunks: Optional[int]) -> str:
+    if expected_chunks is None:
+        return INDEX_STORAGE_DEFAULT_PRESET
+    if expected_chunks <= INDEX_STORAGE_SMALL_MAX_CHUNKS:
+        return "small"
+    if expected_chunks <= INDEX_STORAGE_MEDIUM_MAX_CHUNKS:
+        return "medium"
+    return "large"
+
+
+def resolve_storage(options: Optional[IndexStorage], model_dimensions: int,
+                    shortenable: bool) -> Dict[str, Any]:
+    """Complete storage settings from the options and their preset; ValueError if they cannot work"""
+    options = options or IndexStorage()
+    preset = options.preset or preset_for_size(options.expected_chunks)
+    if preset not in STORAGE_PRESETS:
+        raise ValueError(f"Unknown storage preset {preset}; use one of {', '.join(STORAGE_PRESETS)}")
+    storage = {"preset": preset, "dimensions": model_dimensions, **STORAGE_PRESETS[preset]}
+    for field, value in options.model_dump(exclude={"preset", "expected_chunks"}).items():
+        if value is not None:
+            storage[field] = value
+
+    if storage["quantization"] not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization {storage['quantization']}; use one of {', '.join(QUANTIZATIONS)}")
+    if storage["dimensions"] != model_dimensions:
+        if not shortenable:
+            raise ValueError("The embedding model cannot produce shortened embeddings")
+        if not 1 <= storage["dimensions"] <= model_dimensions:
+            raise ValueError(f"dimensions must be between 1 and {model_dimensions}")
+    if storage["hnsw_m"] < 0:
+        raise ValueError("hnsw_m must not be negative")
+    if storage["hnsw_ef_construct"] < 4:
+        raise ValueError("hnsw_ef_construct must be at least 4")
+    if storage["oversampling"] < 1:
+        raise ValueError("oversampling must be at least 1")
+    return storage
+
+
+def legacy_storage(model_dimensions: int) -> Dict[str, Any]:
+    """Settings of indexes created before storage options existed"""
+    return {"preset": None, "dimensions": model_dimensions, **STORAGE_PRESETS["small"]}
+
+
+def load_storage(index: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Storage settings recorded for an index row, if any"""
+    if not index or not index.get("storage"):
+        return None
+    return json.loads(index["storage"])
+
+
+def quantization_config(storage: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Quantized vectors always stay in RAM; only the originals may go to disk
+    if storage["quantization"] == "scalar":
+        return {"scalar": {"type": "int8", "quantile": 0.99, "always_ram": True}}
+    if storage["quantization"] == "binary":
+        return {"binary": {"always_ram": True}}
+    return None
+
+
+def hnsw_config(storage: Dict[str, Any]) -> Dict[str, Any]:
+    return {"m": storage["hnsw_m"], "ef_construct": storage["hnsw_ef_construct"],
+            "on_disk": storage["hnsw_on_disk"]}
+
+
+def storage_from_collection(info: Dict[str, Any], model_dimensions: int) -> Dict[str, Any]:
+    """Settings of a collection that exists without a record, read from its Qdrant config"""
+    config = info.get("config") or {}
+    vectors = (config.get("params") or {}).get("vectors") or {}
+    hnsw = config.get("hnsw_config") or {}
+    quantization = config.get("quantization_config") or {}
+    storage = legacy_storage(vectors.get("size") or model_dimensions)
+    storage["quantization"] = next((kind for kind in ("scalar", "binary") if kind in quantization), "none")
+    storage["on_disk"] = bool(vectors.get("on_disk"))
+    storage["hnsw_m"] = hnsw.get("m", storage["hnsw_m"])
+    storage["hnsw_ef_construct"] = hnsw.get("ef_construct", storage["hnsw_ef_construct"])
+    storage["hnsw_on_disk"] = bool(hnsw.get("on_disk"))
+    if storage["quantization"] != "none":
+        storage["oversampling"] = STORAGE_PRESETS["medium" if storage["quantization"] == "scalar" else "large"]["oversampling"]
+    return storage
+
+
+def search_params(storage: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Search with the quantized vectors, then rescore the oversampled candidates with the originals"""
+    if storage["quantization"] == "none":
+        return None
+    return {"quantization": {"rescore": True, "oversampling": storage["oversampling"]}}
@@ -0,0 +1,289 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from . import metrics
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+INGEST_JOB_RETENTION = int(os.getenv("INGEST_JOB_RETENTION", "1000"))
+
+JOB_STAGES = ("extract", "embed", "upsert")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Completed jobs kept per stage for latency percentiles
+LATENCY_SAMPLES = 1024
+
+JOB_SECONDS = metrics.histogram("ingest_job_seconds", "Time each finished job spent queued, per stage and in total",
+                                ("phase",), buckets=(*metrics.LATENCY_BUCKETS, 120.0, 300.0, 600.0, 1800.0))
+JOBS = metrics.counter("ingest_jobs_total", "Ingestion jobs by final status", ("kind", "status"))
+INGEST_ITEMS = metrics.counter("ingest_items_total", "Pages, chunks and points processed by ingestion jobs",
+                               ("item",))
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Job:
+    """One unit of ingestion work and its progress counters
+
+    ``run`` is awaited by a pool worker with the job as its only argument and
+    its return value becomes ``result``. ``cleanup`` runs exactly once when
+    the job finishes, including when it is cancelled before it started.
+    """
+
+    def __init__(self, kind: str, run: Optional[Callable[["Job"], Awaitable[Any]]] = None,
+                 details: Optional[Dict[str, Any]] = None,
+                 cleanup: Optional[Callable[[], None]] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.details = details or {}
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, int] = {
+            "pages_total": 0,
+            "pages_extracted": 0,
+            "chunks_embedded": 0,
+            "points_upserted": 0,
+        }
+        self.stage_seconds: Dict[str, float] = {stage: 0.0 for stage in JOB_STAGES}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        self._run = run
+        self._cleanup = cleanup
+        self._task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def advance(self, counter: str, amount: int = 1):
+        self.progress[counter] = self.progress.get(counter, 0) + amount
+        INGEST_ITEMS.inc(amount, item=counter)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Attribute the wall time of the block to ``stage``"""
+        self.stage = stage
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            metrics.observe_stage(f"ingest.{stage}", seconds)
+
+    async def timed_iter(self, stage: str, items: AsyncIterator[Any], counter: str) -> AsyncIterator[Any]:
+        """Re-yield ``items``, timing each wait against ``stage`` and counting them"""
+        iterator = items.__aiter__()
+        while True:
+            with self.timed(stage):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            self.advance(counter)
+            yield item
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.stage = None
+        self.finished_at = time.time()
+        if self._cleanup is not None:
+            cleanup, self._cleanup = self._cleanup, None
+            cleanup()
+        self._done.set()
+
+    async def wait(self):
+        await self._done.wait()
+
+    def as_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "cancel_requested": self.cancel_requested,
+            **self.details,
+            "progress": dict(self.progress),
+            "stage_seconds": {stage: round(seconds, 4) for stage, seconds in self.stage_seconds.items()},
+            "queued_seconds": round((self.started_at or end) - self.created_at, 4),
+            "running_seconds": round(end - self.started_at, 4) if self.started_at else None,
+            "created_at": self.created_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Bounded queue of ingestion jobs drained by a fixed pool of asyncio workers
+
+    ``submit`` never waits: when ``queue_size`` jobs are already waiting it
+    raises a 503 so clients back off instead of piling uploads onto the
+    server. Finished jobs are kept for polling until ``retention`` newer ones
+    have finished.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, queue_size: int = INGEST_QUEUE_SIZE,
+                 retention: int = INGEST_JOB_RETENTION):
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size
+        self.retention = retention
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop = None
+        self.started_at = time.perf_counter()
+        self.busy_workers = 0
+        self.busy_seconds = 0.0
+        self.counts: Dict[str, int] = {"submitted": 0, "rejected": 0, **{s: 0 for s in FINISHED_STATUSES}}
+        self.latencies: Dict[str, Deque[float]] = {
+            name: deque(maxlen=LATENCY_SAMPLES) for name in ("queued", *JOB_STAGES, "total")
+        }
+
+    def start(self):
+        """Start the workers on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self.started_at = time.perf_counter()
+        self.busy_seconds = 0.0
+
+    async def stop(self):
+        """Stop the workers, cancelling running jobs and dropping queued ones"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                if not job.finished:
+                    self._record(job, "cancelled", "Server shutting down")
+        self._loop = None
+
+    def submit(self, kind: str, run: Callable[[Job], Awaitable[Any]],
+               details: Optional[Dict[str, Any]] = None,
+               cleanup: Optional[Callable[[], None]] = None) -> Job:
+        self.start()
+        job = Job(kind, run, details, cleanup)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            if cleanup is not None:
+                cleanup()
+            raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later",
+                                headers={"Retry-After": "5"})
+        self.jobs[job.id] = job
+        self.counts["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.finished:
+            return job
+        job.cancel_requested = True
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            # Still queued; the worker skips it when it is dequeued
+            self._record(job, "cancelled")
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.finished:
+                    await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        self.busy_workers += 1
+        started = time.perf_counter()
+        job._task = asyncio.create_task(job._run(job))
+        try:
+            job.result = await job._task
+            self._record(job, "succeeded")
+        except asyncio.CancelledError:
+            if not job.cancel_requested:
+                # The worker itself is being stopped
+                job._task.cancel()
+                self._record(job, "cancelled", "Server shutting down")
+                raise
+            self._record(job, "cancelled")
+        except HTTPException as e:
+            self._record(job, "failed", str(e.detail))
+        except Exception as e:
+            self._record(job, "failed", str(e))
+        finally:
+            self.busy_workers -= 1
+            self.busy_seconds += time.perf_counter() - started
+
+    def _record(self, job: Job, status: str, error: Optional[str] = None):
+        job.finish(status, error)
+        self.counts[status] += 1
+        JOBS.inc(kind=job.kind, status=status)
+        if job.started_at is not None:
+            phases = {
+                "queued": job.started_at - job.created_at,
+                **{stage: job.stage_seconds.get(stage, 0.0) for stage in JOB_STAGES},
+                "total": job.finished_at - job.started_at,
+            }
+            for phase, seconds in phases.items():
+                self.latencies[phase].append(seconds)
+                JOB_SECONDS.observe(seconds, phase=phase)
+        finished = [job_id for job_id, other in self.jobs.items() if other.finished]
+        for job_id in finished[:max(len(finished) - self.retention, 0)]:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        latency = {}
+        for name, samples in self.latencies.items():
+            values = list(samples)
+            latency[name] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 4) if values else None,
+                "p50": round(percentile(values, 0.50), 4) if values else None,
+                "p95": round(percentile(values, 0.95), 4) if values else None,
+            }
+        return {
+            "workers": self.workers,
+            "busy_workers": self.busy_workers,
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 4) if elapsed > 0 else None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.queue_size,
+            "jobs": dict(self.counts),
+            "stage_seconds": latency,
+        }
@@ -0,0 +1,606 @@
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "data/lexical")
+LEXICAL_FLUSH_CHUNKS = int(os.getenv("LEXICAL_FLUSH_CHUNKS", "20000"))
+LEXICAL_MAX_SEGMENTS = int(os.getenv("LEXICAL_MAX_SEGMENTS", "8"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, optionally joined by - _ . / so "SKU-12345" and "v1.2" stay one term
+TOKEN = re.compile(r"\w+(?:[-_./]\w+)*")
+PART = re.compile(r"[^\W_]+")
+
+MAX_TF = np.iinfo(np.uint16).max
+
+# (document_id, filename, file_type)
+DocumentFields = List[str]
+ChunkRecord = Tuple[str, DocumentFields, Counter, int]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound tokens are also indexed by their parts"""
+    terms = []
+    for match in TOKEN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        parts = PART.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Any]], k: int = 60) -> List[Tuple[Any, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank); needs no score calibration"""
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda entry: -entry[1])
+
+
+def write_json(path: str, data: Any):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """Hold an flock on ``path`` against other processes and threads
+
+    Each call opens its own descriptor, so two threads of one process
+    exclude each other too.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def document_matches(document: DocumentFields, filters: Dict[str, Any]) -> bool:
+    fields = {"document_id": document[0], "filename": document[1], "file_type": document[2]}
+    for key, value in filters.items():
+        if fields.get(key) not in (value if isinstance(value, list) else [value]):
+            return False
+    return True
+
+
+class Tombstones:
+    """Deleted documents and points, each with the generation it was deleted at
+
+    An entry hides matching chunks in segments older than its generation, so
+    a chunk written again later is not hidden by an earlier delete. Updates
+    replace the whole object, so searches can read a snapshot without a lock.
+    """
+
+    def __init__(self, documents: Optional[Dict[str, int]] = None, points: Optional[Dict[str, int]] = None,
+                 version: int = 0):
+        self.documents: Dict[str, int] = documents or {}
+        self.points: Dict[str, int] = points or {}
+        self.version = version
+
+    def with_deleted(self, documents: Iterable[str] = (), points: Iterable[str] = (), gen: int = 0) -> "Tombstones":
+        return Tombstones({**self.documents, **{key: gen for key in documents}},
+                          {**self.points, **{key: gen for key in points}}, self.version + 1)
+
+    def __len__(self) -> int:
+        return len(self.documents) + len(self.points)
+
+
+class Segment:
+    """Immutable BM25 postings written by one flush or merge
+
+    Every posting list is stored back to back in ``.docs.npy`` (uint32
+    chunk number) and ``.tfs.npy`` (uint16 term frequency), which are
+    memory-mapped, so only the lists a query touches are paged in.
+    ``.lens.npy`` and ``.docidx.npy`` hold each chunk's length and document,
+    and ``.meta.json`` the term offsets, point ids and document table.
+    Segments with a higher ``seq`` are newer.
+    """
+
+    SUFFIXES = (".meta.json", ".docidx.npy", ".lens.npy", ".docs.npy", ".tfs.npy")
+
+    def __init__(self, directory: str, name: str, seq: int):
+        self.directory = directory
+        self.name = name
+        self.seq = seq
+        prefix = os.path.join(directory, name)
+        with open(f"{prefix}.meta.json") as f:
+            meta = json.load(f)
+        self.terms: Dict[str, List[int]] = meta["terms"]
+        self.point_ids: List[str] = meta["point_ids"]
+        self.documents: List[DocumentFields] = meta["documents"]
+        self.doc_index = np.load(f"{prefix}.docidx.npy")
+        self.lengths = np.load(f"{prefix}.lens.npy")
+        self.total_length = int(self.lengths.sum())
+        self.docs = np.load(f"{prefix}.docs.npy", mmap_mode="r")
+        self.tfs = np.load(f"{prefix}.tfs.npy", mmap_mode="r")
+        self._positions: Optional[Dict[str, int]] = None
+        self._alive: Tuple[int, Optional[np.ndarray]] = (-1, None)
+
+    @property
+    def size(self) -> int:
+        return len(self.point_ids)
+
+    def files(self) -> List[str]:
+        return [os.path.join(self.directory, self.name + suffix) for suffix in self.SUFFIXES]
+
+    def document_frequency(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[1] if entry else 0
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        offset, count = self.terms[term]
+        return self.docs[offset:offset + count], self.tfs[offset:offset + count]
+
+    def alive(self, tombstones: Tombstones) -> np.ndarray:
+        """Mask of chunks not deleted after this segment was written"""
+        version, alive = self._alive
+        if version == tombstones.version:
+            return alive
+        dead_documents = np.array([tombstones.documents.get(document[0], -1) > self.seq
+                                   for document in self.documents] or [False], dtype=bool)
+        alive = ~dead_documents[self.doc_index]
+        dead_points = [point_id for point_id, gen in tombstones.points.items() if gen > self.seq]
+        if dead_points:
+            if self._positions is None:
+                self._positions = {point_id: i for i, point_id in enumerate(self.point_ids)}
+            for point_id in dead_points:
+                position = self._positions.get(point_id)
+                if position is not None:
+                    alive[position] = False
+        self._alive = (tombstones.version, alive)
+        return alive
+
+    def matching(self, filters: Dict[str, Any]) -> np.ndarray:
+        allowed = np.array([document_matches(document, filters) for document in self.documents] or [False],
+                           dtype=bool)
+        return allowed[self.doc_index]
+
+    def records(self, alive: np.ndarray) -> Iterator[ChunkRecord]:
+        """Rebuild the live chunks' term counts, for merging"""
+        counts: List[Counter] = [Counter() for _ in range(self.size)]
+        for term, (offset, count) in self.terms.items():
+            for local, tf in zip(self.docs[offset:offset + count].tolist(),
+                                 self.tfs[offset:offset + count].tolist()):
+                counts[local][term] = tf
+        for local, point_id in enumerate(self.point_ids):
+            if alive[local]:
+                yield point_id, self.documents[self.doc_index[local]], counts[local], int(self.lengths[local])
+
+
+def write_segment(directory: str, name: str, records: Iterable[ChunkRecord]):
+    point_ids: List[str] = []
+    documents: List[DocumentFields] = []
+    document_positions: Dict[str, int] = {}
+    doc_index: List[int] = []
+    lengths: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for local, (point_id, document, counts, length) in enumerate(records):
+        point_ids.append(point_id)
+        position = document_positions.get(document[0])
+        if position is None:
+            position = document_positions[document[0]] = len(documents)
+            documents.append(list(document))
+        doc_index.append(position)
+        lengths.append(length)
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((local, tf))
+    total = sum(len(entries) for entries in postings.values())
+    docs = np.empty(total, dtype=np.uint32)
+    tfs = np.empty(total, dtype=np.uint16)
+    terms = {}
+    offset = 0
+    for term in sorted(postings):
+        entries = postings[term]
+        docs[offset:offset + len(entries)] = [local for local, _ in entries]
+        tfs[offset:offset + len(entries)] = [min(tf, MAX_TF) for _, tf in entries]
+        terms[term] = [offset, len(entries)]
+        offset += len(entries)
+    prefix = os.path.join(directory, name)
+    np.save(f"{prefix}.docs.npy", docs)
+    np.save(f"{prefix}.tfs.npy", tfs)
+    np.save(f"{prefix}.lens.npy", np.asarray(lengths, dtype=np.uint32))
+    np.save(f"{prefix}.docidx.npy", np.asarray(doc_index, dtype=np.uint32))
+    # Written last: a segment without its meta file is never loaded
+    write_json(f"{prefix}.meta.json", {"terms": terms, "point_ids": point_ids, "documents": documents})
+
+
+class MemTable:
+    """Chunks added since the last flush, searched in place"""
+
+    def __init__(self):
+        self.chunks: List[Optional[ChunkRecord]] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.by_point: Dict[str, int] = {}
+        self.total_length = 0
+
+    def add(self, point_id: str, document: DocumentFields, counts: Counter):
+        self.delete_points([point_id])
+        length = sum(counts.values())
+        position = len(self.chunks)
+        self.chunks.append((point_id, document, counts, length))
+        self.by_point[point_id] = position
+        self.total_length += length
+        for term in counts:
+            self.postings.setdefault(term, []).append(position)
+
+    def delete_points(self, point_ids: Iterable[str]):
+        for point_id in point_ids:
+            position = self.by_point.pop(point_id, None)
+            if position is not None:
+                self.total_length -= self.chunks[position][3]
+                self.chunks[position] = None
+
+    def delete_documents(self, document_ids: Set[str]):
+        self.delete_points([chunk[0] for chunk in self.chunks if chunk is not None and chunk[1][0] in document_ids])
+
+    def records(self) -> List[ChunkRecord]:
+        return [chunk for chunk in self.chunks if chunk is not None]
+
+    def document_frequency(self, term: str) -> int:
+        return sum(self.chunks[position] is not None for position in self.postings.get(term, ()))
+
+    def __len__(self) -> int:
+        return len(self.by_point)
+
+
+class LexicalIndex:
+    """Incremental BM25 index over the chunks of one collection
+
+    New chunks go to a memtable that is flushed to an immutable segment at
+    the end of each ingestion job, or every ``flush_chunks`` chunks. Deletes
+    are tombstones until a merge drops the chunks they hide. Whenever there
+    are more than ``max_segments``, the newest segments are merged into one,
+    so each chunk is rewritten a logarithmic number of times.
+
+    Several processes may share the directory: writes to the manifest are
+    made under a file lock after catching up with it, and searches reload
+    it when another process has changed it. A memtable is only searched by
+    the process that holds it, until it is flushed.
+    """
+
+    def __init__(self, directory: str, flush_chunks: int = LEXICAL_FLUSH_CHUNKS,
+                 max_segments: int = LEXICAL_MAX_SEGMENTS):
+        self.directory = directory
+        self.flush_chunks = flush_chunks
+        self.max_segments = max(max_segments, 1)
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self.memtable = MemTable()
+        self.segments: List[Segment] = []
+        self.tombstones = Tombstones()
+        self.next_seq = 0
+        self.next_name = 0
+        # Tells a recreated index apart from the one it replaced, whose segment names it reuses
+        self.index_id: Optional[str] = None
+        self._manifest_signature: Optional[Tuple[int, int, int]] = None
+        if os.path.isdir(directory):
+            with self._file_lock():
+                self._load()
+                # Remove segments that were written but never committed to the manifest
+                known = {path for segment in self.segments for path in segment.files()}
+                for name in os.listdir(self.directory):
+                    path = os.path.join(self.directory, name)
+                    if name.startswith("seg-") and path not in known:
+                        os.unlink(path)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def _file_lock(self, shared: bool = False):
+        return file_lock(os.path.join(self.directory, "lock"), shared)
+
+    def _load(self):
+        """Take up the manifest on disk, keeping the segments already open; call with the index lock held"""
+        signature = file_signature(self.manifest_path)
+        if signature == self._manifest_signature:
+            return
+        if signature is None:
+            # Dropped by another process
+            manifest = {"segments": [], "tombstones": {"documents": {}, "points": {}}, "next_seq": 0, "next_name": 0}
+        else:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        opened = {segment.name: segment for segment in self.segments} if manifest.get("id") == self.index_id else {}
+        self.segments = [opened.get(name) or Segment(self.directory, name, seq) for name, seq in manifest["segments"]]
+        self.index_id = manifest.get("id")
+        self.tombstones = Tombstones(manifest["tombstones"]["documents"], manifest["tombstones"]["points"],
+                                     self.tombstones.version + 1)
+        self.next_seq = manifest["next_seq"]
+        self.next_name = manifest["next_name"]
+        self._manifest_signature = signature
+
+    def refresh(self):
+        """Reload the manifest if another process has changed it"""
+        if file_signature(self.manifest_path) == self._manifest_signature:
+            return
+        # A merge elsewhere may remove the segments a manifest names before
+        # they are opened; by then there is a newer manifest to read
+        for _ in range(3):
+            try:
+                with self._lock:
+                    self._load()
+                return
+            except FileNotFoundError:
+                continue
+        with self._file_lock(shared=True), self._lock:
+            self._load()
+
+    def _save_manifest(self):
+        self.index_id = self.index_id or uuid.uuid4().hex
+        write_json(self.manifest_path, {
+            "id": self.index_id,
+            "segments": [[segment.name, segment.seq] for segment in self.segments],
+            "tombstones": {"documents": self.tombstones.documents, "points": self.tombstones.points},
+            "next_seq": self.next_seq,
+            "next_name": self.next_name,
+        })
+        self._manifest_signature = file_signature(self.manifest_path)
+
+    def _new_name(self) -> str:
+        name = f"seg-{self.next_name:08d}"
+        self.next_name += 1
+        return name
+
+    def add_many(self, chunks: Iterable[Tuple[str, str, str, str, str]]):
+        """Add ``(point_id, document_id, filename, file_type, text)`` chunks
+
+        Texts are tokenized before the lock is taken, so concurrent searches
+        only wait for the postings to be appended.
+        """
+        counted = [(point_id, [document_id, filename, file_type], Counter(tokenize(text)))
+                   for point_id, document_id, filename, file_type, text in chunks]
+        with self._lock:
+            for point_id, document, counts in counted:
+                self.memtable.add(point_id, document, counts)
+
+    @property
+    def needs_flush(self) -> bool:
+        return len(self.memtable) >= self.flush_chunks
+
+    def delete_documents(self, document_ids: Iterable[str]):
+        document_ids = set(document_ids)
+        with self._file_lock(), self._lock:
+            self._load()
+            self.memtable.delete_documents(document_ids)
+            if self.segments:
+                self.tombstones = self.tombstones.with_deleted(documents=document_ids, gen=self.next_seq)
+                self._save_manifest()
+
+    def delete_points(self, point_ids: Iterable[str]):
+        point_ids = list(point_ids)
+        with self._file_lock(), self._lock:
+            self._load()
+            self.memtable.delete_points(point_ids)
+            if self.segments:
+                self.tombstones = self.tombstones.with_deleted(points=point_ids, gen=self.next_seq)
+                self._save_manifest()
+
+    def flush(self):
+        """Write the memtable as a new segment, then merge if there are too many"""
+        if not len(self.memtable):
+            return
+        with self._file_lock(), self._lock:
+            if not len(self.memtable):
+                return
+            self._load()
+            name = self._new_name()
+            write_segment(self.directory, name, self.memtable.records())
+            self.segments.append(Segment(self.directory, name, self.next_seq))
+            self.next_seq += 1
+            self.memtable = MemTable()
+            self._save_manifest()
+        self.merge()
+
+    def merge(self):
+        """Merge the newest segments into one while there are more than ``max_segments``
+
+        Runs outside the index lock, but under the file lock, so other
+        processes wait to write the manifest. The merged segment takes the
+        newest sequence number of its run, so tombstones written meanwhile
+        (with a higher generation) still hide its chunks.
+        """
+        with self._merge_lock, self._file_lock():
+            while True:
+                with self._lock:
+                    self._load()
+                    segments = list(self.segments)
+                    tombstones = self.tombstones
+                    name = self._new_name()
+                if len(segments) <= self.max_segments:
+                    return
+                # Extend the run back while the next older segment is no
+                # bigger than the run so far, like carrying in a binary counter
+                start = len(segments) - 2
+                size = segments[-1].size + segments[-2].size
+                while start > 0 and segments[start - 1].size <= size:
+                    start -= 1
+                    size += segments[start].size
+                run = segments[start:]
+                write_segment(self.directory, name, self._merge_records(run, tombstones))
+                merged = Segment(self.directory, name, run[-1].seq)
+                with self._lock:
+                    merged_names = {segment.name for segment in run}
+                    self.segments = [segment for segment in self.segments if segment.seq < run[0].seq] + [merged] + \
+                        [segment for segment in self.segments if segment.name not in merged_names
+                         and segment.seq > merged.seq]
+                    if start == 0:
+                        # Every segment the snapshot's tombstones could hide
+                        # was merged, so they have all been applied
+                        self.tombstones = Tombstones(
+                            {key: gen for key, gen in self.tombstones.documents.items()
+                             if tombstones.documents.get(key) != gen},
+                            {key: gen for key, gen in self.tombstones.points.items()
+                             if tombstones.points.get(key) != gen},
+                            self.tombstones.version + 1,
+                        )
+                    self._save_manifest()
+                for segment in run:
+                    for path in segment.files():
+                        os.unlink(path)
+
+    @staticmethod
+    def _merge_records(run: List[Segment], tombstones: Tombstones) -> Iterator[ChunkRecord]:
+        # Newest first, so a point written twice keeps its latest version
+        seen: Set[str] = set()
+        for segment in reversed(run):
+            for record in segment.records(segment.alive(tombstones)):
+                if record[0] not in seen:
+                    seen.add(record[0])
+                    yield record
+
+    def search(self, query: str, limit: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, DocumentFields]]:
+        """Top ``limit`` chunks by BM25 as ``(point_id, score, [document_id, filename, file_type])``
+
+        Collection statistics include chunks that are deleted but not yet
+        merged away, as in Lucene; this shifts scores slightly, not ranks.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+        self.refresh()
+        with self._lock:
+            segments = list(self.segments)
+            tombstones = self.tombstones
+            memtable_seq = self.next_seq
+            memtable_frequencies = {term: self.memtable.document_frequency(term) for term in terms}
+            chunks = sum(segment.size for segment in segments) + len(self.memtable)
+            total_length = sum(segment.total_length for segment in segments) + self.memtable.total_length
+            if not chunks:
+                return []
+            average_length = max(total_length / chunks, 1.0)
+            idf = {}
+            for term in terms:
+                frequency = memtable_frequencies[term] + sum(segment.document_frequency(term) for segment in segments)
+                if frequency:
+                    idf[term] = math.log(1 + (chunks - frequency + 0.5) / (frequency + 0.5))
+            candidates = self._search_memtable(idf, average_length, limit, filters, memtable_seq)
+
+        for segment in segments:
+            present = [term for term in idf if term in segment.terms]
+            if not present:
+                continue
+            scores = np.zeros(segment.size, dtype=np.float32)
+            for term in present:
+                docs, tfs = segment.postings(term)
+                tf = tfs.astype(np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths[docs] / average_length)
+                scores[docs] += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            mask = (scores > 0) & segment.alive(tombstones)
+            if filters:
+                mask &= segment.matching(filters)
+            hits = np.flatnonzero(mask)
+            if len(hits) > limit:
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            for local in hits.tolist():
+                candidates.append((segment.seq, segment.point_ids[local], float(scores[local]),
+                                   segment.documents[segment.doc_index[local]]))
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        seen: Set[str] = set()
+        results = []
+        for _, point_id, score, document in candidates:
+            if point_id not in seen:
+                seen.add(point_id)
+                results.append((point_id, score, document))
+        results.sort(key=lambda result: -result[1])
+        return results[:limit]
+
+    def _search_memtable(self, idf: Dict[str, float], average_length: float, limit: int,
+                         filters: Optional[Dict[str, Any]], seq: int) -> List[Tuple[int, str, float, DocumentFields]]:
+        scores: Dict[int, float] = {}
+        for term, weight in idf.items():
+            for position in self.memtable.postings.get(term, ()):
+                chunk = self.memtable.chunks[position]
+                if chunk is None:
+                    continue
+                tf = chunk[2][term]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk[3] / average_length)
+                scores[position] = scores.get(position, 0.0) + weight * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        candidates = []
+        for position, score in ranked:
+            point_id, document, _, _ = self.memtable.chunks[position]
+            if filters and not document_matches(document, filters):
+                continue
+            candidates.append((seq, point_id, score, document))
+            if len(candidates) >= limit:
+                break
+        return candidates
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            return {
+                "segments": len(self.segments),
+                "segment_chunks": sum(segment.size for segment in self.segments),
+                "memtable_chunks": len(self.memtable),
+                "tombstones": len(self.tombstones),
+                "terms": sum(len(segment.terms) for segment in self.segments),
+            }
+
+
+class LexicalIndexes:
+    """One LexicalIndex per collection under ``root``, opened on first use"""
+
+    def __init__(self, root: str = LEXICAL_INDEX_PATH):
+        self.root = root
+        self._indexes: Dict[str, LexicalIndex] = {}
+        self._lock = threading.Lock()
+
+    def directory(self, index_name: str) -> str:
+        return os.path.join(self.root, quote(index_name, safe=""))
+
+    def get(self, index_name: str) -> LexicalIndex:
+        with self._lock:
+            index = self._indexes.get(index_name)
+            if index is None:
+                index = self._indexes[index_name] = LexicalIndex(self.directory(index_name))
+            return index
+
+    def drop(self, index_name: str):
+        with self._lock:
+            self._indexes.pop(index_name, None)
+            shutil.rmtree(self.directory(index_name), ignore_errors=True)
+
+    def flush_all(self):
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            indexes = dict(self._indexes)
+        return {"path": self.root, "indexes": {name: index.stats() for name, index in indexes.items()}}
@@ -0,0 +1,966 @@
+import asyncio
+import json
+import math
+import os
+import shutil
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from .lexical_index import write_json
+from .qdrant_http import QdrantCollections, QdrantPoint, points_selector_payload
+
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", "data/vectors")
+# Live points in a collection before searches go through an IVF index
+LOCAL_VECTOR_IVF_THRESHOLD = int(os.getenv("LOCAL_VECTOR_IVF_THRESHOLD", "50000"))
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "16"))
+
+LOCAL_URL_SCHEME = "local://"
+DISTANCES = ("Cosine", "Dot")
+# Rows scored per matrix product in a full scan, bounding temporaries
+SCAN_BLOCK_ROWS = 65536
+# Quantized rows are widened to float32 to be scored, so take fewer at a time
+QUANTIZED_BLOCK_ROWS = 4096
+# Filters matching at most this many points are scored exactly over the matches
+EXACT_FILTERED_ROWS = 20000
+IVF_TRAIN_ITERATIONS = 10
+IVF_SAMPLE_PER_LIST = 64
+# Deleted rows are only reclaimed once they outnumber live rows and this
+COMPACT_MIN_DEAD_ROWS = 1024
+
+
+def is_local_url(url: str) -> bool:
+    return url.startswith(LOCAL_URL_SCHEME)
+
+
+def local_path(url: str) -> str:
+    """``local://data/vectors`` is relative to the working directory, ``local:///srv/vectors`` absolute"""
+    return url[len(LOCAL_URL_SCHEME):].rstrip("/") or LOCAL_VECTOR_PATH
+
+
+def select_payload(payload: Dict[str, Any], with_payload: Union[bool, List[str], Dict[str, Any]]):
+    if with_payload is True:
+        return payload
+    if isinstance(with_payload, list):
+        return {key: payload[key] for key in with_payload if key in payload}
+    if isinstance(with_payload, dict) and "include" in with_payload:
+        return {key: payload[key] for key in with_payload["include"] if key in payload}
+    if isinstance(with_payload, dict) and "exclude" in with_payload:
+        return {key: value for key, value in payload.items() if key not in with_payload["exclude"]}
+    return None
+
+
+def field_values(value: Any) -> List[Any]:
+    """Keys a payload value is indexed under; an array matches any of its elements"""
+    values = value if isinstance(value, list) else [value]
+    return [item for item in values if isinstance(item, (str, int, float, bool))]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` highest finite scores, best first"""
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    positions = positions[np.isfinite(scores[positions])]
+    return positions[np.argsort(-scores[positions], kind="stable")]
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def dot_scores(block: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    return np.asarray(block) @ queries
+
+
+class ScalarQuantizer:
+    """int8 codes scaled per row, followed by the row's float32 scale; ~4x smaller than float32"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.width = size + 4
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        scales = (np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127).astype(np.float32)
+        codes = np.empty((len(matrix), self.width), dtype=np.int8)
+        codes[:, :self.size] = np.rint(matrix / scales[:, None]).astype(np.int8)
+        codes[:, self.size:] = scales[:, None].view(np.int8)
+        return codes
+
+    def score(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        scales = np.ascontiguousarray(codes[:, self.size:]).view(np.float32)
+        return (codes[:, :self.size].astype(np.float32) @ queries) * scales
+
+
+# Bits of every byte value, most significant first as np.packbits lays them out
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32)
+
+
+class BinaryQuantizer:
+    """One sign bit per dimension; 32x smaller than float32
+
+    A row scores ``sum(q[j] * sign[j])``. Per query, a table holds the sum
+    of ``q`` over the set bits of every byte value at every byte position,
+    so a row costs one lookup per byte instead of one multiply per bit.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.width = (size + 7) // 8
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        return np.packbits(matrix > 0, axis=1).view(np.int8)
+
+    def score(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes).view(np.uint8)
+        padded = np.zeros((self.width * 8, queries.shape[1]), dtype=np.float32)
+        padded[:self.size] = queries
+        positions = np.arange(self.width)
+        scores = np.empty((len(codes), queries.shape[1]), dtype=np.float32)
+        for column in range(queries.shape[1]):
+            # (width, 256): sum of the query over the set bits of each byte value
+            table = (BYTE_BITS @ padded[:, column].reshape(self.width, 8).T).T
+            scores[:, column] = table[positions, codes].sum(axis=1)
+        return 2 * scores - padded.sum(axis=0)
+
+
+QUANTIZERS = {"scalar": ScalarQuantizer, "binary": BinaryQuantizer}
+
+
+class CollectionNotFound(Exception):
+    pass
+
+
+class IvfIndex:
+    """Inverted-file index: rows are bucketed by nearest centroid and a search
+    only scores the rows of the ``nprobe`` buckets nearest the query
+    """
+
+    def __init__(self, centroids: np.ndarray, trained_on: int):
+        self.centroids = centroids
+        self.trained_on = trained_on
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, rows: np.ndarray, seed: int = 0) -> "IvfIndex":
+        """Spherical k-means over a sample of ``rows``, with about sqrt(n) centroids"""
+        nlist = max(16, int(math.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(rows, min(len(rows), nlist * IVF_SAMPLE_PER_LIST), replace=False))
+        data = normalize_rows(np.asarray(vectors[sample], dtype=np.float32))
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = (data @ centroids.T).argmax(axis=1)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            centroids[filled] = np.add.reduceat(data[order], starts, axis=0)
+            # Reseed empty buckets from random sample rows
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+            centroids = normalize_rows(centroids)
+        return cls(centroids, len(rows))
+
+    def assign(self, vectors: np.ndarray, upto: int):
+        """Bucket rows from the last assigned one up to ``upto``"""
+        start = len(self.assignments)
+        if upto <= start:
+            return
+        labels = [self.assignments]
+        for block in range(start, upto, SCAN_BLOCK_ROWS):
+            end = min(block + SCAN_BLOCK_ROWS, upto)
+            labels.append((np.asarray(vectors[block:end]) @ self.centroids.T).argmax(axis=1).astype(np.int32))
+        self.assignments = np.concatenate(labels)
+        self._lists = None
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        lists = self._lists
+        nearest = top_k(self.centroids @ query, min(nprobe, len(lists)))
+        # Sorted so the gather from the memory map reads forward
+        return np.sort(np.concatenate([lists[i] for i in nearest]))
+
+
+class LocalCollection:
+    """One collection stored as memory-mapped float32 rows plus a point journal
+
+    ``vectors.<gen>.f32`` holds one row per point write; rows are append-only
+    and are never rewritten, so a search can score a snapshot without the
+    lock. ``points.<gen>.log`` is a JSON-lines journal of upserts, deletes
+    and payload updates that is replayed on open; a torn last line is
+    dropped. A point written again gets a new row and its old row is marked
+    dead. Once dead rows outnumber live ones, both files are rewritten under
+    the next generation and ``manifest.json`` is switched to it atomically.
+
+    Searches scan every row exactly until the collection holds
+    ``ivf_threshold`` live points; past that an IVF index is trained on a
+    background thread, and retrained whenever the collection has doubled
+    since. Narrow filters are always scored exactly.
+
+    A quantized collection also keeps ``codes.<gen>.i8``, a scalar or binary
+    code per row. Searches score the codes, oversampled, and rescore the
+    candidates with their float32 rows, so only the small codes file has to
+    stay in the page cache.
+    """
+
+    def __init__(self, directory: str, ivf_threshold: int = LOCAL_VECTOR_IVF_THRESHOLD,
+                 nprobe: int = LOCAL_VECTOR_IVF_NPROBE):
+        self.directory = directory
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._training = False
+        self._load()
+
+    @classmethod
+    def create(cls, directory: str, size: int, distance: str,
+               quantization: Optional[str] = None) -> "LocalCollection":
+        """Open the collection in ``directory``, creating it if it does not exist yet"""
+        if distance not in DISTANCES:
+            raise ValueError(f"Unsupported distance {distance}; use one of {', '.join(DISTANCES)}")
+        if quantization is not None and quantization not in QUANTIZERS:
+            raise ValueError(f"Unsupported quantization {quantization}; use one of {', '.join(QUANTIZERS)}")
+        manifest = os.path.join(directory, "manifest.json")
+        if not os.path.exists(manifest):
+            os.makedirs(directory, exist_ok=True)
+            write_json(manifest, {"generation": 0, "size": size, "distance": distance,
+                                  "quantization": quantization})
+        return cls(directory)
+
+    def _path(self, kind: str, generation: Optional[int] = None) -> str:
+        extension = {"vectors": "f32", "codes": "i8", "points": "log", "ivf": "npy"}[kind]
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"{kind}.{generation}.{extension}")
+
+    def _load(self):
+        with open(os.path.join(self.directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.generation = manifest["generation"]
+        self.size = manifest["size"]
+        self.distance = manifest["distance"]
+        self.quantization = manifest.get("quantization")
+        self.quantizer = QUANTIZERS[self.quantization](self.size) if self.quantization else None
+        # Leftovers of an interrupted compaction
+        current = {os.path.basename(self._path(kind)) for kind in ("vectors", "codes", "points", "ivf")}
+        for name in os.listdir(self.directory):
+            if name != "manifest.json" and name not in current:
+                os.unlink(os.path.join(self.directory, name))
+
+        self.ids: List[Any] = []
+        self.payloads: List[Optional[Dict[str, Any]]] = []
+        self.rows: Dict[Any, int] = {}
+        self._fields: Dict[str, Dict[Any, Set[int]]] = {}
+        self.dead = 0
+        self.count = 0
+        self.alive = np.zeros(0, dtype=bool)
+        journal = self._path("points")
+        valid = 0
+        if os.path.exists(journal):
+            with open(journal, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(entry)
+                    valid += len(line)
+            os.truncate(journal, valid)
+        self.count = len(self.ids)
+        self.alive = np.zeros(max(self.count, 1024), dtype=bool)
+        self.alive[:self.count] = [point_id is not None for point_id in self.ids]
+
+        path = self._path("vectors")
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self.capacity = os.path.getsize(path) // (self.size * 4)
+        self.vectors = self._map(path, self.capacity, self.size)
+        self.codes = None
+        if self.quantizer is not None:
+            # Grown in step with the vectors; rows below count were written
+            # before the journal entries that reference them
+            codes = self._path("codes")
+            open(codes, "ab").close()
+            os.truncate(codes, self.capacity * self.quantizer.width)
+            self.codes = self._map(codes, self.capacity, self.quantizer.width, np.int8)
+        self._journal = open(journal, "a")
+
+        self._ivf: Optional[IvfIndex] = None
+        if os.path.exists(self._path("ivf")):
+            self._ivf = IvfIndex(np.load(self._path("ivf")), self.live)
+
+    def _map(self, path: str, capacity: int, width: int, dtype=np.float32) -> np.ndarray:
+        if capacity == 0:
+            return np.empty((0, width), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    def _manifest(self, generation: int) -> Dict[str, Any]:
+        return {"generation": generation, "size": self.size, "distance": self.distance,
+                "quantization": self.quantization}
+
+    @property
+    def live(self) -> int:
+        return len(self.rows)
+
+    def close(self):
+        with self._lock:
+            self._journal.close()
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+
+    # Journal replay and live updates share these, so the two cannot drift
+
+    def _apply(self, entry: Dict[str, Any]):
+        op = entry["op"]
+        if op == "upsert":
+            for point_id, row, payload in entry["points"]:
+                if row >= len(self.ids):
+                    grow = row + 1 - len(self.ids)
+                    self.ids.extend([None] * grow)
+                    self.payloads.extend([None] * grow)
+                self._kill(self.rows.get(point_id))
+                self.ids[row] = point_id
+                self.payloads[row] = payload
+                self.rows[point_id] = row
+                self._index_payload(row, payload)
+        elif op == "delete":
+            for point_id in entry["ids"]:
+                self._kill(self.rows.get(point_id))
+        elif op == "payload":
+            for point_id, payload in entry["points"]:
+                row = self.rows.get(point_id)
+                if row is not None:
+                    self._unindex_payload(row, self.payloads[row])
+                    self.payloads[row] = {**self.payloads[row], **payload}
+                    self._index_payload(row, self.payloads[row])
+        elif op == "unset":
+            for point_id in entry["ids"]:
+                row = self.rows.get(point_id)
+                if row is not None:
+                    self._unindex_payload(row, self.payloads[row])
+                    self.payloads[row] = {key: value for key, value in self.payloads[row].items()
+                                          if key not in entry["keys"]}
+                    self._index_payload(row, self.payloads[row])
+
+    def _kill(self, row: Optional[int]):
+        if row is None:
+            return
+        self._unindex_payload(row, self.payloads[row])
+        del self.rows[self.ids[row]]
+        self.ids[row] = None
+        self.payloads[row] = None
+        if row < self.count:
+            self.alive[row] = False
+        self.dead += 1
+
+    def _index_payload(self, row: int, payload: Dict[str, Any]):
+        for key, index in self._fields.items():
+            if key in payload:
+                for value in field_values(payload[key]):
+                    index.setdefault(value, set()).add(row)
+
+    def _unindex_payload(self, row: int, payload: Dict[str, Any]):
+        for key, index in self._fields.items():
+            if key in payload:
+                for value in field_values(payload[key]):
+                    rows = index.get(value)
+                    if rows is not None:
+                        rows.discard(row)
+                        if not rows:
+                            del index[value]
+
+    def _write(self, entry: Dict[str, Any]):
+        self._journal.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._apply(entry)
+
+    def _field_index(self, key: str) -> Dict[Any, Set[int]]:
+        """value -> rows for one payload field, built on the first filter that uses it"""
+        index = self._fields.get(key)
+        if index is None:
+            index = self._fields[key] = {}
+            for row, payload in enumerate(self.payloads):
+                if payload is not None and key in payload:
+                    for value in field_values(payload[key]):
+                        index.setdefault(value, set()).add(row)
+        return index
+
+    def _rows_mask(self, rows: Iterable[int]) -> np.ndarray:
+        mask = np.zeros(self.count, dtype=bool)
+        rows = list(rows)
+        if rows:
+            mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+        return mask
+
+    def _condition_mask(self, condition: Dict[str, Any]) -> np.ndarray:
+        if "has_id" in condition:
+            return self._rows_mask(self.rows[point_id] for point_id in condition["has_id"] if point_id in self.rows)
+        if "must" in condition or "should" in condition or "must_not" in condition:
+            return self._filter_mask(condition)
+        index = self._field_index(condition["key"])
+        match = condition.get("match", {})
+        if "value" in match:
+            return self._rows_mask(index.get(match["value"], ()))
+        if "any" in match:
+            return self._rows_mask(row for value in match["any"] for row in index.get(value, ()))
+        if "except" in match:
+            return ~self._rows_mask(row for value in match["except"] for row in index.get(value, ()))
+        raise ValueError(f"Unsupported filter condition: {condition}")
+
+    def _filter_mask(self, query_filter: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+        for condition in query_filter.get("must") or []:
+            mask &= self._condition_mask(condition)
+        should = query_filter.get("should") or []
+        if should:
+            matched = np.zeros(self.count, dtype=bool)
+            for condition in should:
+                matched |= self._condition_mask(condition)
+            mask &= matched
+        for condition in query_filter.get("must_not") or []:
+            mask &= ~self._condition_mask(condition)
+        return mask
+
+    def _mask(self, query_filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self.alive[:self.count].copy()
+        if query_filter:
+            mask &= self._filter_mask(query_filter)
+        return mask
+
+    def _point(self, row: int, with_payload: Any = True, with_vectors: bool = False,
+               score: Optional[float] = None) -> Dict[str, Any]:
+        point = {"id": self.ids[row], "payload": select_payload(self.payloads[row], with_payload)}
+        if score is not None:
+            point["score"] = score
+        if with_vectors:
+            point["vector"] = np.asarray(self.vectors[row]).tolist()
+        return point
+
+    def upsert(self, points: List[Any]):
+        if not points:
+            return
+        matrix = np.asarray([point.vector for point in points], dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.size:
+            raise ValueError(f"Expected vectors of size {self.size}, got {matrix.shape[-1]}")
+        if self.distance == "Cosine":
+            matrix = normalize_rows(matrix)
+        with self._lock:
+            start = self.count
+            end = start + len(points)
+            self._reserve(end)
+            # Rows first, then the journal entry that makes them visible
+            self.vectors[start:end] = matrix
+            if self.codes is not None:
+                self.codes[start:end] = self.quantizer.encode(matrix)
+            self._write({"op": "upsert", "points": [
+                [point.id, start + offset, point.payload or {}] for offset, point in enumerate(points)
+            ]})
+            self.alive[start:end] = [self.ids[row] is not None for row in range(start, end)]
+            self.count = end
+            if self._ivf is not None:
+                self._ivf.assign(self.vectors, end)
+        self._maybe_train()
+
+    def _reserve(self, rows: int):
+        if rows > len(self.alive):
+            alive = np.zeros(max(rows, 2 * len(self.alive)), dtype=bool)
+            alive[:self.count] = self.alive[:self.count]
+            self.alive = alive
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, 2 * self.capacity, 1024)
+        path = self._path("vectors")
+        with open(path, "r+b") as f:
+            f.truncate(capacity * self.size * 4)
+        # Searches still holding the old map keep reading valid rows
+        self.vectors = self._map(path, capacity, self.size)
+        if self.quantizer is not None:
+            codes = self._path("codes")
+            os.truncate(codes, capacity * self.quantizer.width)
+            self.codes = self._map(codes, capacity, self.quantizer.width, np.int8)
+        self.capacity = capacity
+
+    def set_payloads(self, updates: List[Tuple[Any, Dict[str, Any]]]):
+        with self._lock:
+            self._write({"op": "payload", "points": [[point_id, payload] for point_id, payload in updates]})
+
+    def delete_payload_keys(self, keys: List[str], point_ids: List[Any]):
+        with self._lock:
+            self._write({"op": "unset", "keys": list(keys), "ids": list(point_ids)})
+
+    def create_payload_index(self, key: str):
+        with self._lock:
+            self._field_index(key)
+
+    def delete(self, points_selector: Union[List[Any], Dict[str, Any]]):
+        selector = points_selector_payload(points_selector)
+        with self._lock:
+            if "points" in selector:
+                ids = [point_id for point_id in selector["points"] if point_id in self.rows]
+            else:
+                ids = [self.ids[row] for row in np.flatnonzero(self._mask(selector["filter"]))]
+            if ids:
+                self._write({"op": "delete", "ids": ids})
+            if self.dead > max(self.live, COMPACT_MIN_DEAD_ROWS):
+                self._compact()
+            if self._ivf is not None and self.live < self.ivf_threshold // 2:
+                self._drop_ivf()
+
+    def _compact(self):
+        """Rewrite live rows and points under the next generation"""
+        live = np.flatnonzero(self.alive[:self.count])
+        generation = self.generation + 1
+        vectors_path = self._path("vectors", generation)
+        with open(vectors_path, "wb") as f:
+            for block in range(0, len(live), SCAN_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(self.vectors[live[block:block + SCAN_BLOCK_ROWS]]).tobytes())
+        if self.codes is not None:
+            with open(self._path("codes", generation), "wb") as f:
+                for block in range(0, len(live), SCAN_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(self.codes[live[block:block + SCAN_BLOCK_ROWS]]).tobytes())
+        with open(self._path("points", generation), "w") as f:
+            for block in range(0, len(live), 1000):
+                points = [[self.ids[row], block + offset, self.payloads[row]]
+                          for offset, row in enumerate(live[block:block + 1000].tolist())]
+                f.write(json.dumps({"op": "upsert", "points": points}, separators=(",", ":"),
+                                   ensure_ascii=False) + "\n")
+        if self._ivf is not None:
+            np.save(self._path("ivf", generation), self._ivf.centroids)
+        write_json(os.path.join(self.directory, "manifest.json"), self._manifest(generation))
+        self._journal.close()
+        ivf = self._ivf
+        self._load()
+        if ivf is not None and self._ivf is not None and len(ivf.assignments) >= len(live):
+            self._ivf.assignments = ivf.assignments[live]
+            self._ivf.trained_on = ivf.trained_on
+
+    def _drop_ivf(self):
+        self._ivf = None
+        try:
+            os.unlink(self._path("ivf"))
+        except FileNotFoundError:
+            pass
+
+    def _maybe_train(self):
+        with self._lock:
+            if self._training or self.live < self.ivf_threshold:
+                return
+            if self._ivf is not None and self.live < 2 * self._ivf.trained_on:
+                return
+            self._training = True
+        threading.Thread(target=self._train, name="local-vector-ivf", daemon=True).start()
+
+    def _train(self):
+        with self._lock:
+            vectors, count, generation = self.vectors, self.count, self.generation
+            rows = np.flatnonzero(self.alive[:count])
+        try:
+            ivf = IvfIndex.train(vectors, rows)
+            ivf.assign(vectors, count)
+            with self._lock:
+                # A compaction renumbered the rows, or the collection was
+                # dropped; the next write retrains
+                if generation != self.generation or self._journal.closed:
+                    return
+                ivf.assign(self.vectors, self.count)
+                np.save(self._path("ivf") + ".tmp.npy", ivf.centroids)
+                os.replace(self._path("ivf") + ".tmp.npy", self._path("ivf"))
+                self._ivf = ivf
+        finally:
+            with self._lock:
+                self._training = False
+
+    def search_batch(self, searches: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Answer ``{"vector", "limit", "filter", "with_payload", "exact", "params"}`` searches in order"""
+        queries = np.asarray([search["vector"] for search in searches], dtype=np.float32).reshape(len(searches), -1)
+        if queries.shape[1] != self.size:
+            raise ValueError(f"Expected vectors of size {self.size}, got {queries.shape[1]}")
+        if self.distance == "Cosine":
+            queries = normalize_rows(queries)
+        limits = [int(search.get("limit", 10)) for search in searches]
+        quantized = [self._quantization_params(search) for search in searches]
+        while True:
+            probes = None
+            with self._lock:
+                generation = self.generation
+                vectors, codes, count = self.vectors, self.codes, self.count
+                masks = [self._mask(search.get("filter")) for search in searches]
+                ivf = self._ivf
+                if ivf is not None:
+                    ivf.assign(vectors, count)
+                    probes = [ivf.probe(query, self.nprobe) if not search.get("exact") else None
+                              for query, search in zip(queries, searches)]
+            hits = self._search(vectors, codes, count, queries, limits, masks, probes, quantized)
+            with self._lock:
+                # Rows are only renumbered by a compaction; score again if one ran
+                if generation != self.generation:
+                    continue
+                return [
+                    [self._point(row, search.get("with_payload", True), score=score)
+                     for row, score in found if self.ids[row] is not None]
+                    for search, found in zip(searches, hits)
+                ]
+
+    def _quantization_params(self, search: Dict[str, Any]) -> Optional[Tuple[float, bool]]:
+        """(oversampling, rescore) of a search that goes through the quantized codes"""
+        if self.quantizer is None:
+            return None
+        params = (search.get("params") or {}).get("quantization") or {}
+        if params.get("ignore"):
+            return None
+        return max(float(params.get("oversampling") or 1.0), 1.0), bool(params.get("rescore", True))
+
+    def _search(self, vectors: np.ndarray, codes: Optional[np.ndarray], count: int, queries: np.ndarray,
+                limits: List[int], masks: List[np.ndarray], probes: Optional[List[Optional[np.ndarray]]],
+                quantized: List[Optional[Tuple[float, bool]]]) -> List[List[Tuple[int, float]]]:
+        results: List[Optional[List[Tuple[int, float]]]] = [None] * len(queries)
+        exact = [i for i, params in enumerate(quantized) if params is None]
+        coded = [i for i, params in enumerate(quantized) if params is not None]
+
+        def run(group: List[int], data: np.ndarray, score, block_rows: int, depths: List[int]):
+            if not group:
+                return []
+            picked = [probes[i] for i in group] if probes is not None else None
+            return zip(group, self._score(data, score, block_rows, count, queries[group], depths,
+                                          [masks[i] for i in group], picked))
+
+        for i, hits in run(exact, vectors, dot_scores, SCAN_BLOCK_ROWS, [limits[i] for i in exact]):
+            results[i] = hits
+        depths = [math.ceil(limits[i] * quantized[i][0]) for i in coded]
+        for i, hits in run(coded, codes, self.quantizer.score if coded else None, QUANTIZED_BLOCK_ROWS, depths):
+            if not quantized[i][1]:
+                results[i] = hits[:limits[i]]
+                continue
+            # Rescore the candidates with their float32 rows, gathered in file order
+            rows = np.sort(np.asarray([row for row, _ in hits], dtype=np.int64))
+            scores = np.asarray(vectors[rows]) @ queries[i] if len(rows) else np.empty(0)
+            best = top_k(scores, limits[i])
+            results[i] = list(zip(rows[best].tolist(), scores[best].tolist()))
+        return results
+
+    def _score(self, data: np.ndarray, score, block_rows: int, count: int, queries: np.ndarray, limits: List[int],
+               masks: List[np.ndarray], probes: Optional[List[Optional[np.ndarray]]]) -> List[List[Tuple[int, float]]]:
+        """Top rows per query by ``score(rows of data, queries as columns)``"""
+        results: List[Optional[List[Tuple[int, float]]]] = [None] * len(queries)
+        scan = []
+        for i, (query, limit, mask) in enumerate(zip(queries, limits, masks)):
+            matching = int(mask.sum())
+            candidates = None
+            if matching <= EXACT_FILTERED_ROWS and matching < count:
+                candidates = np.flatnonzero(mask)
+            elif probes is not None and probes[i] is not None:
+                candidates = probes[i][mask[probes[i]]]
+                if len(candidates) < limit:
+                    # Too few matches in the probed buckets; fall back to a scan
+                    candidates = None
+            if candidates is None:
+                scan.append(i)
+                continue
+            scores = score(data[candidates], query[:, None])[:, 0]
+            best = top_k(scores, limit)
+            results[i] = list(zip(candidates[best].tolist(), scores[best].tolist()))
+        if scan:
+            # One pass over the rows scores every query that needs a full scan
+            found: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {i: [] for i in scan}
+            matrix = queries[scan].T
+            for block in range(0, count, block_rows):
+                end = min(block + block_rows, count)
+                scores = score(data[block:end], matrix)
+                for column, i in enumerate(scan):
+                    column_scores = np.where(masks[i][block:end], scores[:, column], -np.inf)
+                    best = top_k(column_scores, limits[i])
+                    found[i].append((best + block, column_scores[best]))
+            for i in scan:
+                rows = np.concatenate([rows for rows, _ in found[i]]) if found[i] else np.empty(0, dtype=np.int64)
+                scores = np.concatenate([scores for _, scores in found[i]]) if found[i] else np.empty(0)
+                best = top_k(scores, limits[i])
+                results[i] = list(zip(rows[best].tolist(), scores[best].tolist()))
+        return results
+
+    def retrieve(self, ids: List[Any], with_payload: Any = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._point(self.rows[point_id], with_payload) for point_id in ids if point_id in self.rows]
+
+    def scroll(self, scroll_filter: Optional[Dict[str, Any]] = None, limit: int = 100, offset: Any = None,
+               with_payload: Any = True, with_vectors: bool = False) -> Tuple[List[Dict[str, Any]], Any]:
+        """Page through matching points in row order; the offset is the row to resume from"""
+        with self._lock:
+            start = int(offset or 0)
+            rows = np.flatnonzero(self._mask(scroll_filter)[start:]) + start
+            points = [self._point(row, with_payload, with_vectors) for row in rows[:limit].tolist()]
+            return points, int(rows[limit]) if len(rows) > limit else None
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": "green",
+                "points_count": self.live,
+                "vectors_count": self.live,
+                # Rows are memory-mapped, so the vectors are always on disk
+                "config": {
+                    "params": {"vectors": {"size": self.size, "distance": self.distance, "on_disk": True}},
+                    "quantization_config": {self.quantization: {"always_ram": True}} if self.quantization else None,
+                },
+                "payload_schema": {key: {"data_type": "keyword"} for key in self._fields},
+                "local": {
+                    "rows": self.count,
+                    "dead_rows": self.dead,
+                    "generation": self.generation,
+                    "ivf_lists": len(self._ivf.centroids) if self._ivf is not None else 0,
+                },
+            }
+
+
+class LocalVectorStore:
+    """Collections under ``root``, one directory each, opened on first use"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def directory(self, name: str) -> str:
+        return os.path.join(self.root, quote(name, safe=""))
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(unquote(entry) for entry in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, entry, "manifest.json")))
+
+    def get(self, name: str) -> LocalCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                directory = self.directory(name)
+                if not os.path.exists(os.path.join(directory, "manifest.json")):
+                    raise CollectionNotFound(f"Collection {name} not found")
+                collection = self._collections[name] = LocalCollection(directory)
+            return collection
+
+    def create(self, name: str, size: int, distance: str, quantization: Optional[str] = None) -> LocalCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = LocalCollection.create(self.directory(name), size, distance, quantization)
+            return self._collections[name]
+
+    def drop(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(self.directory(name), ignore_errors=True)
+
+
+# Every client for one directory shares its store, so a collection is only
+# ever open once per process
+stores: Dict[str, LocalVectorStore] = {}
+stores_lock = threading.Lock()
+
+
+def open_store(path: str) -> LocalVectorStore:
+    key = os.path.realpath(path)
+    with stores_lock:
+        store = stores.get(key)
+        if store is None:
+            store = stores[key] = LocalVectorStore(path)
+        return store
+
+
+class LocalVectorClient:
+    """In-process vector store with the interface of CustomQdrantClient
+
+    Selected by a ``local://<directory>`` URL; the API key is ignored.
+    """
+
+    def __init__(self, url: str, api_key: Optional[str] = None):
+        self.store = open_store(local_path(url))
+        self.requests = 0
+
+    def close(self):
+        pass
+
+    def connection_stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "connections_opened": 0, "upsert_retries": 0}
+
+    def get_collections(self):
+        self.requests += 1
+        return QdrantCollections({"result": {"collections": [{"name": name} for name in self.store.names()]}})
+
+    def get_collection(self, collection_name: str):
+        self.requests += 1
+        return {"result": self.store.get(collection_name).info(), "status": "ok"}
+
+    def create_collection(self, collection_name: str, vectors_config,
+                          hnsw_config: Optional[Dict[str, Any]] = None,
+                          quantization_config: Optional[Dict[str, Any]] = None):
+        """Create a collection; vectors are always memory-mapped and searched through IVF, not HNSW"""
+        self.requests += 1
+        quantization = next((kind for kind in QUANTIZERS if kind in (quantization_config or {})), None)
+        self.store.create(collection_name, vectors_config.size, vectors_config.distance.value, quantization)
+        return {"result": True, "status": "ok"}
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: str = "keyword"):
+        """Build the value index of a payload field now rather than on the first filter that uses it"""
+        self.requests += 1
+        self.store.get(collection_name).create_payload_index(field_name)
+        return {"result": {"status": "completed"}, "status": "ok"}
+
+    def upsert(self, collection_name: str, points, wait: bool = True, **kwargs):
+        """Write points; the store is synchronous so ``wait`` has no effect"""
+        self.requests += 1
+        points = list(points)
+        self.store.get(collection_name).upsert(points)
+        return {"status": "ok", "result": {"status": "completed"}, "batches": 1, "points": len(points)}
+
+    def search(self, collection_name: str, query_vector, limit=10,
+               query_filter: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, Any]] = None):
+        return self.search_batch(collection_name, [{"vector": query_vector, "limit": limit, "filter": query_filter,
+                                                    "params": params}])[0]
+
+    def search_batch(self, collection_name: str, searches: List[Dict[str, Any]]) -> List[List[QdrantPoint]]:
+        self.requests += 1
+        results = self.store.get(collection_name).search_batch(searches)
+        return [[QdrantPoint(hit) for hit in hits] for hits in results]
+
+    def retrieve(self, collection_name: str, ids: List[Any],
+                 with_payload: Union[bool, List[str]] = True) -> List[QdrantPoint]:
+        self.requests += 1
+        return [QdrantPoint(point) for point in self.store.get(collection_name).retrieve(ids, with_payload)]
+
+    def scroll(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+               limit: int = 100, offset: Any = None,
+               with_payload: Union[bool, List[str]] = True,
+               with_vectors: bool = False) -> Tuple[List[QdrantPoint], Any]:
+        self.requests += 1
+        points, next_offset = self.store.get(collection_name).scroll(scroll_filter, limit, offset,
+                                                                     with_payload, with_vectors)
+        return [QdrantPoint(point) for point in points], next_offset
+
+    def set_payloads(self, collection_name: str, updates: List[Tuple[Any, Dict[str, Any]]], wait: bool = True):
+        self.requests += 1
+        self.store.get(collection_name).set_payloads(updates)
+
+    def delete_payload_keys(self, collection_name: str, keys: List[str], point_ids: List[Any],
+                            wait: bool = True):
+        self.requests += 1
+        self.store.get(collection_name).delete_payload_keys(keys, point_ids)
+        return {"result": {"status": "completed"}, "status": "ok"}
+
+    def delete(self, collection_name: str, points_selector, wait: bool = True):
+        """Delete points by id list or by filter; a missing collection has nothing to delete"""
+        self.requests += 1
+        try:
+            collection = self.store.get(collection_name)
+        except CollectionNotFound:
+            return {"result": {"status": "completed"}, "status": "ok"}
+        collection.delete(points_selector)
+        return {"result": {"status": "completed"}, "status": "ok"}
+
+    def delete_collection(self, collection_name: str):
+        self.requests += 1
+        self.store.drop(collection_name)
+        return {"result": True, "status": "ok"}
+
+
+class AsyncLocalVectorClient:
+    """Asyncio variant of LocalVectorClient with the interface of AsyncCustomQdrantClient
+
+    Each call runs on a worker thread, so a full scan or an IVF training
+    run does not block the event loop.
+    """
+
+    def __init__(self, url: str, api_key: Optional[str] = None):
+        self.client = LocalVectorClient(url, api_key)
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+
+    def connection_stats(self) -> Dict[str, Any]:
+        return self.client.connection_stats()
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def get_collections(self):
+        return await asyncio.to_thread(self.client.get_collections)
+
+    async def get_collection(self, collection_name: str):
+        return await asyncio.to_thread(self.client.get_collection, collection_name)
+
+    async def create_collection(self, collection_name: str, vectors_config,
+                                hnsw_config: Optional[Dict[str, Any]] = None,
+                                quantization_config: Optional[Dict[str, Any]] = None):
+        return await asyncio.to_thread(self.client.create_collection, collection_name, vectors_config,
+                                       hnsw_config, quantization_config)
+
+    async def create_payload_index(self, collection_name: str, field_name: str, field_schema: str = "keyword"):
+        return await asyncio.to_thread(self.client.create_payload_index, collection_name, field_name, field_schema)
+
+    async def upsert(self, collection_name: str, points, wait: bool = True, **kwargs):
+        return await asyncio.to_thread(self.client.upsert, collection_name, list(points), wait)
+
+    async def search(self, collection_name: str, query_vector, limit=10,
+                     query_filter: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, Any]] = None):
+        return await asyncio.to_thread(self.client.search, collection_name, query_vector, limit, query_filter,
+                                       params)
+
+    async def retrieve(self, collection_name: str, ids: List[Any],
+                       with_payload: Union[bool, List[str]] = True) -> List[QdrantPoint]:
+        return await asyncio.to_thread(self.client.retrieve, collection_name, ids, with_payload)
+
+    async def search_batch(self, collection_name: str, searches: List[Dict[str, Any]]) -> List[List[QdrantPoint]]:
+        return await asyncio.to_thread(self.client.search_batch, collection_name, searches)
+
+    async def scroll(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                     limit: int = 100, offset: Any = None,
+                     with_payload: Union[bool, List[str]] = True,
+                     with_vectors: bool = False) -> Tuple[List[QdrantPoint], Any]:
+        return await asyncio.to_thread(self.client.scroll, collection_name, scroll_filter, limit, offset,
+                                       with_payload, with_vectors)
+
+    async def iter_scroll(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                          batch_size: int = 1000,
+                          with_payload: Union[bool, List[str]] = False) -> AsyncIterator[List[QdrantPoint]]:
+        offset = None
+        while True:
+            points, offset = await self.scroll(collection_name, scroll_filter, limit=batch_size,
+                                               offset=offset, with_payload=with_payload)
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    async def iter_scroll_ids(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                              batch_size: int = 1000) -> AsyncIterator[List[Any]]:
+        async for points in self.iter_scroll(collection_name, scroll_filter, batch_size):
+            yield [point.id for point in points]
+
+    async def set_payloads(self, collection_name: str, updates: List[Tuple[Any, Dict[str, Any]]],
+                           wait: bool = True, batch_size: int = 1000):
+        return await asyncio.to_thread(self.client.set_payloads, collection_name, updates, wait)
+
+    async def delete_payload_keys(self, collection_name: str, keys: List[str], point_ids: List[Any],
+                                  wait: bool = True):
+        return await asyncio.to_thread(self.client.delete_payload_keys, collection_name, keys, point_ids, wait)
+
+    async def delete(self, collection_name: str, points_selector, wait: bool = True):
+        return await asyncio.to_thread(self.client.delete, collection_name, points_selector, wait)
+
+    async def delete_collection(self, collection_name: str):
+        return await asyncio.to_thread(self.client.delete_collection, collection_name)
@@ -1,13 +1,37 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
+from .extraction import shutdown_pool
+from . import metrics
+from .startup import startup_report
 from .document_api import (
-    get_indexes, get_index_documents, upload_document, 
-    delete_document, delete_index, search_documents,
-    get_qdrant_client, IndexInfo, DocumentInfo
+    get_indexes, get_index_documents, stream_index_documents, upload_document, upload_documents_bulk,
+    delete_document, delete_documents, delete_index, search_documents, search_documents_batch,
+    get_async_qdrant_client, get_qdrant_pool_stats, get_embedding_cache_stats, get_metadata_stats,
+    get_search_cache_stats, get_lexical_index_stats, get_chunk_store_stats, lexical_indexes, metadata_store,
+    get_job, cancel_job, get_job_stats, get_coordination_stats, ingest_jobs, coordinator, IndexInfo, DocumentInfo,
+    UploadSizeLimitMiddleware, MAX_UPLOAD_BYTES, BULK_MAX_ARCHIVE_BYTES
 )
 
-app = FastAPI(title="Document Management API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_report.step("ingest_jobs"):
+        ingest_jobs.start()
+    with startup_report.step("coordinator"):
+        coordinator.start()
+    startup_report.ready()
+    yield
+    await ingest_jobs.stop()
+    await coordinator.stop()
+    lexical_indexes.flush_all()
+    shutdown_pool()
+    metadata_store.close()
+
+app = FastAPI(title="Document Management API", version="1.0.0", lifespan=lifespan)
+
+app.add_middleware(UploadSizeLimitMiddleware,
+                   limits={"/upload": MAX_UPLOAD_BYTES, "/upload/bulk": BULK_MAX_ARCHIVE_BYTES})
 
 # Disable CORS. Do not remove this for full-stack development.
 app.add_middleware(
@@ -17,22 +41,33 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def api_get_metrics():
+    """Prometheus metrics: stage, Qdrant and embedding latencies, throughput counters and cache hit rates"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/startup")
+async def api_get_startup():
+    """Cold start cost: import time per module, construction time per component and time to ready"""
+    return startup_report.report()
+
 @app.get("/indexes", response_model=List[IndexInfo])
 async def api_get_indexes():
     """Get all existing indexes with document counts"""
-    return get_indexes()
+    return await get_indexes()
 
 @app.post("/qdrant/test-connection")
 async def test_qdrant_connection(connection: dict):
     """Test connection to Qdrant instance"""
     url = connection.get("url")
     api_key = connection.get("api_key")
-    client = get_qdrant_client(url, api_key)
+    await get_async_qdrant_client(url, api_key)
     return {"status": "success", "message": "Connection successful"}
 
 @app.post("/qdrant/collections")
@@ -40,14 +75,64 @@ async def get_qdrant_collections(connection: dict):
     """Get all collections from Qdrant instance"""
     url = connection.get("url")
     api_key = connection.get("api_key")
-    client = get_qdrant_client(url, api_key)
-    collections = client.get_collections()
+    client = await get_async_qdrant_client(url, api_key)
+    collections = await client.get_collections()
     return {"collections": [col.name for col in collections.collections]}
 
+@app.get("/qdrant/pool-stats")
+async def api_get_qdrant_pool_stats():
+    """Get connection reuse and health-check statistics for pooled Qdrant clients"""
+    return get_qdrant_pool_stats()
+
+@app.get("/embeddings/cache-stats")
+async def api_get_embedding_cache_stats():
+    """Get hit/miss/eviction counters for the embedding cache"""
+    return get_embedding_cache_stats()
+
+@app.get("/search/cache-stats")
+async def api_get_search_cache_stats():
+    """Get search result cache hit rate, size and invalidations"""
+    return get_search_cache_stats()
+
+@app.get("/search/lexical-stats")
+async def api_get_lexical_index_stats():
+    """Get segment, memtable and tombstone counts of the BM25 indexes"""
+    return get_lexical_index_stats()
+
+@app.get("/chunks/store-stats")
+async def api_get_chunk_store_stats():
+    """Get chunk counts, stored bytes and compression ratio of the chunk text stores"""
+    return get_chunk_store_stats()
+
+@app.get("/metadata/cache-stats")
+async def api_get_metadata_stats():
+    """Get backend and cache statistics for the metadata store"""
+    return get_metadata_stats()
+
+@app.get("/coordination/stats")
+async def api_get_coordination_stats():
+    """Get this worker's id, invalidations published and received, and leases held"""
+    return get_coordination_stats()
+
 @app.get("/indexes/{index_name}/documents", response_model=List[DocumentInfo])
-async def api_get_index_documents(index_name: str):
-    """Get all documents in a specific index"""
-    return get_index_documents(index_name)
+async def api_get_index_documents(
+    index_name: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: Optional[str] = None
+):
+    """Get documents in a specific index; with a limit, X-Next-Cursor points at the next page
+
+    Without a limit every document is streamed as one JSON array. With
+    ``stream`` the documents are sent as NDJSON or SSE events instead.
+    """
+    if limit is None or stream:
+        return await stream_index_documents(index_name, cursor, stream, limit)
+    documents, next_cursor = await get_index_documents(index_name, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return documents
 
 @app.post("/upload")
 async def api_upload_document(
@@ -56,9 +141,34 @@ async def api_upload_document(
     qdrant_url: str = Form(...),
     qdrant_api_key: str = Form(None)
 ):
-    """Upload and process a document"""
+    """Queue a document for processing; poll /jobs/{job_id} for progress"""
     return await upload_document(file, metadata, qdrant_url, qdrant_api_key)
 
+@app.post("/upload/bulk")
+async def api_upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    metadata: str = Form(...),
+    qdrant_url: str = Form(...),
+    qdrant_api_key: str = Form(None)
+):
+    """Queue many documents and/or zip/tar archives as one ingestion job"""
+    return await upload_documents_bulk(files, metadata, qdrant_url, qdrant_api_key)
+
+@app.get("/jobs/stats")
+async def api_get_job_stats():
+    """Get queue depth, per-stage latency and worker utilization of the ingestion pool"""
+    return get_job_stats()
+
+@app.get("/jobs/{job_id}")
+async def api_get_job(job_id: str):
+    """Get status and stage progress of an ingestion job"""
+    return await get_job(job_id)
+
+@app.delete("/jobs/{job_id}")
+async def api_cancel_job(job_id: str):
+    """Cancel a queued or running ingestion job"""
+    return await cancel_job(job_id)
+
 @app.delete("/indexes/{index_name}/documents/{document_id}")
 async def api_delete_document(
     index_name: str, 
@@ -67,7 +177,17 @@ async def api_delete_document(
     qdrant_api_key: Optional[str] = None
 ):
     """Delete a specific document from an index"""
-    return delete_document(index_name, document_id, qdrant_url, qdrant_api_key)
+    return await delete_document(index_name, document_id, qdrant_url, qdrant_api_key)
+
+@app.post("/indexes/{index_name}/documents/delete")
+async def api_delete_documents(
+    index_name: str,
+    request: dict,
+    qdrant_url: str,
+    qdrant_api_key: Optional[str] = None
+):
+    """Delete many documents from an index, given {"document_ids": [...]}"""
+    return await delete_documents(index_name, request.get("document_ids", []), qdrant_url, qdrant_api_key)
 
 @app.delete("/indexes/{index_name}")
 async def api_delete_index(
@@ -76,7 +196,7 @@ async def api_delete_index(
     qdrant_api_key: Optional[str] = None
 ):
     """Delete an entire index"""
-    return delete_index(index_name, qdrant_url, qdrant_api_key)
+    return await delete_index(index_name, qdrant_url, qdrant_api_key)
 
 @app.post("/search/{index_name}")
 async def api_search_documents(
@@ -87,3 +207,13 @@ async def api_search_documents(
 ):
     """Search documents in an index"""
     return await search_documents(index_name, query, qdrant_url, qdrant_api_key)
+
+@app.post("/search/{index_name}/batch")
+async def api_search_documents_batch(
+    index_name: str,
+    body: dict,
+    qdrant_url: str,
+    qdrant_api_key: Optional[str] = None
+):
+    """Run many queries against an index with one embedding call and one Qdrant request"""
+    return await search_documents_batch(index_name, body, qdrant_url, qdrant_api_key)
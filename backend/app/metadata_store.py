@@ -0,0 +1,527 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+METADATA_DB_URL = os.getenv("METADATA_DB_URL", "sqlite:///data/metadata.sqlite3")
+METADATA_CACHE_ITEMS = int(os.getenv("METADATA_CACHE_ITEMS", "10000"))
+METADATA_DB_POOL_SIZE = int(os.getenv("METADATA_DB_POOL_SIZE", "4"))
+
+# Stay well below SQLite's limit on host parameters per statement
+SQL_BATCH = 500
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS indexes (
+        name TEXT PRIMARY KEY,
+        description TEXT NOT NULL DEFAULT '',
+        created_at TEXT NOT NULL,
+        document_count BIGINT NOT NULL DEFAULT 0,
+        storage TEXT NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE IF NOT EXISTS documents (
+        id TEXT PRIMARY KEY,
+        index_name TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        file_type TEXT NOT NULL,
+        size BIGINT NOT NULL,
+        chunks_count BIGINT NOT NULL,
+        uploaded_at TEXT NOT NULL,
+        content_hash TEXT NOT NULL DEFAULT '',
+        chunking TEXT NOT NULL DEFAULT ''
+    )""",
+    # Coordination between workers and replicas, see app.coordination
+    """CREATE TABLE IF NOT EXISTS index_versions (
+        name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS locks (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        status TEXT NOT NULL,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        data TEXT NOT NULL,
+        updated_at DOUBLE PRECISION NOT NULL
+    )""",
+]
+
+# Columns added after the first release, applied to existing databases
+COLUMN_MIGRATIONS = [
+    ("documents", "content_hash", "TEXT NOT NULL DEFAULT ''"),
+    ("documents", "chunking", "TEXT NOT NULL DEFAULT ''"),
+    ("indexes", "storage", "TEXT NOT NULL DEFAULT ''"),
+]
+
+INDEXES = [
+    # Serves per-index listing in upload order and keyset pagination
+    "CREATE INDEX IF NOT EXISTS documents_by_index ON documents (index_name, uploaded_at, id)",
+    # Re-uploads are matched by name (new version) or by content (duplicate)
+    "CREATE INDEX IF NOT EXISTS documents_by_filename ON documents (index_name, filename)",
+    "CREATE INDEX IF NOT EXISTS documents_by_content ON documents (index_name, content_hash)",
+]
+
+INDEX_COLUMNS = ("name", "description", "created_at", "document_count", "storage")
+DOCUMENT_COLUMNS = ("id", "index_name", "filename", "file_type", "size", "chunks_count", "uploaded_at",
+                    "content_hash", "chunking")
+DOCUMENT_LOOKUPS = ("filename", "content_hash")
+JOB_COLUMNS = ("id", "owner", "status", "cancel_requested", "data", "updated_at")
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    return f"{document['uploaded_at']}|{document['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    uploaded_at, separator, doc_id = cursor.rpartition("|")
+    if not separator:
+        raise ValueError("Invalid cursor")
+    return uploaded_at, doc_id
+
+
+class SQLBackend:
+    """Metadata tables over a DB-API connection
+
+    Subclasses provide ``_connection`` and the parameter placeholder. Every
+    statement is written with ``?`` placeholders and translated. The
+    per-index ``document_count`` is kept in the same transaction as the
+    document rows, so listing indexes never counts documents.
+    """
+
+    placeholder = "?"
+    begin = "BEGIN"
+
+    def _sql(self, statement: str) -> str:
+        return statement if self.placeholder == "?" else statement.replace("?", self.placeholder)
+
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        raise NotImplementedError
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Any]:
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(self.begin)
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def _fetch(self, statement: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(self._sql(statement), tuple(params))
+            return cursor.fetchall()
+
+    def create_schema(self):
+        with self._transaction() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            for table, column, definition in COLUMN_MIGRATIONS:
+                cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+                if column not in [description[0] for description in cursor.description]:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            for statement in INDEXES:
+                cursor.execute(statement)
+
+    def close(self):
+        pass
+
+    def list_indexes(self) -> List[Dict[str, Any]]:
+        rows = self._fetch(f"SELECT {', '.join(INDEX_COLUMNS)} FROM indexes ORDER BY created_at, name")
+        return [dict(zip(INDEX_COLUMNS, row)) for row in rows]
+
+    def get_index(self, name: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch(f"SELECT {', '.join(INDEX_COLUMNS)} FROM indexes WHERE name = ?", (name,))
+        return dict(zip(INDEX_COLUMNS, rows[0])) if rows else None
+
+    def add_document(self, document: Dict[str, Any], description: str, created_at: str,
+                     storage: str = "") -> bool:
+        """Insert the document, or replace the row of an earlier version; True if it is new
+
+        ``storage`` is only recorded for a new index, or one that has none yet.
+        """
+        with self._transaction() as cursor:
+            cursor.execute(self._sql(
+                "INSERT INTO indexes (name, description, created_at, document_count, storage) VALUES (?, ?, ?, 0, ?) "
+                "ON CONFLICT (name) DO UPDATE SET storage = excluded.storage WHERE indexes.storage = ''"
+            ), (document["index_name"], description or "", created_at, storage))
+            cursor.execute(self._sql("SELECT 1 FROM documents WHERE id = ?"), (document["id"],))
+            if cursor.fetchall():
+                updated = [column for column in DOCUMENT_COLUMNS if column not in ("id", "index_name")]
+                cursor.execute(self._sql(
+                    f"UPDATE documents SET {', '.join(f'{column} = ?' for column in updated)} WHERE id = ?"
+                ), (*(document[column] for column in updated), document["id"]))
+                return False
+            cursor.execute(self._sql(
+                f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) VALUES ({', '.join('?' * len(DOCUMENT_COLUMNS))})"
+            ), tuple(document[column] for column in DOCUMENT_COLUMNS))
+            cursor.execute(self._sql("UPDATE indexes SET document_count = document_count + 1 WHERE name = ?"),
+                           (document["index_name"],))
+            return True
+
+    def find_document(self, index_name: str, column: str, value: str) -> Optional[Dict[str, Any]]:
+        """Most recently uploaded document in the index with this filename or content hash"""
+        if column not in DOCUMENT_LOOKUPS:
+            raise ValueError(f"Cannot look documents up by {column}")
+        rows = self._fetch(
+            f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WHERE index_name = ? AND {column} = ? "
+            f"ORDER BY uploaded_at DESC LIMIT 1",
+            (index_name, value),
+        )
+        return dict(zip(DOCUMENT_COLUMNS, rows[0])) if rows else None
+
+    def get_documents(self, document_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        for start in range(0, len(document_ids), SQL_BATCH):
+            batch = list(document_ids[start:start + SQL_BATCH])
+            rows = self._fetch(
+                f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WHERE id IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for row in rows:
+                document = dict(zip(DOCUMENT_COLUMNS, row))
+                found[document["id"]] = document
+        return found
+
+    def list_documents(self, index_name: str, limit: int,
+                       after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        columns = ", ".join(DOCUMENT_COLUMNS)
+        if after is None:
+            rows = self._fetch(
+                f"SELECT {columns} FROM documents WHERE index_name = ? ORDER BY uploaded_at, id LIMIT ?",
+                (index_name, limit),
+            )
+        else:
+            # A row-value comparison lets both SQLite and Postgres seek the
+            # (index_name, uploaded_at, id) index instead of scanning the index
+            rows = self._fetch(
+                f"SELECT {columns} FROM documents WHERE index_name = ? AND (uploaded_at, id) > (?, ?) "
+                f"ORDER BY uploaded_at, id LIMIT ?",
+                (index_name, after[0], after[1], limit),
+            )
+        return [dict(zip(DOCUMENT_COLUMNS, row)) for row in rows]
+
+    def delete_documents(self, index_name: str, document_ids: Sequence[str]) -> int:
+        deleted = 0
+        with self._transaction() as cursor:
+            for start in range(0, len(document_ids), SQL_BATCH):
+                batch = list(document_ids[start:start + SQL_BATCH])
+                # Filtering on index_name in SQL tempts SQLite into scanning the
+                # whole index through documents_by_index; match on the key instead
+                cursor.execute(self._sql(
+                    f"SELECT id, index_name FROM documents WHERE id IN ({', '.join('?' * len(batch))})"
+                ), batch)
+                owned = [document_id for document_id, owner in cursor.fetchall() if owner == index_name]
+                if not owned:
+                    continue
+                cursor.execute(self._sql(
+                    f"DELETE FROM documents WHERE id IN ({', '.join('?' * len(owned))})"
+                ), owned)
+                deleted += cursor.rowcount
+            cursor.execute(self._sql("UPDATE indexes SET document_count = document_count - ? WHERE name = ?"),
+                           (deleted, index_name))
+        return deleted
+
+    def delete_index(self, name: str):
+        with self._transaction() as cursor:
+            cursor.execute(self._sql("DELETE FROM documents WHERE index_name = ?"), (name,))
+            cursor.execute(self._sql("DELETE FROM indexes WHERE name = ?"), (name,))
+
+    def bump_index_version(self, name: str) -> int:
+        with self._transaction() as cursor:
+            cursor.execute(self._sql(
+                "INSERT INTO index_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = index_versions.version + 1"
+            ), (name,))
+            cursor.execute(self._sql("SELECT version FROM index_versions WHERE name = ?"), (name,))
+            return cursor.fetchall()[0][0]
+
+    def index_versions(self) -> Dict[str, int]:
+        return dict(self._fetch("SELECT name, version FROM index_versions"))
+
+    def acquire_lock(self, name: str, owner: str, expires_at: float, now: float) -> bool:
+        """Take the lease on ``name`` unless another owner holds one that has not expired"""
+        with self._transaction() as cursor:
+            cursor.execute(self._sql(
+                "INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE locks.expires_at < ?"
+            ), (name, owner, expires_at, now))
+            cursor.execute(self._sql("SELECT owner FROM locks WHERE name = ?"), (name,))
+            return cursor.fetchall()[0][0] == owner
+
+    def renew_locks(self, leases: Sequence[Tuple[str, str]], expires_at: float):
+        with self._transaction() as cursor:
+            for name, owner in leases:
+                cursor.execute(self._sql("UPDATE locks SET expires_at = ? WHERE name = ? AND owner = ?"),
+                               (expires_at, name, owner))
+
+    def release_lock(self, name: str, owner: str):
+        with self._transaction() as cursor:
+            cursor.execute(self._sql("DELETE FROM locks WHERE name = ? AND owner = ?"), (name, owner))
+
+    def save_jobs(self, owner: str, jobs: Sequence[Tuple[str, str, str]], now: float):
+        """Upsert ``(id, status, data)`` job snapshots, keeping any cancel request"""
+        with self._transaction() as cursor:
+            for job_id, status, data in jobs:
+                cursor.execute(self._sql(
+                    "INSERT INTO jobs (id, owner, status, cancel_requested, data, updated_at) VALUES (?, ?, ?, 0, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET status = excluded.status, data = excluded.data, "
+                    "updated_at = excluded.updated_at"
+                ), (job_id, owner, status, data, now))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+        return dict(zip(JOB_COLUMNS, rows[0])) if rows else None
+
+    def request_job_cancel(self, job_id: str) -> bool:
+        with self._transaction() as cursor:
+            cursor.execute(self._sql("UPDATE jobs SET cancel_requested = 1 WHERE id = ?"), (job_id,))
+            return cursor.rowcount > 0
+
+    def cancel_requested_jobs(self, job_ids: Sequence[str]) -> List[str]:
+        found = []
+        for start in range(0, len(job_ids), SQL_BATCH):
+            batch = list(job_ids[start:start + SQL_BATCH])
+            found.extend(row[0] for row in self._fetch(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({', '.join('?' * len(batch))})", batch
+            ))
+        return found
+
+    def prune_jobs(self, statuses: Sequence[str], before: float):
+        with self._transaction() as cursor:
+            cursor.execute(self._sql(
+                f"DELETE FROM jobs WHERE updated_at < ? AND status IN ({', '.join('?' * len(statuses))})"
+            ), (before, *statuses))
+
+
+class SQLiteBackend(SQLBackend):
+    """Single-file backend for local use; one connection serialised by a lock
+
+    Several worker processes may share the file. Transactions take the
+    write lock up front, so one that reads before it writes cannot fail
+    when another process commits in between.
+    """
+
+    begin = "BEGIN IMMEDIATE"
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            yield self._db
+
+    def close(self):
+        self._db.close()
+
+
+class PostgresBackend(SQLBackend):
+    """Shared backend for several workers or replicas, over a small connection pool"""
+
+    placeholder = "%s"
+
+    def __init__(self, url: str, pool_size: int = METADATA_DB_POOL_SIZE):
+        import psycopg
+        self._connect = lambda: psycopg.connect(url, autocommit=True)
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(pool_size, 1))
+
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        with self._slots:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            except BaseException:
+                # The connection may be mid-transaction or broken; do not reuse it
+                connection.close()
+                raise
+            self._pool.put(connection)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def open_backend(url: str = METADATA_DB_URL) -> SQLBackend:
+    """``sqlite:///relative.db``, ``sqlite:////abs/path.db``, ``sqlite://:memory:`` or ``postgresql://...``"""
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite://"):]
+        if path.startswith("/"):
+            path = path[1:]
+        return SQLiteBackend(path or ":memory:")
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresBackend(url)
+    raise ValueError(f"Unsupported METADATA_DB_URL: {url}")
+
+
+class MetadataStore:
+    """Index and document metadata with a write-through in-process cache
+
+    The index table is small and cached whole after the first read; each
+    write updates the database first and then the cache. Documents are
+    cached in a bounded LRU, so memory stays flat however many are stored.
+    Database calls run in a thread so a remote backend never blocks the
+    event loop. Where several processes share the database, the caches of
+    an index are dropped with ``invalidate`` when another one writes to it.
+    """
+
+    def __init__(self, url: str = METADATA_DB_URL, cache_items: int = METADATA_CACHE_ITEMS):
+        self.url = url
+        self.cache_items = cache_items
+        self._backend: Optional[SQLBackend] = None
+        self._backend_lock = threading.Lock()
+        self._indexes: Optional[Dict[str, Dict[str, Any]]] = None
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def backend(self) -> SQLBackend:
+        with self._backend_lock:
+            if self._backend is None:
+                backend = open_backend(self.url)
+                backend.create_schema()
+                self._backend = backend
+            return self._backend
+
+    async def _call(self, method: str, *args):
+        return await asyncio.to_thread(lambda: getattr(self.backend, method)(*args))
+
+    async def execute(self, method: str, *args):
+        """Run a backend method in a thread, for the coordination tables that are not cached here"""
+        return await self._call(method, *args)
+
+    def _remember(self, document: Dict[str, Any]):
+        self._documents[document["id"]] = document
+        self._documents.move_to_end(document["id"])
+        while len(self._documents) > self.cache_items:
+            self._documents.popitem(last=False)
+
+    async def _load_indexes(self) -> Dict[str, Dict[str, Any]]:
+        if self._indexes is None:
+            indexes = await self._call("list_indexes")
+            self._indexes = {index["name"]: index for index in indexes}
+        return self._indexes
+
+    async def list_indexes(self) -> List[Dict[str, Any]]:
+        return [dict(index) for index in (await self._load_indexes()).values()]
+
+    async def get_index(self, name: str) -> Optional[Dict[str, Any]]:
+        index = (await self._load_indexes()).get(name)
+        return dict(index) if index is not None else None
+
+    async def add_document(self, document: Dict[str, Any], description: str, created_at: str,
+                           storage: str = ""):
+        # Load the cache before writing so the write is not counted twice
+        indexes = await self._load_indexes()
+        created = await self._call("add_document", document, description, created_at, storage)
+        index = indexes.get(document["index_name"])
+        if index is None:
+            index = await self._call("get_index", document["index_name"])
+            indexes[document["index_name"]] = index
+        else:
+            if created:
+                index["document_count"] += 1
+            if not index["storage"]:
+                index["storage"] = storage
+        self._remember(dict(document))
+
+    async def find_document(self, index_name: str, column: str, value: str) -> Optional[Dict[str, Any]]:
+        document = await self._call("find_document", index_name, column, value)
+        if document is not None:
+            self._remember(document)
+            document = dict(document)
+        return document
+
+    async def get_documents(self, document_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        missing = []
+        for doc_id in document_ids:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self._documents.move_to_end(doc_id)
+                found[doc_id] = dict(document)
+                self.cache_hits += 1
+            else:
+                missing.append(doc_id)
+        if missing:
+            self.cache_misses += len(missing)
+            for doc_id, document in (await self._call("get_documents", missing)).items():
+                self._remember(document)
+                found[doc_id] = dict(document)
+        return found
+
+    async def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_documents([document_id])).get(document_id)
+
+    async def list_documents(self, index_name: str, limit: int,
+                             cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page in upload order and the cursor for the next page, if any"""
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        after = decode_cursor(cursor) if cursor else None
+        documents = await self._call("list_documents", index_name, limit + 1, after)
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return documents[:limit], next_cursor
+
+    async def delete_documents(self, index_name: str, document_ids: Sequence[str]) -> int:
+        indexes = await self._load_indexes()
+        deleted = await self._call("delete_documents", index_name, list(document_ids))
+        for doc_id in document_ids:
+            self._documents.pop(doc_id, None)
+        if index_name in indexes:
+            indexes[index_name]["document_count"] -= deleted
+        return deleted
+
+    async def delete_index(self, name: str):
+        await self._call("delete_index", name)
+        (await self._load_indexes()).pop(name, None)
+        for doc_id in [doc_id for doc_id, document in self._documents.items() if document["index_name"] == name]:
+            del self._documents[doc_id]
+
+    def invalidate(self, index_name: str):
+        """Forget cached state of ``index_name`` after another process changed it"""
+        self._indexes = None
+        for doc_id in [doc_id for doc_id, document in self._documents.items() if document["index_name"] == index_name]:
+            del self._documents[doc_id]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "backend": self.url.split(":", 1)[0],
+            "cached_indexes": len(self._indexes or {}),
+            "cached_documents": len(self._documents),
+            "cache_capacity": self.cache_items,
+            "document_cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else None,
+        }
+
+    def close(self):
+        with self._backend_lock:
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
@@ -0,0 +1,291 @@
+"""In-process metrics in the Prometheus text format, and per-request stage traces
+
+Counters, gauges and fixed-bucket histograms each take one short lock per
+update, cheap enough to leave on in production; ``METRICS_ENABLED=0``
+turns updates into no-ops. A request sent with the trace header gets a
+``Server-Timing`` response header breaking its time down by stage.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "docmgmt")
+# Requests carrying this header (any value) get a Server-Timing breakdown
+METRICS_TRACE_HEADER = os.getenv("METRICS_TRACE_HEADER", "X-Trace")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_sample(name: str, names: Sequence[str], values: Sequence[str], value: float) -> str:
+    if not names:
+        return f"{name} {value}"
+    labels = ",".join(f'{label}="{escape_label(item)}"' for label, item in zip(names, values))
+    return f"{name}{{{labels}}} {value}"
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def render(self, name: str) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [format_sample(name, self.labels, key, value) for key, value in items]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from ``function`` at scrape time
+
+    ``function`` returns a number, or a mapping of label value tuples to
+    numbers; None leaves the sample out.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in progress while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self, name: str) -> List[str]:
+        if self.function is None:
+            return super().render(name)
+        value = self.function()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        return [format_sample(name, self.labels, key, item) for key, item in items if item is not None]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bucket] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, name: str) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        names = (*self.labels, "le")
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(format_sample(f"{name}_bucket", names, (*key, le), cumulative))
+            lines.append(format_sample(f"{name}_sum", self.labels, key, float(total)))
+            lines.append(format_sample(f"{name}_count", self.labels, key, count))
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics by name; asking for an existing name returns the registered metric"""
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], Any]] = None) -> Gauge:
+        return self._register(Gauge(name, help, labels, function))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            name = f"{self.prefix}_{metric.name}" if self.prefix else metric.name
+            try:
+                samples = metric.render(name)
+            except Exception:
+                # A failing collector must not take the whole scrape down
+                continue
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+render = registry.render
+
+STAGE_SECONDS = histogram("stage_seconds", "Wall time of pipeline stages", ("stage",))
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = histogram("http_request_seconds", "HTTP request latency, to the end of the response body",
+                                 ("method", "route"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests being served")
+
+# Stage name -> [calls, seconds] of the request being traced, if any
+_trace: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("metrics_trace", default=None)
+
+
+def trace_stage(name: str, seconds: float):
+    """Add time to the active request trace without observing a histogram"""
+    trace = _trace.get()
+    if trace is not None:
+        entry = trace.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace_stage(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the block as pipeline stage ``name``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def server_timing(trace: Dict[str, List[float]], total: float) -> str:
+    entries = [f'{name};dur={seconds * 1000:.2f};desc="{calls} call{"" if calls == 1 else "s"}"'
+               for name, (calls, seconds) in trace.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing requests by route template
+
+    Requests carrying ``METRICS_TRACE_HEADER`` collect the stages they pass
+    through and get them back in ``Server-Timing``. The header is written
+    with the response start, so a streamed body's later stages are left out.
+    """
+
+    def __init__(self, app, trace_header: str = METRICS_TRACE_HEADER):
+        self.app = app
+        self.trace_header = trace_header.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traced = any(name == self.trace_header for name, _ in scope.get("headers", ()))
+        trace: Optional[Dict[str, List[float]]] = {} if traced else None
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    timing = server_timing(trace, time.perf_counter() - started)
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", timing.encode())]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _trace.reset(token)
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label so scans cannot blow up cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route)
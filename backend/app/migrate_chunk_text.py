@@ -0,0 +1,82 @@
+"""Move chunk text out of existing collections into the chunk store
+
+For each index, creates the payload indexes deletes and filtered searches
+rely on, copies every point's ``text`` payload into the local chunk store
+and then removes it from the vector store, one scroll page at a time.
+Points that no longer carry text are skipped, so an interrupted run can
+simply be started again.
+
+    python -m app.migrate_chunk_text --qdrant-url http://localhost:6333
+    python -m app.migrate_chunk_text --qdrant-url http://localhost:6333 --index contracts --index memos
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+from .document_api import (chunk_stores, coordinator, ensure_payload_indexes, get_async_qdrant_client, metadata_store,
+                           search_cache)
+
+
+async def migrate_index(qdrant_client, index_name: str, batch_size: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    collection = await qdrant_client.get_collection(index_name)
+    await ensure_payload_indexes(qdrant_client, index_name, collection.get("result", {}).get("payload_schema") or {})
+
+    store = chunk_stores.get(index_name)
+    moved = skipped = 0
+    async for points in qdrant_client.iter_scroll(index_name, batch_size=batch_size,
+                                                  with_payload=["document_id", "text"]):
+        batch = []
+        for point in points:
+            if "text" not in point.payload:
+                continue
+            if not point.payload.get("document_id"):
+                skipped += 1
+                continue
+            batch.append((str(point.id), point.payload["document_id"], point.payload["text"]))
+        if not batch:
+            continue
+        # The text is only dropped from the payload once the store has it
+        await asyncio.to_thread(store.put_many, batch)
+        await qdrant_client.delete_payload_keys(index_name, ["text"], [point_id for point_id, _, _ in batch])
+        moved += len(batch)
+    search_cache.invalidate(index_name)
+    # A running backend caches search results with the old payloads
+    await coordinator.publish(index_name)
+    return {
+        "chunks_moved": moved,
+        "chunks_skipped": skipped,
+        "store": store.stats(),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def main_async(args) -> Dict[str, Any]:
+    qdrant_client = await get_async_qdrant_client(args.qdrant_url, args.api_key)
+    names = args.index or [index["name"] for index in await metadata_store.list_indexes()]
+    report = {}
+    for name in names:
+        try:
+            report[name] = await migrate_index(qdrant_client, name, args.batch_size)
+        except Exception as e:
+            report[name] = {"error": str(e)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-url", required=True, help="vector store URL, as given to the API")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--index", action="append", help="index to migrate; repeatable, defaults to every index")
+    parser.add_argument("--batch-size", type=int, default=1000, help="points per scroll page")
+    args = parser.parse_args()
+    try:
+        print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    finally:
+        metadata_store.close()
+
+
+if __name__ == "__main__":
+    main()
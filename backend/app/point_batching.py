@@ -0,0 +1,144 @@
+import asyncio
+import os
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+INGEST_UPSERT_BATCH_POINTS = int(os.getenv("INGEST_UPSERT_BATCH_POINTS", "1024"))
+INGEST_UPSERT_LINGER_SECONDS = float(os.getenv("INGEST_UPSERT_LINGER_SECONDS", "0.25"))
+INGEST_UPSERT_MAX_IN_FLIGHT = int(os.getenv("INGEST_UPSERT_MAX_IN_FLIGHT", "4"))
+
+
+class DirectPointSink:
+    """Upsert each window of points as soon as it is embedded"""
+
+    def __init__(self, client, collection_name: str, on_written: Optional[Callable[[int], None]] = None,
+                 wait: bool = True):
+        self.client = client
+        self.collection_name = collection_name
+        self.on_written = on_written
+        self.wait = wait
+
+    async def put(self, points: List[Any]):
+        await self.client.upsert(collection_name=self.collection_name, points=points, wait=self.wait)
+        if self.on_written is not None:
+            self.on_written(len(points))
+
+    async def drain(self):
+        pass
+
+    async def abort(self):
+        pass
+
+
+class PointBatcher:
+    """Coalesce points from many documents into large upserts
+
+    A batch is sent once ``batch_points`` are pending or ``linger`` seconds
+    after the first pending point, whichever comes first. ``put`` returns a
+    future that resolves when those points are stored, and waits while
+    ``max_in_flight`` batches are already being sent.
+    """
+
+    def __init__(self, client, collection_name: str,
+                 batch_points: int = INGEST_UPSERT_BATCH_POINTS,
+                 linger: float = INGEST_UPSERT_LINGER_SECONDS,
+                 max_in_flight: int = INGEST_UPSERT_MAX_IN_FLIGHT,
+                 on_written: Optional[Callable[[int], None]] = None,
+                 wait: bool = True):
+        self.client = client
+        self.collection_name = collection_name
+        self.wait = wait
+        self.batch_points = batch_points
+        self.linger = linger
+        self.max_in_flight = max(max_in_flight, 1)
+        self.on_written = on_written
+        self._pending: List[Tuple[List[Any], asyncio.Future]] = []
+        self._pending_points = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self.upserts = 0
+        self.points_written = 0
+
+    async def put(self, points: List[Any]) -> asyncio.Future:
+        while len(self._in_flight) >= self.max_in_flight:
+            await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((points, future))
+        self._pending_points += len(points)
+        if self._pending_points >= self.batch_points:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self.flush)
+        return future
+
+    def discard(self, futures: List[asyncio.Future]):
+        """Drop points that have not been sent yet"""
+        dropped = set(futures)
+        kept = []
+        for points, future in self._pending:
+            if future in dropped:
+                self._pending_points -= len(points)
+                future.cancel()
+            else:
+                kept.append((points, future))
+        self._pending = kept
+
+    def flush(self):
+        """Send everything pending as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_points = self._pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _write(self, batch: List[Tuple[List[Any], asyncio.Future]]):
+        points = [point for group, _ in batch for point in group]
+        try:
+            await self.client.upsert(collection_name=self.collection_name, points=points, wait=self.wait)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.upserts += 1
+        self.points_written += len(points)
+        if self.on_written is not None:
+            self.on_written(len(points))
+        for group, future in batch:
+            if not future.done():
+                future.set_result(len(group))
+
+    async def close(self):
+        """Send the remaining points and wait for every batch in flight"""
+        self.flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+
+class BatchedPointSink:
+    """One document's view of a shared PointBatcher"""
+
+    def __init__(self, batcher: PointBatcher):
+        self.batcher = batcher
+        self.client = batcher.client
+        self.collection_name = batcher.collection_name
+        self.futures: List[asyncio.Future] = []
+
+    async def put(self, points: List[Any]):
+        self.futures.append(await self.batcher.put(points))
+
+    async def drain(self):
+        """Wait until every point of the document is stored"""
+        await asyncio.gather(*self.futures)
+
+    async def abort(self):
+        self.batcher.discard(self.futures)
+        await asyncio.gather(*self.futures, return_exceptions=True)
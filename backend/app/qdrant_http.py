@@ -0,0 +1,570 @@
+import asyncio
+import json
+import os
+import random
+import time
+from enum import Enum
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, Iterator, List, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+QDRANT_POOL_MAXSIZE = int(os.getenv("QDRANT_POOL_MAXSIZE", "16"))
+QDRANT_MAX_CONCURRENCY = int(os.getenv("QDRANT_MAX_CONCURRENCY", "32"))
+QDRANT_UPSERT_BATCH_POINTS = int(os.getenv("QDRANT_UPSERT_BATCH_POINTS", "256"))
+QDRANT_UPSERT_BATCH_BYTES = int(os.getenv("QDRANT_UPSERT_BATCH_BYTES", str(4 * 1024 * 1024)))
+QDRANT_UPSERT_CONCURRENCY = int(os.getenv("QDRANT_UPSERT_CONCURRENCY", "4"))
+QDRANT_UPSERT_MAX_RETRIES = int(os.getenv("QDRANT_UPSERT_MAX_RETRIES", "4"))
+VECTOR_JSON_DECIMALS = int(os.getenv("VECTOR_JSON_DECIMALS", "6"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 502, 503, 504}
+UPSERT_TIMEOUT = 30
+
+QDRANT_REQUEST_SECONDS = metrics.histogram("qdrant_request_seconds", "Qdrant HTTP round trips",
+                                           ("method", "operation"))
+QDRANT_REQUESTS = metrics.counter("qdrant_requests_total", "Qdrant HTTP requests by status",
+                                  ("method", "operation", "status"))
+QDRANT_IN_FLIGHT = metrics.gauge("qdrant_requests_in_flight", "Qdrant HTTP requests awaiting a response")
+
+
+class QdrantCollection:
+    def __init__(self, name):
+        self.name = name
+
+
+class QdrantCollections:
+    """Collections listing that matches the Qdrant client interface"""
+
+    def __init__(self, collections_data):
+        self.collections = [
+            QdrantCollection(col['name'])
+            for col in collections_data.get('result', {}).get('collections', [])
+        ]
+
+
+class Distance(str, Enum):
+    """Vector distances, with the values of qdrant_client.models.Distance"""
+    COSINE = "Cosine"
+    EUCLID = "Euclid"
+    DOT = "Dot"
+    MANHATTAN = "Manhattan"
+
+
+class VectorParams:
+    """Vector config of a new collection that matches the Qdrant client interface"""
+
+    def __init__(self, size: int, distance: Distance, on_disk: Optional[bool] = None):
+        self.size = size
+        self.distance = distance
+        self.on_disk = on_disk
+
+
+class PointStruct:
+    """Point to upsert that matches the Qdrant client interface
+
+    Stands in for the qdrant_client model, whose package takes over half a
+    second to import; slots keep windows of thousands of points small.
+    """
+
+    __slots__ = ("id", "vector", "payload")
+
+    def __init__(self, id: Any, vector: Any, payload: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.vector = vector
+        self.payload = payload
+
+
+class QdrantPoint:
+    """Search hit or scrolled record that matches the Qdrant client interface"""
+
+    def __init__(self, result_data):
+        self.id = result_data['id']
+        self.score = result_data.get('score')
+        self.payload = result_data.get('payload') or {}
+        self.vector = result_data.get('vector')
+
+
+def request_operation(path: str) -> str:
+    """Route template of a Qdrant API path, e.g. /collections/{name}/points/search"""
+    parts = urlsplit(path).path.strip("/").split("/")
+    # Drop any prefix the server is mounted under
+    if "collections" in parts:
+        parts = parts[parts.index("collections"):]
+        if len(parts) > 1:
+            parts[1] = "{name}"
+    return "/" + "/".join(parts)
+
+
+def observe_request(method: str, path: str, status: Any, seconds: float):
+    operation = request_operation(path)
+    QDRANT_REQUEST_SECONDS.observe(seconds, method=method, operation=operation)
+    QDRANT_REQUESTS.inc(method=method, operation=operation, status=status)
+    metrics.trace_stage("qdrant", seconds)
+
+
+def build_session(headers: Dict[str, str], pool_maxsize: int = QDRANT_POOL_MAXSIZE) -> requests.Session:
+    """Create a keep-alive session with a bounded connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers)
+    # elapsed runs from sending the request to parsing the response headers
+    session.hooks["response"].append(lambda response, *args, **kwargs: observe_request(
+        response.request.method, response.request.url,
+        response.status_code, response.elapsed.total_seconds()))
+    return session
+
+
+def compact_vector(vector: Any, decimals: int = VECTOR_JSON_DECIMALS) -> Any:
+    """Round a dense vector so its JSON form is ~10 bytes per dimension instead of ~20
+
+    float32 embeddings carry about 7 significant digits, so rounding to 6
+    decimals loses nothing meaningful for unit-scale vectors. Rounding is
+    done in float64 so the shortest repr of each value is short.
+    """
+    if isinstance(vector, dict) or decimals < 0:
+        return vector
+    return np.round(np.asarray(vector, dtype=np.float64), decimals).tolist()
+
+
+def encode_point(point: Any, decimals: int = VECTOR_JSON_DECIMALS) -> bytes:
+    return json.dumps(
+        {"id": point.id, "vector": compact_vector(point.vector, decimals), "payload": point.payload},
+        separators=(",", ":"), ensure_ascii=False,
+    ).encode()
+
+
+def iter_upsert_bodies(points: Iterable[Any], max_points: int = QDRANT_UPSERT_BATCH_POINTS,
+                       max_bytes: int = QDRANT_UPSERT_BATCH_BYTES) -> Iterator[Tuple[bytes, int]]:
+    """Lazily encode points into upsert bodies bounded by point count and size
+
+    Yields (body, point_count). A single point larger than ``max_bytes`` is
+    sent on its own. Points are only encoded as bodies are consumed, so
+    memory stays proportional to the batches in flight.
+    """
+    encoded: List[bytes] = []
+    size = 0
+    for point in points:
+        item = encode_point(point)
+        if encoded and (len(encoded) >= max_points or size + len(item) + 1 > max_bytes):
+            yield b'{"points":[' + b",".join(encoded) + b"]}", len(encoded)
+            encoded = []
+            size = 0
+        encoded.append(item)
+        size += len(item) + 1
+    if encoded:
+        yield b'{"points":[' + b",".join(encoded) + b"]}", len(encoded)
+
+
+def backoff_delay(attempt: int, response: Any = None, base: float = 0.5, cap: float = 10.0) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After when present"""
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), cap)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def summarize_upserts(results: List[Dict[str, Any]], batches: int, points: int) -> Dict[str, Any]:
+    last = results[-1] if results else {}
+    return {
+        "status": "ok",
+        "result": last.get("result", {"status": "completed"}),
+        "batches": batches,
+        "points": points,
+    }
+
+
+class CustomQdrantClient:
+    """Custom Qdrant client that uses HTTP requests instead of the Qdrant client library
+
+    Only the registry health probe and the benchmarks use this blocking
+    client; the app talks to Qdrant through AsyncCustomQdrantClient.
+    """
+
+    def __init__(self, url: str, api_key: Optional[str] = None, pool_maxsize: int = QDRANT_POOL_MAXSIZE):
+        self.base_url = url.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['api-key'] = api_key
+        self.session = build_session(self.headers, pool_maxsize)
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+    def connection_stats(self) -> Dict[str, Any]:
+        """Count HTTP requests sent and TCP/TLS connections opened by this client"""
+        requests_sent = 0
+        connections_opened = 0
+        seen = set()
+        for adapter in self.session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        return {"requests": requests_sent, "connections_opened": connections_opened}
+
+    def get_collections(self):
+        """Get all collections"""
+        response = self.session.get(f"{self.base_url}/collections", headers=self.headers, timeout=10)
+        response.raise_for_status()
+        return QdrantCollections(response.json())
+
+    def search(self, collection_name: str, query_vector, limit=10):
+        """Search for similar vectors"""
+        payload = {
+            "vector": query_vector,
+            "limit": limit
+        }
+        response = self.session.post(f"{self.base_url}/collections/{collection_name}/points/search",
+                                     headers=self.headers, json=payload, timeout=10)
+        response.raise_for_status()
+        return [QdrantPoint(result) for result in response.json().get('result', [])]
+
+
+def collection_body(vectors_config, hnsw_config: Optional[Dict[str, Any]] = None,
+                    quantization_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Create-collection body; ``on_disk`` vectors keep only quantized copies in RAM"""
+    body: Dict[str, Any] = {
+        "vectors": {
+            "size": vectors_config.size,
+            "distance": vectors_config.distance.value
+        }
+    }
+    if getattr(vectors_config, "on_disk", None) is not None:
+        body["vectors"]["on_disk"] = vectors_config.on_disk
+    if hnsw_config:
+        body["hnsw_config"] = hnsw_config
+    if quantization_config:
+        body["quantization_config"] = quantization_config
+    return body
+
+
+def document_filter(document_ids: Union[str, List[str]]) -> Dict[str, Any]:
+    """Payload filter matching every point of one or many documents"""
+    if isinstance(document_ids, str):
+        return {"must": [{"key": "document_id", "match": {"value": document_ids}}]}
+    return {"must": [{"key": "document_id", "match": {"any": list(document_ids)}}]}
+
+
+def search_batch_body(searches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build search-batch requests from ``{"vector", "limit", "filter", "params"}`` dicts"""
+    body = []
+    for search in searches:
+        request = {
+            "vector": compact_vector(search["vector"]),
+            "limit": search.get("limit", 10),
+            "with_payload": search.get("with_payload", True),
+        }
+        if search.get("filter"):
+            request["filter"] = search["filter"]
+        if search.get("params"):
+            request["params"] = search["params"]
+        body.append(request)
+    return body
+
+
+def payload_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Filter requiring each payload field to equal a value, or any value of a list"""
+    must = []
+    for key, value in filters.items():
+        match = {"any": list(value)} if isinstance(value, (list, tuple)) else {"value": value}
+        must.append({"key": key, "match": match})
+    return {"must": must}
+
+
+def points_selector_payload(points_selector: Union[List[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    """Build a delete body from a list of point ids or a Qdrant filter dict"""
+    if isinstance(points_selector, dict):
+        if "points" in points_selector or "filter" in points_selector:
+            return points_selector
+        return {"filter": points_selector}
+    return {"points": list(points_selector)}
+
+
+class AsyncCustomQdrantClient:
+    """Asyncio variant of CustomQdrantClient built on a pooled httpx.AsyncClient
+
+    At most ``max_concurrency`` requests are in flight per client; further
+    callers wait on a semaphore instead of opening more connections.
+    """
+
+    def __init__(self, url: str, api_key: Optional[str] = None,
+                 pool_maxsize: int = QDRANT_POOL_MAXSIZE,
+                 max_concurrency: int = QDRANT_MAX_CONCURRENCY):
+        self.base_url = url.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['api-key'] = api_key
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            timeout=httpx.Timeout(10.0),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.in_flight = 0
+        self.upsert_retries = 0
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    async def _request(self, method: str, path: str, timeout: float = 10, **kwargs) -> httpx.Response:
+        async with self.semaphore:
+            self.in_flight += 1
+            self.requests_sent += 1
+            started = time.perf_counter()
+            status: Any = "error"
+            try:
+                with QDRANT_IN_FLIGHT.track():
+                    response = await self.client.request(
+                        method, path, timeout=timeout, extensions={"trace": self._trace}, **kwargs
+                    )
+                status = response.status_code
+                return response
+            finally:
+                self.in_flight -= 1
+                observe_request(method, path, status, time.perf_counter() - started)
+
+    def connection_stats(self) -> Dict[str, Any]:
+        """Count HTTP requests sent and TCP connections opened by this client"""
+        return {
+            "requests": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "in_flight": self.in_flight,
+            "upsert_retries": self.upsert_retries,
+        }
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.client.aclose()
+
+    def close(self):
+        """Close pooled connections from any thread"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.loop.create_task(self.aclose())
+        else:
+            asyncio.run_coroutine_threadsafe(self.aclose(), self.loop)
+
+    async def get_collections(self):
+        """Get all collections"""
+        response = await self._request("GET", "/collections")
+        response.raise_for_status()
+        return QdrantCollections(response.json())
+
+    async def get_collection(self, collection_name: str):
+        """Get a specific collection"""
+        response = await self._request("GET", f"/collections/{collection_name}")
+        if response.status_code == 404:
+            raise Exception(f"Collection {collection_name} not found")
+        response.raise_for_status()
+        return response.json()
+
+    async def create_collection(self, collection_name: str, vectors_config,
+                                hnsw_config: Optional[Dict[str, Any]] = None,
+                                quantization_config: Optional[Dict[str, Any]] = None):
+        """Create a new collection"""
+        payload = collection_body(vectors_config, hnsw_config, quantization_config)
+        response = await self._request("PUT", f"/collections/{collection_name}", json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def create_payload_index(self, collection_name: str, field_name: str, field_schema: str = "keyword"):
+        """Index a payload field so filters on it do not scan the collection"""
+        response = await self._request("PUT", f"/collections/{collection_name}/index", params={"wait": "true"},
+                                       json={"field_name": field_name, "field_schema": field_schema}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    async def _upsert_body(self, collection_name: str, body: bytes, wait: bool,
+                           max_retries: int = QDRANT_UPSERT_MAX_RETRIES):
+        # Point ids are fixed before sending, so repeating a batch is idempotent
+        attempt = 0
+        while True:
+            try:
+                response = await self._request("PUT", f"/collections/{collection_name}/points",
+                                               params={"wait": str(wait).lower()},
+                                               content=body, timeout=UPSERT_TIMEOUT)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+                    response.raise_for_status()
+                    return response.json()
+            except httpx.TransportError:
+                if attempt >= max_retries:
+                    raise
+                response = None
+            self.upsert_retries += 1
+            await asyncio.sleep(backoff_delay(attempt, response))
+            attempt += 1
+
+    async def upsert(self, collection_name: str, points, wait: bool = True,
+                     concurrency: int = QDRANT_UPSERT_CONCURRENCY):
+        """Upsert points in size-bounded batches, at most ``concurrency`` in flight
+
+        With ``wait=False`` Qdrant acknowledges each batch once it is
+        written to its log, without waiting for it to be indexed.
+        """
+        bodies = iter_upsert_bodies(points)
+        results = []
+        counts = []
+
+        async def sender():
+            # Workers pull from one lazy generator, so only the batches being
+            # sent are ever encoded
+            for body, count in bodies:
+                counts.append(count)
+                results.append(await self._upsert_body(collection_name, body, wait))
+
+        tasks = [asyncio.ensure_future(sender()) for _ in range(max(concurrency, 1))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other senders before the error reaches the caller, so
+            # no batch lands after the caller has cleaned up the written points
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return summarize_upserts(results, len(counts), sum(counts))
+
+    async def search(self, collection_name: str, query_vector, limit=10,
+                     query_filter: Optional[Dict[str, Any]] = None,
+                     params: Optional[Dict[str, Any]] = None):
+        """Search for similar vectors; ``params`` sets e.g. quantization oversampling and rescoring"""
+        payload = {
+            "vector": query_vector,
+            "limit": limit,
+            "with_payload": True
+        }
+        if query_filter:
+            payload["filter"] = query_filter
+        if params:
+            payload["params"] = params
+        response = await self._request("POST", f"/collections/{collection_name}/points/search", json=payload)
+        response.raise_for_status()
+        return [QdrantPoint(result) for result in response.json().get('result', [])]
+
+    async def retrieve(self, collection_name: str, ids: List[Any],
+                       with_payload: Union[bool, List[str]] = True) -> List[QdrantPoint]:
+        """Fetch points by id; ids that do not exist are left out"""
+        response = await self._request("POST", f"/collections/{collection_name}/points",
+                                       json={"ids": list(ids), "with_payload": with_payload})
+        response.raise_for_status()
+        return [QdrantPoint(point) for point in response.json().get('result', [])]
+
+    async def search_batch(self, collection_name: str, searches: List[Dict[str, Any]]) -> List[List[QdrantPoint]]:
+        """Run many searches in one request; results are returned in request order"""
+        response = await self._request("POST", f"/collections/{collection_name}/points/search/batch",
+                                       json={"searches": search_batch_body(searches)}, timeout=UPSERT_TIMEOUT)
+        response.raise_for_status()
+        return [[QdrantPoint(hit) for hit in hits] for hits in response.json().get('result', [])]
+
+    async def scroll(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                     limit: int = 100, offset: Any = None,
+                     with_payload: Union[bool, List[str]] = True,
+                     with_vectors: bool = False) -> Tuple[List[QdrantPoint], Any]:
+        """Scroll one page of points, returning (points, next_page_offset)"""
+        payload: Dict[str, Any] = {
+            "limit": limit,
+            "with_payload": with_payload,
+            "with_vector": with_vectors
+        }
+        if scroll_filter:
+            payload["filter"] = scroll_filter
+        if offset is not None:
+            payload["offset"] = offset
+        response = await self._request("POST", f"/collections/{collection_name}/points/scroll", json=payload)
+        response.raise_for_status()
+        result = response.json().get('result', {})
+        points = [QdrantPoint(point) for point in result.get('points', [])]
+        return points, result.get('next_page_offset')
+
+    async def iter_scroll(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                          batch_size: int = 1000,
+                          with_payload: Union[bool, List[str]] = False) -> AsyncIterator[List[QdrantPoint]]:
+        """Stream every matching point, one page at a time"""
+        offset = None
+        while True:
+            points, offset = await self.scroll(collection_name, scroll_filter, limit=batch_size,
+                                               offset=offset, with_payload=with_payload)
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    async def iter_scroll_ids(self, collection_name: str, scroll_filter: Optional[Dict[str, Any]] = None,
+                              batch_size: int = 1000) -> AsyncIterator[List[Any]]:
+        """Stream the ids of every matching point, one page at a time"""
+        async for points in self.iter_scroll(collection_name, scroll_filter, batch_size):
+            yield [point.id for point in points]
+
+    async def set_payloads(self, collection_name: str, updates: List[Tuple[Any, Dict[str, Any]]],
+                           wait: bool = True, batch_size: int = 1000):
+        """Merge a payload into each point, many points per batch-update request"""
+        for start in range(0, len(updates), batch_size):
+            operations = [
+                {"set_payload": {"payload": payload, "points": [point_id]}}
+                for point_id, payload in updates[start:start + batch_size]
+            ]
+            response = await self._request(
+                "POST", f"/collections/{collection_name}/points/batch",
+                params={"wait": str(wait).lower()},
+                json={"operations": operations},
+                timeout=UPSERT_TIMEOUT,
+            )
+            response.raise_for_status()
+
+    async def delete_payload_keys(self, collection_name: str, keys: List[str], point_ids: List[Any],
+                                  wait: bool = True):
+        """Remove payload fields from the given points"""
+        response = await self._request(
+            "POST", f"/collections/{collection_name}/points/payload/delete",
+            params={"wait": str(wait).lower()},
+            json={"keys": list(keys), "points": list(point_ids)},
+            timeout=UPSERT_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def delete(self, collection_name: str, points_selector, wait: bool = True):
+        """Delete points by id list or by filter"""
+        response = await self._request(
+            "POST", f"/collections/{collection_name}/points/delete",
+            params={"wait": str(wait).lower()},
+            json=points_selector_payload(points_selector),
+            timeout=30,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def delete_collection(self, collection_name: str):
+        """Delete a collection"""
+        response = await self._request("DELETE", f"/collections/{collection_name}")
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Any
+
+QDRANT_HEALTH_TTL = float(os.getenv("QDRANT_HEALTH_TTL", "30"))
+QDRANT_IDLE_TIMEOUT = float(os.getenv("QDRANT_IDLE_TIMEOUT", "600"))
+QDRANT_MONITOR_INTERVAL = float(os.getenv("QDRANT_MONITOR_INTERVAL", "5"))
+
+# Probes the old per-request path paid before doing any real work:
+# a raw GET /collections plus client.get_collections()
+LEGACY_PROBES_PER_LOOKUP = 2
+
+
+class RegistryEntry:
+    """A pooled client plus its health and usage bookkeeping"""
+
+    def __init__(self, url: str, client):
+        self.url = url
+        self.client = client
+        self.async_client = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = 0.0
+        self.healthy = False
+        self.last_error: Optional[str] = None
+        self.lookups = 0
+        self.foreground_probes = 0
+        self.background_probes = 0
+        self.probe_lock = threading.Lock()
+
+    def clients(self):
+        return [client for client in (self.client, self.async_client) if client is not None]
+
+    def close(self):
+        for client in self.clients():
+            client.close()
+
+    def mark(self, healthy: bool, error: Optional[str] = None):
+        self.healthy = healthy
+        self.last_error = error
+        self.last_checked = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        connection_stats = {"requests": 0, "connections_opened": 0, "upsert_retries": 0}
+        for client in self.clients():
+            client_stats = client.connection_stats()
+            connection_stats["requests"] += client_stats["requests"]
+            connection_stats["connections_opened"] += client_stats["connections_opened"]
+            connection_stats["upsert_retries"] += client_stats.get("upsert_retries", 0)
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+            "age_seconds": round(now - self.created_at, 3),
+            "idle_seconds": round(now - self.last_used, 3),
+            "lookups": self.lookups,
+            "foreground_probes": self.foreground_probes,
+            "background_probes": self.background_probes,
+            "probes_saved": max(LEGACY_PROBES_PER_LOOKUP * self.lookups - self.foreground_probes, 0),
+            "requests": connection_stats["requests"],
+            "connections_opened": connection_stats["connections_opened"],
+            "handshakes_saved": max(connection_stats["requests"] - connection_stats["connections_opened"], 0),
+            "upsert_retries": connection_stats["upsert_retries"],
+        }
+
+
+class QdrantClientRegistry:
+    """Process-wide cache of pooled Qdrant clients keyed by (url, api_key)
+
+    Clients are probed once when created and afterwards health-checked by a
+    background thread every ``health_ttl`` seconds. Entries that have not been
+    used for ``idle_timeout`` seconds are closed and evicted.
+    """
+
+    def __init__(self, client_factory: Callable[[str, Optional[str]], Any],
+                 async_client_factory: Optional[Callable[[str, Optional[str]], Any]] = None,
+                 health_ttl: float = QDRANT_HEALTH_TTL,
+                 idle_timeout: float = QDRANT_IDLE_TIMEOUT,
+                 monitor_interval: float = QDRANT_MONITOR_INTERVAL):
+        self.client_factory = client_factory
+        self.async_client_factory = async_client_factory
+        self.health_ttl = health_ttl
+        self.idle_timeout = idle_timeout
+        self.monitor_interval = monitor_interval
+        self._entries: Dict[Tuple[str, str], RegistryEntry] = {}
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.evictions = 0
+
+    def _lookup(self, url: str, api_key: Optional[str]) -> RegistryEntry:
+        key = (url, api_key or "")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = RegistryEntry(url, self.client_factory(url, api_key))
+                self._entries[key] = entry
+            entry.lookups += 1
+            entry.last_used = time.monotonic()
+        self._ensure_monitor()
+        return entry
+
+    def get(self, url: str, api_key: Optional[str] = None):
+        """Return a healthy pooled client, creating and probing it if needed"""
+        entry = self._lookup(url, api_key)
+        if not entry.healthy:
+            with entry.probe_lock:
+                if not entry.healthy:
+                    entry.foreground_probes += 1
+                    if not self._probe(entry):
+                        raise ConnectionError(entry.last_error)
+        return entry.client
+
+    async def aget(self, url: str, api_key: Optional[str] = None):
+        """Return a healthy pooled async client bound to the running event loop"""
+        entry = self._lookup(url, api_key)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stale = entry.async_client
+            if stale is None or stale.loop is not loop:
+                entry.async_client = self.async_client_factory(url, api_key)
+            client = entry.async_client
+        if stale is not None and stale is not client:
+            stale.close()
+
+        if not entry.healthy:
+            entry.foreground_probes += 1
+            try:
+                await client.get_collections()
+                entry.mark(True)
+            except Exception as e:
+                entry.mark(False, str(e))
+                raise ConnectionError(entry.last_error)
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "endpoints": [entry.stats() for entry in entries],
+            "evictions": self.evictions,
+            "health_ttl": self.health_ttl,
+            "idle_timeout": self.idle_timeout,
+        }
+
+    def close(self):
+        """Stop the monitor and close every pooled client"""
+        self._stop.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+    def _probe(self, entry: RegistryEntry) -> bool:
+        try:
+            entry.client.get_collections()
+            entry.mark(True)
+        except Exception as e:
+            entry.mark(False, str(e))
+        return entry.healthy
+
+    def _ensure_monitor(self):
+        if self._monitor is not None and self._monitor.is_alive():
+            return
+        with self._lock:
+            if self._monitor is not None and self._monitor.is_alive():
+                return
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._run_monitor, name="qdrant-registry-monitor", daemon=True)
+            self._monitor.start()
+
+    def _run_monitor(self):
+        while not self._stop.wait(self.monitor_interval):
+            now = time.monotonic()
+            with self._lock:
+                items = list(self._entries.items())
+            for key, entry in items:
+                if now - entry.last_used > self.idle_timeout:
+                    with self._lock:
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+                            self.evictions += 1
+                    entry.close()
+                elif now - entry.last_checked >= self.health_ttl:
+                    with entry.probe_lock:
+                        entry.background_probes += 1
+                        self._probe(entry)
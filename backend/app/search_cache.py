@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+SEARCH_CACHE_ITEMS = int(os.getenv("SEARCH_CACHE_ITEMS", "1000"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Fold Unicode forms and whitespace; case is kept because embeddings are case sensitive"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class SearchCache:
+    """LRU of search responses with a TTL and per-index invalidation
+
+    Every key embeds the index's current version. Writing to an index bumps
+    the version, so its old entries can no longer be hit and age out of the
+    LRU without a scan. Concurrent misses for the same key share one
+    computation. ``max_items`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_items: int = SEARCH_CACHE_ITEMS, ttl: float = SEARCH_CACHE_TTL_SECONDS):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, index_name: str) -> int:
+        return self._versions.get(index_name, 0)
+
+    def invalidate(self, index_name: str):
+        """Call whenever the points of ``index_name`` change"""
+        self._versions[index_name] = self.version(index_name) + 1
+        self.invalidations += 1
+
+    def key(self, qdrant_url: str, index_name: str, query: str, limit: int,
+            filters: Optional[Dict[str, Any]] = None, mode: Optional[str] = None,
+            offset: int = 0, text: str = "full", api_key: Optional[str] = None) -> Tuple:
+        # Only a digest of the credential is kept, so entries never hold the key itself
+        credential = hashlib.sha256(api_key.encode()).hexdigest() if api_key else None
+        return (qdrant_url, credential, index_name, self.version(index_name), normalize_query(query), limit,
+                json.dumps(filters, sort_keys=True) if filters else None, mode, offset, text)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def lookup(self, key: Tuple) -> Optional[Any]:
+        """``get`` that counts towards the hit rate, for callers that compute misses themselves"""
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: Tuple, value: Any):
+        if self.max_items <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request computing it was cancelled; compute it here instead
+                return await self.get_or_compute(key, compute)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved so a future nobody waited on is not logged
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+        future.set_result(value)
+        self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "items": len(self._entries),
+            "capacity": self.max_items,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
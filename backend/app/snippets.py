@@ -0,0 +1,84 @@
+import html
+import os
+from typing import List, Optional, Set, Tuple
+
+from .lexical_index import PART, TOKEN, tokenize
+
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "240"))
+
+# full returns whole chunks; snippet a window around the query terms;
+# highlight the same window as HTML with the terms in <mark>; none no text
+TEXT_MODES = ("full", "snippet", "highlight", "none")
+ELLIPSIS = "…"
+
+
+def query_terms(query: str) -> Set[str]:
+    return set(tokenize(query))
+
+
+def term_spans(text: str, terms: Set[str]) -> List[Tuple[int, int]]:
+    """Character spans of the tokens of ``text`` that are query terms, in order
+
+    A compound token matches as a whole, or else by those of its parts that
+    are terms, mirroring how the lexical index splits it.
+    """
+    spans = []
+    for match in TOKEN.finditer(text):
+        if match.group().lower() in terms:
+            spans.append(match.span())
+            continue
+        for part in PART.finditer(match.group()):
+            if part.group().lower() in terms:
+                spans.append((match.start() + part.start(), match.start() + part.end()))
+    return spans
+
+
+def best_window(text: str, spans: List[Tuple[int, int]], width: int) -> Tuple[int, int]:
+    """The ``width``-character window holding the most spans, widened to word boundaries"""
+    if len(text) <= width:
+        return 0, len(text)
+    if not spans:
+        start = 0
+    else:
+        best, best_count, last = spans[0][0], 0, 0
+        for first in range(len(spans)):
+            last = max(last, first)
+            while last < len(spans) and spans[last][1] <= spans[first][0] + width:
+                last += 1
+            if last - first > best_count:
+                best, best_count = spans[first][0], last - first
+        # Lead in with some context before the first term
+        start = max(0, min(best - width // 4, len(text) - width))
+    end = min(len(text), start + width)
+    if start > 0:
+        space = text.rfind(" ", 0, start)
+        start = space + 1 if space >= 0 and start - space < 20 else start
+    if end < len(text):
+        space = text.find(" ", end)
+        end = space if 0 <= space and space - end < 20 else end
+    return start, end
+
+
+def snippet(text: str, terms: Set[str], mode: str, width: int = SEARCH_SNIPPET_CHARS) -> Optional[str]:
+    """Text of a hit as the text mode asks for; None for ``none``"""
+    if mode == "full":
+        return text
+    if mode == "none":
+        return None
+    spans = term_spans(text, terms)
+    start, end = best_window(text, spans, width)
+    prefix = ELLIPSIS if start > 0 else ""
+    suffix = ELLIPSIS if end < len(text) else ""
+    if mode == "snippet":
+        return prefix + text[start:end].strip() + suffix
+
+    parts = []
+    position = start
+    for span_start, span_end in spans:
+        if span_start < start or span_end > end:
+            continue
+        parts.append(html.escape(text[position:span_start]))
+        parts.append(f"<mark>{html.escape(text[span_start:span_end])}</mark>")
+        position = span_end
+    parts.append(html.escape(text[position:end]))
+    return prefix + "".join(parts).strip() + suffix
@@ -0,0 +1,129 @@
+"""Cold start report: import time per module, construction time per component and time to ready
+
+``install`` wraps ``__import__`` until the app is ready. Each fresh import
+of an ``app`` module, or of one of ``TRACKED_PACKAGES``, is timed exclusive
+of the timed imports it triggered, so the figures add up to the whole
+import phase. Served at ``GET /startup``.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+# Third-party packages worth seeing in the report; the format parsers and
+# SDKs are expected to be missing until first use
+TRACKED_PACKAGES = (
+    "fastapi", "starlette", "pydantic", "numpy", "httpx", "requests", "psycopg", "tiktoken",
+    "openai", "qdrant_client", "PyPDF2", "openpyxl", "markdown",
+)
+
+T = TypeVar("T")
+
+
+def process_started() -> Optional[float]:
+    """Wall clock time the process started at, from /proc; None where that is not available"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may hold spaces, so count fields after its closing parenthesis
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.time()
+        self.process_started = process_started()
+        self.ready_at: Optional[float] = None
+        self.imports: Dict[str, float] = {}
+        self.components: Dict[str, float] = {}
+        self.lifespan: Dict[str, float] = {}
+        self._original_import: Optional[Callable] = None
+        self._local = threading.local()
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _tracked(self, name: str, globals: Optional[Dict[str, Any]], level: int) -> Optional[str]:
+        if level:
+            package = (globals or {}).get("__package__") or ""
+            base = package.rsplit(".", level - 1)[0] if level > 1 else package
+            name = f"{base}.{name}" if name else base
+        top = name.partition(".")[0]
+        if top == "app":
+            return name
+        return top if top in TRACKED_PACKAGES else None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        import_ = self._original_import or builtins.__import__
+        tracked = self._tracked(name, globals, level)
+        if tracked is None or tracked in self.imports or tracked in sys.modules:
+            return import_(name, globals, locals, fromlist, level)
+
+        # Nested timed imports add their time here, to be taken off the parent's
+        stack: List[float] = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return import_(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.imports[tracked] = elapsed - nested
+
+    def build(self, name: str, factory: Callable[[], T]) -> T:
+        """Construct a component, recording how long that took"""
+        started = time.perf_counter()
+        try:
+            return factory()
+        finally:
+            self.components[name] = time.perf_counter() - started
+
+    @contextmanager
+    def step(self, name: str):
+        """Time a step of the application lifespan startup"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.lifespan[name] = time.perf_counter() - started
+
+    def ready(self):
+        self.ready_at = time.time()
+        self.uninstall()
+
+    def report(self) -> Dict[str, Any]:
+        def ranked(seconds: Dict[str, float]) -> Dict[str, float]:
+            return {name: round(value, 6) for name, value in sorted(seconds.items(), key=lambda item: -item[1])}
+
+        ready = self.ready_at
+        return {
+            "ready": ready is not None,
+            # From the interpreter starting, which includes its own start-up and site imports
+            "process_to_ready_seconds": (round(ready - self.process_started, 3)
+                                         if ready is not None and self.process_started is not None else None),
+            "import_to_ready_seconds": round(ready - self.started, 3) if ready is not None else None,
+            "import_seconds": round(sum(self.imports.values()), 6),
+            "imports": ranked(self.imports),
+            "components": ranked(self.components),
+            "lifespan": ranked(self.lifespan),
+            "deferred_packages": [name for name in TRACKED_PACKAGES if name not in sys.modules],
+        }
+
+
+startup_report = StartupReport()
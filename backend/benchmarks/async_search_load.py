@@ -0,0 +1,85 @@
+"""Show that concurrent searches overlap on the asyncio Qdrant transport
+
+Runs the same burst of concurrent searches against a stub Qdrant server with
+artificial latency, first through the blocking CustomQdrantClient called from
+coroutines (the old behaviour) and then through AsyncCustomQdrantClient.
+
+    python -m benchmarks.async_search_load --concurrency 32 --latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.qdrant_http import CustomQdrantClient, AsyncCustomQdrantClient
+from .stub_qdrant import StubQdrantServer
+
+DIMENSIONS = 8
+
+
+async def seed(url: str, collection: str):
+    client = AsyncCustomQdrantClient(url)
+
+    class VectorsConfig:
+        size = DIMENSIONS
+
+        class distance:
+            value = "Cosine"
+
+    class Point:
+        def __init__(self, i):
+            self.id = i
+            self.vector = [float((i * (j + 1)) % 7) + 1.0 for j in range(DIMENSIONS)]
+            self.payload = {"text": f"point {i}"}
+
+    await client.create_collection(collection, VectorsConfig)
+    await client.upsert(collection, [Point(i) for i in range(100)])
+    await client.aclose()
+
+
+async def run_blocking(url: str, collection: str, concurrency: int):
+    client = CustomQdrantClient(url)
+
+    async def one():
+        client.search(collection, [1.0] * DIMENSIONS, limit=5)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    client.close()
+    return elapsed
+
+
+async def run_async(url: str, collection: str, concurrency: int):
+    client = AsyncCustomQdrantClient(url, pool_maxsize=concurrency, max_concurrency=concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(client.search(collection, [1.0] * DIMENSIONS, limit=5) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {"concurrency": args.concurrency, "latency_seconds": args.latency}
+    with StubQdrantServer() as stub:
+        asyncio.run(seed(stub.url, "load"))
+        stub.state.latency = args.latency
+        for mode, runner in (("blocking", run_blocking), ("async", run_async)):
+            stub.state.max_in_flight = 0
+            elapsed = asyncio.run(runner(stub.url, "load", args.concurrency))
+            results[mode] = {
+                "wall_seconds": round(elapsed, 4),
+                "searches_per_second": round(args.concurrency / elapsed, 1),
+                "max_in_flight_at_server": stub.state.max_in_flight,
+            }
+    results["speedup"] = round(results["blocking"]["wall_seconds"] / results["async"]["wall_seconds"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
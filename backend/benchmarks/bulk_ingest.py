@@ -0,0 +1,114 @@
+"""Compare one /upload per file with a single /upload/bulk archive
+
+Builds a corpus of small text and markdown documents, ingests it against a
+stub Qdrant server both ways through the FastAPI app, and reports docs/sec
+and the Qdrant requests each approach made. ``--local`` runs the same
+comparison offline against the embedded local vector store instead.
+
+    python -m benchmarks.bulk_ingest --files 500 --latency 0.01
+    python -m benchmarks.bulk_ingest --files 500 --local
+"""
+import argparse
+import io
+import json
+import shutil
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from .stub_qdrant import StubQdrantServer
+
+PARAGRAPH = "Quarterly revenue grew while operating costs held flat across all regions. "
+
+
+def corpus(prefix: str, files: int, paragraphs: int):
+    for i in range(files):
+        extension = "md" if i % 2 else "txt"
+        body = "\n\n".join(f"{prefix} document {i} paragraph {p}. " + PARAGRAPH * 4 for p in range(paragraphs))
+        yield f"{prefix}-{i}.{extension}", body.encode()
+
+
+def wait_for(client: TestClient, job_id: str):
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+
+
+def run_sequential(client: TestClient, url: str, files: int, paragraphs: int):
+    metadata = json.dumps({"index_name": "sequential", "chunk_size": 500, "chunk_overlap": 50})
+    started = time.perf_counter()
+    for name, body in corpus("sequential", files, paragraphs):
+        response = client.post("/upload", files={"file": (name, body)},
+                               data={"metadata": metadata, "qdrant_url": url})
+        response.raise_for_status()
+        job = wait_for(client, response.json()["job_id"])
+        assert job["status"] == "succeeded", job
+    return time.perf_counter() - started
+
+
+def run_bulk(client: TestClient, url: str, files: int, paragraphs: int):
+    metadata = json.dumps({"index_name": "bulk", "chunk_size": 500, "chunk_overlap": 50})
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, body in corpus("bulk", files, paragraphs):
+            archive.writestr(f"corpus/{name}", body)
+    started = time.perf_counter()
+    response = client.post("/upload/bulk", files=[("files", ("corpus.zip", buffer.getvalue()))],
+                           data={"metadata": metadata, "qdrant_url": url})
+    response.raise_for_status()
+    job = wait_for(client, response.json()["job_id"])
+    assert job["status"] == "succeeded", job
+    return time.perf_counter() - started, job["result"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.01, help="stub Qdrant latency per request")
+    parser.add_argument("--local", action="store_true", help="use the local vector store instead of the stub")
+    args = parser.parse_args()
+
+    results = {"files": args.files, "vector_store": "local" if args.local else "stub"}
+    with ExitStack() as stack:
+        if args.local:
+            directory = tempfile.mkdtemp(prefix="bulk-vectors-")
+            stack.callback(shutil.rmtree, directory, ignore_errors=True)
+            url, requests = f"local://{directory}", None
+        else:
+            results["latency_seconds"] = args.latency
+            stub = stack.enter_context(StubQdrantServer(latency=args.latency))
+            url, requests = stub.url, stub.state.requests
+        client = stack.enter_context(TestClient(app))
+
+        if requests is not None:
+            requests.clear()
+        elapsed = run_sequential(client, url, args.files, args.paragraphs)
+        results["sequential"] = {
+            "wall_seconds": round(elapsed, 3),
+            "docs_per_second": round(args.files / elapsed, 1),
+        }
+        if requests is not None:
+            results["sequential"]["qdrant_requests"] = dict(requests)
+            requests.clear()
+        elapsed, result = run_bulk(client, url, args.files, args.paragraphs)
+        results["bulk"] = {
+            "wall_seconds": round(elapsed, 3),
+            "docs_per_second": round(args.files / elapsed, 1),
+            "files_failed": result["files_failed"],
+            "upserts": result["upserts"],
+        }
+        if requests is not None:
+            results["bulk"]["qdrant_requests"] = dict(requests)
+    results["speedup"] = round(results["sequential"]["wall_seconds"] / results["bulk"]["wall_seconds"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
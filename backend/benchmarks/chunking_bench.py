@@ -0,0 +1,101 @@
+"""Micro-benchmark: streaming chunker vs the previous chunk_text implementation
+
+    python -m benchmarks.chunking_bench --megabytes 2 8
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from app.chunking import iter_chunks
+
+
+def legacy_chunk_text(text, chunk_size, chunk_overlap, method="recursive"):
+    if method == "recursive":
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = start + chunk_size
+            chunk = text[start:end]
+            chunks.append(chunk)
+            start = end - chunk_overlap
+            if start >= len(text):
+                break
+        return chunks
+    else:
+        sentences = text.split('. ')
+        chunks = []
+        current_chunk = ""
+
+        for sentence in sentences:
+            if len(current_chunk + sentence) < chunk_size:
+                current_chunk += sentence + ". "
+            else:
+                if current_chunk:
+                    chunks.append(current_chunk.strip())
+                current_chunk = sentence + ". "
+
+        if current_chunk:
+            chunks.append(current_chunk.strip())
+
+        return chunks
+
+
+def synthetic_text(megabytes: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["contract", "party", "agreement", "shall", "payment", "SKU-4411", "delivery",
+             "term", "notice", "clause", "liability", "invoice", "the", "of", "and", "to"]
+    paragraphs = []
+    size = 0
+    target = int(megabytes * 1024 * 1024)
+    while size < target:
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 30)))
+            sentences.append(sentence.capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def measure(func):
+    started = time.perf_counter()
+    count = func()
+    seconds = time.perf_counter() - started
+    # Allocation tracing slows Python code down, so time and memory are separate runs
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[2, 8])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for megabytes in args.megabytes:
+        text = synthetic_text(megabytes)
+        for method in ("recursive", "sentence"):
+            legacy = measure(lambda: len(legacy_chunk_text(text, args.chunk_size, args.chunk_overlap, method)))
+            streaming = measure(lambda: sum(1 for _ in iter_chunks(text, args.chunk_size, args.chunk_overlap, method)))
+            results.append({
+                "megabytes": megabytes,
+                "method": method,
+                "legacy": {"chunks": legacy[0], "seconds": round(legacy[1], 4),
+                           "peak_alloc_mb": round(legacy[2] / 2 ** 20, 2)},
+                "streaming": {"chunks": streaming[0], "seconds": round(streaming[1], 4),
+                              "peak_alloc_mb": round(streaming[2] / 2 ** 20, 2),
+                              "mb_per_second": round(megabytes / streaming[1], 1)},
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Deterministic synthetic document corpora in every supported format
+
+Documents are built from a seeded vocabulary, so a given size and seed
+always yields the same text. PDFs are written directly as minimal
+PDF 1.4 with one text stream per page; DOCX and XLSX go through
+python-docx and openpyxl, the same libraries the backend parses them with.
+
+    python -m benchmarks.corpora --size small --output /tmp/corpus
+"""
+import argparse
+import io
+import os
+import random
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+WORDS = (
+    "contract", "party", "agreement", "shall", "payment", "delivery", "term", "notice", "clause",
+    "liability", "invoice", "warranty", "supplier", "customer", "schedule", "renewal", "quarter",
+    "revenue", "forecast", "region", "inventory", "shipment", "audit", "compliance", "budget",
+    "the", "of", "and", "to", "in", "for", "with", "on", "by", "under", "each", "any",
+)
+FORMATS = ("pdf", "docx", "xlsx", "md")
+
+
+class CorpusSize(NamedTuple):
+    documents: int
+    # Pages for PDF, paragraphs for DOCX/MD (as headed sections), rows for XLSX
+    sections: int
+    sentences_per_section: int
+
+
+CORPUS_SIZES: Dict[str, CorpusSize] = {
+    "small": CorpusSize(documents=24, sections=4, sentences_per_section=12),
+    "medium": CorpusSize(documents=120, sections=8, sentences_per_section=16),
+    "large": CorpusSize(documents=480, sections=16, sentences_per_section=20),
+}
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"SKU-{rng.randint(1000, 9999)}")
+    return " ".join(words).capitalize() + "."
+
+
+def sections(rng: random.Random, size: CorpusSize) -> List[str]:
+    return [" ".join(sentence(rng) for _ in range(size.sentences_per_section)) for _ in range(size.sections)]
+
+
+def wrap(text: str, width: int = 90) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def pdf_bytes(pages: List[str]) -> bytes:
+    """A minimal PDF with one Helvetica text stream per page"""
+    font = 3 + 2 * len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>",
+    ]
+    for i, text in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {4 + 2 * i} 0 R >>")
+        operations = ["BT", "/F1 10 Tf", "14 TL", "40 760 Td"]
+        for line in wrap(text):
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            operations.append(f"({escaped}) Tj T*")
+        operations.append("ET")
+        stream = "\n".join(operations)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def docx_bytes(title: str, paragraphs: List[str]) -> bytes:
+    from docx import Document
+
+    document = Document()
+    document.add_heading(title, level=1)
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def xlsx_bytes(rng: random.Random, rows: List[str]) -> bytes:
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["id", "region", "amount", "notes"])
+    for i, notes in enumerate(rows):
+        sheet.append([i, rng.choice(("north", "south", "east", "west")), round(rng.uniform(10, 10000), 2), notes])
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def markdown_bytes(title: str, paragraphs: List[str]) -> bytes:
+    body = [f"# {title}"]
+    for i, paragraph in enumerate(paragraphs):
+        body.append(f"## Section {i + 1}\n\n{paragraph}")
+    return "\n\n".join(body).encode()
+
+
+def document(rng: random.Random, size: CorpusSize, index: int) -> Tuple[str, bytes]:
+    file_format = FORMATS[index % len(FORMATS)]
+    title = f"Document {index}"
+    content = sections(rng, size)
+    if file_format == "pdf":
+        data = pdf_bytes(content)
+    elif file_format == "docx":
+        data = docx_bytes(title, content)
+    elif file_format == "xlsx":
+        # Rows are shorter than pages, so a sheet gets several per section
+        data = xlsx_bytes(rng, [sentence(rng) for _ in range(size.sections * 4)])
+    else:
+        data = markdown_bytes(title, content)
+    return f"doc-{index:05d}.{file_format}", data
+
+
+def generate(size: str, seed: int = 0) -> Iterator[Tuple[str, bytes]]:
+    """Yield ``(filename, bytes)`` for every document of a named corpus size, rotating through the formats"""
+    spec = CORPUS_SIZES[size]
+    rng = random.Random(f"{size}:{seed}")
+    for index in range(spec.documents):
+        yield document(rng, spec, index)
+
+
+def queries(count: int, seed: int = 0) -> List[str]:
+    """Distinct search queries over the corpus vocabulary, so none is answered from the search cache"""
+    rng = random.Random(f"queries:{seed}")
+    found: Dict[str, None] = {}
+    while len(found) < count:
+        words = [rng.choice(WORDS[:25]) for _ in range(rng.randint(2, 5))]
+        if rng.random() < 0.2:
+            words.append(f"SKU-{rng.randint(1000, 9999)}")
+        found.setdefault(" ".join(words))
+    return list(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=sorted(CORPUS_SIZES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="directory to write the documents to")
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    total = 0
+    for name, data in generate(args.size, args.seed):
+        with open(os.path.join(args.output, name), "wb") as f:
+            f.write(data)
+        total += len(data)
+    print(f"{CORPUS_SIZES[args.size].documents} documents, {total} bytes in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measure EmbeddingPipeline throughput against the fake embeddings server
+
+    python -m benchmarks.embedding_throughput --chunks 5000 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import json
+
+import openai
+
+from app.embeddings import EmbeddingPipeline, OpenAIEmbeddingProvider
+from .fake_embeddings import FakeEmbeddingServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-items", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-item-latency", type=float, default=0.0005)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} " + "lorem ipsum dolor sit amet " * (args.chunk_chars // 27) for i in range(args.chunks)]
+    results = []
+    with FakeEmbeddingServer(latency=args.latency, per_item_latency=args.per_item_latency,
+                             failure_rate=args.failure_rate) as fake:
+        for concurrency in args.concurrency:
+            provider = OpenAIEmbeddingProvider(
+                client_factory=lambda: openai.AsyncOpenAI(api_key="fake", base_url=fake.base_url, max_retries=0),
+            )
+            pipeline = EmbeddingPipeline(
+                provider,
+                max_items=args.batch_items,
+                concurrency=concurrency,
+            )
+            fake.state.max_in_flight = 0
+            embeddings, stats = asyncio.run(pipeline.embed(texts))
+            assert embeddings.shape == (len(texts), provider.dimensions)
+            results.append({"concurrency": concurrency, "max_in_flight": fake.state.max_in_flight, **stats.as_dict()})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Local stand-in for the OpenAI embeddings endpoint
+
+Point the backend at it with ``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``.
+Latency and a rate of injected 429/500 failures are configurable so the
+batching, concurrency and retry behaviour can be exercised offline.
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List
+
+import numpy as np
+
+from .stub_qdrant import StubHTTPServer
+
+
+def fake_vector(text: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeEmbeddingState:
+    def __init__(self, dimensions: int = 1536, latency: float = 0.0,
+                 per_item_latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.items = 0
+        self.batch_sizes: List[int] = []
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FakeEmbeddingState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body: Dict, status: int = 200, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        state = self.state
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            return self._reply({"error": {"message": "not found"}}, 404)
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        with state.lock:
+            state.requests += 1
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            fail = state.random.random() < state.failure_rate
+        try:
+            time.sleep(state.latency + state.per_item_latency * len(inputs))
+            if fail:
+                with state.lock:
+                    state.failures += 1
+                status = state.random.choice([429, 500, 503])
+                return self._reply({"error": {"message": "injected failure", "type": "server_error"}},
+                                   status, {"retry-after": "0"})
+
+            dimensions = int(body.get("dimensions") or state.dimensions)
+            encoding_format = body.get("encoding_format", "float")
+            data = []
+            for i, text in enumerate(inputs):
+                vector = fake_vector(text, dimensions)
+                embedding = (base64.b64encode(vector.tobytes()).decode()
+                             if encoding_format == "base64" else vector.tolist())
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(max(1, len(text) // 4) for text in inputs)
+            with state.lock:
+                state.items += len(inputs)
+                state.batch_sizes.append(len(inputs))
+            self._reply({
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+
+class FakeEmbeddingServer:
+    """Run the fake embeddings API on a background thread; use as a context manager"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **options):
+        self.state = FakeEmbeddingState(**options)
+        handler = type("BoundFakeEmbeddingHandler", (FakeEmbeddingHandler,), {"state": self.state})
+        self.server = StubHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeEmbeddingServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeEmbeddingServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeEmbeddingServer(port=args.port, latency=args.latency, failure_rate=args.failure_rate)
+    print(f"Fake embeddings listening on {fake.base_url}")
+    fake.server.serve_forever()
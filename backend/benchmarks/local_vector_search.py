@@ -0,0 +1,124 @@
+"""Measure the embedded local vector store: exact scans against the IVF index
+
+Loads clustered synthetic vectors into a collection in a temporary
+directory, then reports upsert throughput, exact and IVF search latency
+(single and batched), recall@k of IVF against the exact results, and
+filtered search latency. With ``--quantization`` the collection also keeps
+scalar or binary codes, and the report adds oversampled, rescored search
+latency, its recall and the size of the codes against the float32 rows.
+
+    python -m benchmarks.local_vector_search --points 200000 --dimensions 1536
+    python -m benchmarks.local_vector_search --quantization binary --oversampling 3
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.local_vector_store import LocalCollection
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def timed_searches(collection: LocalCollection, queries, limit: int, **search):
+    samples, hits = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits.append(collection.search_batch([{"vector": query, "limit": limit, **search}])[0])
+        samples.append(time.perf_counter() - started)
+    return {"p50_ms": percentile_ms(samples, 50), "p95_ms": percentile_ms(samples, 95)}, hits
+
+
+def recall(approximate_hits, exact_hits) -> float:
+    return round(float(np.mean([
+        len({hit["id"] for hit in approximate} & {hit["id"] for hit in truth}) / max(len(truth), 1)
+        for approximate, truth in zip(approximate_hits, exact_hits)
+    ])), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--quantization", choices=["scalar", "binary"], default=None)
+    parser.add_argument("--oversampling", type=float, default=2.0)
+    args = parser.parse_args()
+    # Baseline searches score the float32 rows even in a quantized collection
+    full = {"params": {"quantization": {"ignore": True}}}
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(args.points // 500, 8), args.dimensions)).astype(np.float32)
+    directory = tempfile.mkdtemp(prefix="local-vectors-")
+    try:
+        # Training is triggered by hand below so the load is timed on its own
+        collection = LocalCollection.create(os.path.join(directory, "bench"), args.dimensions, "Cosine",
+                                            args.quantization)
+        collection.ivf_threshold = args.points + 1
+        collection.nprobe = args.nprobe
+        started = time.perf_counter()
+        for start in range(0, args.points, 1000):
+            count = min(1000, args.points - start)
+            labels = rng.integers(0, len(centers), count)
+            vectors = centers[labels] + 0.5 * rng.normal(size=(count, args.dimensions)).astype(np.float32)
+            collection.upsert([
+                SimpleNamespace(id=start + i, vector=vectors[i], payload={"group": f"g{(start + i) % 100}"})
+                for i in range(count)
+            ])
+        load_seconds = time.perf_counter() - started
+
+        queries = centers[rng.integers(0, len(centers), args.queries)] + \
+            0.5 * rng.normal(size=(args.queries, args.dimensions)).astype(np.float32)
+        exact, exact_hits = timed_searches(collection, queries, args.limit, exact=True, **full)
+        started = time.perf_counter()
+        collection.search_batch([{"vector": query, "limit": args.limit, "exact": True, **full} for query in queries])
+        exact["batch_ms_per_query"] = round((time.perf_counter() - started) * 1000 / args.queries, 3)
+        report = {}
+        if args.quantization:
+            quantized, quantized_hits = timed_searches(
+                collection, queries, args.limit, exact=True,
+                params={"quantization": {"oversampling": args.oversampling, "rescore": True}})
+            quantized["recall"] = recall(quantized_hits, exact_hits)
+            report["quantized"] = {
+                **quantized,
+                "quantization": args.quantization,
+                "oversampling": args.oversampling,
+                "codes_mb": round(collection.count * collection.quantizer.width / 2 ** 20, 1),
+                "vectors_mb": round(collection.count * args.dimensions * 4 / 2 ** 20, 1),
+            }
+
+        started = time.perf_counter()
+        collection.ivf_threshold = 0
+        collection._training = True
+        collection._train()
+        train_seconds = time.perf_counter() - started
+        ivf, ivf_hits = timed_searches(collection, queries, args.limit, **full)
+        ivf["recall"] = recall(ivf_hits, exact_hits)
+        filtered, _ = timed_searches(collection, queries, args.limit,
+                                     filter={"must": [{"key": "group", "match": {"value": "g7"}}]}, **full)
+
+        print(json.dumps({
+            "points": args.points,
+            "dimensions": args.dimensions,
+            "upserts_per_second": round(args.points / load_seconds),
+            "exact": exact,
+            "ivf": {**ivf, "lists": len(collection._ivf.centroids), "nprobe": args.nprobe,
+                    "train_seconds": round(train_seconds, 2)},
+            "filtered_1_percent": filtered,
+            **report,
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
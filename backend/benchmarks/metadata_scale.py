@@ -0,0 +1,85 @@
+"""Exercise the metadata store at scale
+
+Inserts documents into a fresh store, then times index listing, keyset
+page reads deep into the index, point lookups and bulk deletes.
+
+    python -m benchmarks.metadata_scale --documents 1000000
+    python -m benchmarks.metadata_scale --url postgresql://localhost/docs
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app.metadata_store import MetadataStore
+
+
+def timed(run):
+    started = time.perf_counter()
+    result = run()
+    return result, round((time.perf_counter() - started) * 1000, 3)
+
+
+async def main_async(args):
+    store = MetadataStore(args.url)
+    base = datetime(2024, 1, 1)
+    ids = [str(uuid.uuid4()) for _ in range(args.documents)]
+
+    # Bulk-load through the backend directly; per-document writes are timed below
+    started = time.perf_counter()
+    backend = store.backend
+    with backend._transaction() as cursor:
+        cursor.execute(backend._sql("INSERT INTO indexes (name, description, created_at, document_count) "
+                                    "VALUES (?, '', ?, ?)"), ("scale", base.isoformat(), args.documents))
+        for start in range(0, args.documents, 10000):
+            cursor.executemany(backend._sql(
+                "INSERT INTO documents (id, index_name, filename, file_type, size, chunks_count, uploaded_at) "
+                "VALUES (?, 'scale', ?, 'txt', 1000, 10, ?)"
+            ), [(ids[i], f"file-{i}.txt", (base + timedelta(seconds=i)).isoformat())
+                for i in range(start, min(start + 10000, args.documents))])
+    results = {"documents": args.documents, "load_seconds": round(time.perf_counter() - started, 2)}
+
+    async def measure(coro_factory, repeat=20):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await coro_factory()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return {"p50_ms": round(samples[len(samples) // 2], 3), "max_ms": round(samples[-1], 3)}
+
+    results["list_indexes"] = await measure(store.list_indexes)
+    results["first_page"] = await measure(lambda: store.list_documents("scale", 100))
+    deep_cursor = f"{(base + timedelta(seconds=args.documents - 500)).isoformat()}|{ids[args.documents - 500]}"
+    results["deep_page"] = await measure(lambda: store.list_documents("scale", 100, deep_cursor))
+    results["lookup_uncached"] = await measure(
+        lambda: store.get_document(ids[int(time.perf_counter_ns()) % args.documents]))
+    results["lookup_cached"] = await measure(lambda: store.get_document(ids[0]))
+    results["add_document"] = await measure(lambda: store.add_document({
+        "id": str(uuid.uuid4()), "index_name": "scale", "filename": "new.txt", "file_type": "txt",
+        "size": 1, "chunks_count": 1, "uploaded_at": datetime.now().isoformat(),
+    }, "", datetime.now().isoformat()))
+    results["delete_1000_documents"] = await measure(
+        lambda: store.delete_documents("scale", [ids.pop() for _ in range(1000)]), repeat=5)
+    results["index_document_count"] = (await store.get_index("scale"))["document_count"]
+    store.close()
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200000)
+    parser.add_argument("--url", default=None, help="METADATA_DB_URL; defaults to a temporary SQLite file")
+    args = parser.parse_args()
+    if args.url is None:
+        directory = tempfile.mkdtemp()
+        args.url = f"sqlite:///{os.path.join(directory, 'metadata.sqlite3')}"
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
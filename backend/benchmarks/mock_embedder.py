@@ -0,0 +1,54 @@
+"""Compare the vectorized mock embedder with the old per-element random loop
+
+    python -m benchmarks.mock_embedder --texts 2000
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+
+import numpy as np
+
+from app.embeddings import MockEmbeddingProvider
+
+
+def legacy_mock_embeddings(texts):
+    embeddings = []
+    for text in texts:
+        text_hash = hashlib.md5(text.encode()).hexdigest()
+        random.seed(int(text_hash[:8], 16))
+        embeddings.append([random.uniform(-1, 1) for _ in range(1536)])
+    return embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000)
+    args = parser.parse_args()
+    texts = [f"chunk {i} of a synthetic document" for i in range(args.texts)]
+    provider = MockEmbeddingProvider()
+
+    started = time.perf_counter()
+    legacy_mock_embeddings(texts)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matrix = provider.embed_sync(texts)
+    vectorized_seconds = time.perf_counter() - started
+
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert np.array_equal(matrix, provider.embed_sync(texts)), "mock embeddings must be reproducible"
+    print(json.dumps({
+        "texts": args.texts,
+        "legacy_ms_per_text": round(legacy_seconds * 1000 / args.texts, 4),
+        "vectorized_ms_per_text": round(vectorized_seconds * 1000 / args.texts, 4),
+        "speedup": round(legacy_seconds / vectorized_seconds, 1),
+        "mean": float(matrix.mean()),
+        "min": float(matrix.min()),
+        "max": float(matrix.max()),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
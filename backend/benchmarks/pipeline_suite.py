@@ -0,0 +1,329 @@
+"""End-to-end ingestion and search benchmark with a regression gate
+
+Drives the real FastAPI app in-process against the stub Qdrant server and
+the fake embeddings server, over synthetic PDF/DOCX/XLSX/MD corpora (see
+benchmarks.corpora). For every corpus size it reports docs/sec,
+chunks/sec, p50/p95/p99 upload latency (request to finished job) with its
+per-stage breakdown, p50/p95/p99 search latency per mode with the stages
+from Server-Timing, and the peak RSS of the process and its extraction
+workers during each phase.
+
+The JSON result can be stored and passed back as ``--baseline``; the run
+then exits 1 when a throughput, latency or memory figure is worse than
+the baseline by more than ``--threshold``; latencies must also have grown
+by ``--min-delta-ms``. Peak RSS only grows within a process, so compare
+runs of the same sizes.
+
+    python -m benchmarks.pipeline_suite --sizes small medium --output baseline.json
+    python -m benchmarks.pipeline_suite --sizes small medium --baseline baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import corpora
+from .fake_embeddings import FakeEmbeddingServer
+from .stub_qdrant import StubQdrantServer
+
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+JOB_STAGES = ("extract", "embed", "upsert")
+
+# Leaf keys gated against the baseline, and whether larger values are better
+GATED_METRICS = {
+    "docs_per_second": True,
+    "chunks_per_second": True,
+    "queries_per_second": True,
+    "p50": False,
+    "p95": False,
+    "p99": False,
+    "peak_rss_mb": False,
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 and mean in milliseconds, nearest-rank"""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ordered = sorted(samples)
+    pick = lambda fraction: round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3)}
+
+
+def process_tree_rss() -> int:
+    """Resident bytes of this process and every descendant, from /proc
+
+    Falls back to this process's peak from getrusage where /proc is missing.
+    """
+    try:
+        parents: Dict[int, int] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may hold spaces; fields resume after its ")"
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        tree, frontier = {os.getpid()}, [os.getpid()]
+        while frontier:
+            parent = frontier.pop()
+            for pid, ppid in parents.items():
+                if ppid == parent and pid not in tree:
+                    tree.add(pid)
+                    frontier.append(pid)
+        total = 0
+        for pid in tree:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, IndexError, ValueError):
+                continue
+        return total
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Track the peak RSS of the process tree on a background thread, per phase"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, process_tree_rss())
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @contextmanager
+    def phase(self, report: Dict[str, Any]) -> Iterator[None]:
+        """Store the peak seen while the block runs as ``report["peak_rss_mb"]``"""
+        self.peak = process_tree_rss()
+        try:
+            yield
+        finally:
+            self.peak = max(self.peak, process_tree_rss())
+            report["peak_rss_mb"] = round(self.peak / (1024 * 1024), 1)
+
+
+def configure_backend(workdir: str, embeddings_url: str):
+    """Point every store at ``workdir`` and embeddings at the fake server; must run before app is imported"""
+    os.environ.update({
+        "EMBEDDING_PROVIDER": "openai",
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": embeddings_url,
+        "METADATA_DB_URL": f"sqlite:///{workdir}/metadata.sqlite3",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical"),
+        "CHUNK_STORE_PATH": os.path.join(workdir, "chunks"),
+        "LOCAL_VECTOR_PATH": os.path.join(workdir, "vectors"),
+    })
+
+
+def run_ingest(client, url: str, index_name: str, documents: List[Tuple[str, bytes]],
+               concurrency: int) -> Dict[str, Any]:
+    """Upload every document, keeping ``concurrency`` jobs in flight, and time each to completion"""
+    metadata = json.dumps({"index_name": index_name, "chunk_size": 500, "chunk_overlap": 50})
+    pending: Dict[str, float] = {}
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {stage: [] for stage in JOB_STAGES}
+    chunks = 0
+
+    def collect(block: bool):
+        nonlocal chunks
+        while pending:
+            for job_id in list(pending):
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] not in ("succeeded", "failed", "cancelled"):
+                    continue
+                if job["status"] != "succeeded":
+                    raise RuntimeError(f"Ingestion job {job_id} {job['status']}: {job['error']}")
+                request_seconds = pending.pop(job_id)
+                latencies.append(request_seconds + job["queued_seconds"] + job["running_seconds"])
+                for stage in JOB_STAGES:
+                    stages[stage].append(job["stage_seconds"][stage])
+                chunks += job["result"]["chunks_processed"]
+            if not block or not pending:
+                return
+            time.sleep(0.005)
+
+    started = time.perf_counter()
+    for name, data in documents:
+        while len(pending) >= concurrency:
+            collect(block=False)
+            time.sleep(0.005)
+        request_started = time.perf_counter()
+        response = client.post("/upload", files={"file": (name, data)}, data={"metadata": metadata, "qdrant_url": url})
+        response.raise_for_status()
+        pending[response.json()["job_id"]] = time.perf_counter() - request_started
+    collect(block=True)
+    seconds = time.perf_counter() - started
+    return {
+        "documents": len(documents),
+        "bytes": sum(len(data) for _, data in documents),
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "docs_per_second": round(len(documents) / seconds, 2),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "latency_ms": percentiles(latencies),
+        "stage_ms": {stage: percentiles(samples) for stage, samples in stages.items()},
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """``name;dur=ms`` entries of a Server-Timing header, in seconds"""
+    timings = {}
+    for entry in header.split(","):
+        parts = entry.strip().split(";")
+        for part in parts[1:]:
+            if part.startswith("dur="):
+                timings[parts[0]] = float(part[4:]) / 1000
+    return timings
+
+
+def run_search(client, url: str, index_name: str, queries: List[str], mode: str) -> Dict[str, Any]:
+    """Send each query once, sequentially, with tracing on to collect the stage breakdown"""
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    started = time.perf_counter()
+    for query in queries:
+        request_started = time.perf_counter()
+        response = client.post(f"/search/{index_name}", params={"qdrant_url": url},
+                                json={"query": query, "limit": 10, "mode": mode}, headers={"X-Trace": "1"})
+        latencies.append(time.perf_counter() - request_started)
+        response.raise_for_status()
+        for stage, seconds in parse_server_timing(response.headers.get("server-timing", "")).items():
+            if stage != "total":
+                stages.setdefault(stage, []).append(seconds)
+    seconds = time.perf_counter() - started
+    return {
+        "queries": len(queries),
+        "queries_per_second": round(len(queries) / seconds, 1),
+        "latency_ms": percentiles(latencies),
+        "stage_ms": {stage: percentiles(samples) for stage, samples in sorted(stages.items())},
+    }
+
+
+def run_size(client, sampler: RssSampler, url: str, size: str, args) -> Dict[str, Any]:
+    index_name = f"bench-{size}"
+    documents = list(corpora.generate(size, args.seed))
+    report: Dict[str, Any] = {"ingest": {}, "search": {}}
+    with sampler.phase(report["ingest"]):
+        report["ingest"].update(run_ingest(client, url, index_name, documents, args.concurrency))
+    queries = corpora.queries(args.queries * len(args.modes), args.seed)
+    for i, mode in enumerate(args.modes):
+        report["search"][mode] = {}
+        with sampler.phase(report["search"][mode]):
+            report["search"][mode].update(run_search(client, url, index_name,
+                                                     queries[i * args.queries:(i + 1) * args.queries], mode))
+    return report
+
+
+def gated(result: Dict[str, Any], path: Tuple[str, ...] = ()) -> Iterator[Tuple[str, float, bool]]:
+    """Yield ``(path, value, higher_is_better)`` for each gated metric; stage breakdowns are informational"""
+    for key, value in result.items():
+        if key in ("stage_ms", "config"):
+            continue
+        if isinstance(value, dict):
+            yield from gated(value, (*path, key))
+        elif key in GATED_METRICS and isinstance(value, (int, float)):
+            yield ".".join((*path, key)), float(value), GATED_METRICS[key]
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float = 0.0) -> List[Dict[str, Any]]:
+    """Every gated metric present in both runs, flagged when worse than the baseline by more than ``threshold``
+
+    Latencies must also have grown by ``min_delta_ms``, so jitter on
+    millisecond-scale timings is not reported.
+    """
+    previous = {path: value for path, value, _ in gated(baseline)}
+    rows = []
+    for path, value, higher_is_better in gated(result):
+        before = previous.get(path)
+        if not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better else change
+        regression = worse > threshold
+        if ".latency_ms." in path and value - before < min_delta_ms:
+            regression = False
+        rows.append({"metric": path, "baseline": before, "current": value,
+                     "change": round(change, 4), "regression": regression})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(corpora.CORPUS_SIZES), default=["small"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8, help="upload jobs kept in flight")
+    parser.add_argument("--queries", type=int, default=100, help="search queries per mode")
+    parser.add_argument("--modes", nargs="+", choices=SEARCH_MODES, default=list(SEARCH_MODES))
+    parser.add_argument("--qdrant-latency", type=float, default=0.002, help="stub Qdrant latency per request")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="fake embeddings latency per request")
+    parser.add_argument("--embedding-item-latency", type=float, default=0.0001,
+                        help="fake embeddings latency per input text")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative worsening of a gated metric that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="smallest latency increase that can count as a regression")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="pipeline-bench-"))
+        embeddings = stack.enter_context(FakeEmbeddingServer(latency=args.embedding_latency,
+                                                             per_item_latency=args.embedding_item_latency))
+        stub = stack.enter_context(StubQdrantServer(latency=args.qdrant_latency))
+        configure_backend(workdir, embeddings.base_url)
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = stack.enter_context(TestClient(app))
+        sampler = stack.enter_context(RssSampler())
+        result: Dict[str, Any] = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        }
+        for size in args.sizes:
+            result[size] = run_size(client, sampler, stub.url, size, args)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(result, json.load(f), args.threshold, args.min_delta_ms)
+        regressions = [row for row in rows if row["regression"]]
+        for row in rows:
+            marker = "REGRESSION" if row["regression"] else "ok"
+            print(f"{marker:10} {row['metric']}: {row['baseline']:g} -> {row['current']:g} ({row['change']:+.1%})",
+                  file=sys.stderr)
+        print(f"{len(regressions)} of {len(rows)} metrics regressed beyond {args.threshold:.0%}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
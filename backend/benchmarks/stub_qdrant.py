@@ -0,0 +1,308 @@
+"""In-memory stand-in for the subset of the Qdrant REST API the backend uses"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+
+def match_condition(payload: Dict[str, Any], point_id: Any, condition: Dict[str, Any]) -> bool:
+    if "has_id" in condition:
+        return point_id in condition["has_id"]
+    if "must" in condition or "should" in condition or "must_not" in condition:
+        return match_filter(payload, point_id, condition)
+    value = payload.get(condition.get("key"))
+    match = condition.get("match", {})
+    if "value" in match:
+        return value == match["value"]
+    if "any" in match:
+        return value in match["any"]
+    if "except" in match:
+        return value not in match["except"]
+    return False
+
+
+def match_filter(payload: Dict[str, Any], point_id: Any, query_filter: Optional[Dict[str, Any]]) -> bool:
+    if not query_filter:
+        return True
+    must = query_filter.get("must") or []
+    should = query_filter.get("should") or []
+    must_not = query_filter.get("must_not") or []
+    if not all(match_condition(payload, point_id, c) for c in must):
+        return False
+    if should and not any(match_condition(payload, point_id, c) for c in should):
+        return False
+    return not any(match_condition(payload, point_id, c) for c in must_not)
+
+
+class StubCollection:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.points: Dict[Any, Dict[str, Any]] = {}
+        self.payload_indexes: Dict[str, Any] = {}
+
+    def search(self, body: Dict[str, Any]):
+        vector = body["vector"]
+        if isinstance(vector, dict):
+            vector = vector["vector"]
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        candidates = [
+            (point_id, point) for point_id, point in self.points.items()
+            if match_filter(point["payload"], point_id, body.get("filter"))
+        ]
+        if not candidates:
+            return []
+        matrix = np.asarray([point["vector"] for _, point in candidates], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        scores = matrix @ query
+        offset = int(body.get("offset") or 0)
+        limit = int(body.get("limit", 10))
+        order = np.argsort(-scores)[offset:offset + limit]
+        with_payload = body.get("with_payload", False)
+        return [
+            {
+                "id": candidates[i][0],
+                "version": 0,
+                "score": float(scores[i]),
+                "payload": self.select_payload(candidates[i][1]["payload"], with_payload),
+            }
+            for i in order
+        ]
+
+    @staticmethod
+    def select_payload(payload: Dict[str, Any], with_payload: Any):
+        if with_payload is True:
+            return payload
+        if isinstance(with_payload, list):
+            return {key: payload[key] for key in with_payload if key in payload}
+        if isinstance(with_payload, dict) and "include" in with_payload:
+            return {key: payload[key] for key in with_payload["include"] if key in payload}
+        if isinstance(with_payload, dict) and "exclude" in with_payload:
+            return {key: value for key, value in payload.items() if key not in with_payload["exclude"]}
+        return None
+
+
+class StubQdrantState:
+    def __init__(self, latency: float = 0.0, upsert_failure_rate: float = 0.0, api_key: Optional[str] = None):
+        self.latency = latency
+        self.upsert_failure_rate = upsert_failure_rate
+        self.api_key = api_key
+        self.bytes_received = 0
+        self.collections: Dict[str, StubCollection] = {}
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests: Dict[str, int] = {}
+
+
+class StubQdrantHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubQdrantState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, result: Any = None, status: int = 200):
+        body = json.dumps({"result": result, "status": "ok" if status < 400 else "error", "time": 0.0}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        with self.state.lock:
+            self.state.bytes_received += length
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _dispatch(self, method: str):
+        state = self.state
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/")
+        body = self._body() if method in ("PUT", "POST") else {}
+        route = re.sub(r"^/collections/[^/]+", "/collections/{name}", path)
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            key = f"{method} {route}"
+            state.requests[key] = state.requests.get(key, 0) + 1
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+            if state.api_key is not None and self.headers.get("api-key") != state.api_key:
+                return self._reply({"error": "Invalid api-key"}, 403)
+            self._handle(method, path, parse_qs(parsed.query), body)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _handle(self, method: str, path: str, query: Dict[str, Any], body: Dict[str, Any]):
+        state = self.state
+        if path == "/collections" and method == "GET":
+            return self._reply({"collections": [{"name": name} for name in state.collections]})
+
+        match = re.match(r"^/collections/([^/]+)(/.*)?$", path)
+        if not match:
+            return self._reply({"error": "not found"}, 404)
+        name, rest = match.group(1), match.group(2) or ""
+        collection = state.collections.get(name)
+
+        if rest == "" and method == "PUT":
+            with state.lock:
+                state.collections.setdefault(name, StubCollection(body))
+            return self._reply(True)
+        if collection is None:
+            return self._reply({"error": f"Collection {name} not found"}, 404)
+        if rest == "" and method == "GET":
+            return self._reply({
+                "status": "green",
+                "points_count": len(collection.points),
+                "config": {
+                    "params": {"vectors": collection.config.get("vectors")},
+                    "hnsw_config": collection.config.get("hnsw_config") or {},
+                    "quantization_config": collection.config.get("quantization_config"),
+                },
+                "payload_schema": collection.payload_indexes,
+            })
+        if rest == "" and method == "DELETE":
+            with state.lock:
+                state.collections.pop(name, None)
+            return self._reply(True)
+        if rest == "/index" and method == "PUT":
+            with state.lock:
+                collection.payload_indexes[body["field_name"]] = {"data_type": body.get("field_schema", "keyword")}
+            return self._reply({"operation_id": 0, "status": "completed"})
+        if rest == "/points" and method == "PUT":
+            if state.upsert_failure_rate and random.random() < state.upsert_failure_rate:
+                return self._reply({"error": "Service Unavailable (injected)"}, 503)
+            with state.lock:
+                for point in body.get("points", []):
+                    vector = point["vector"]
+                    if isinstance(vector, list):
+                        vector = np.asarray(vector, dtype=np.float32)
+                    collection.points[point["id"]] = {"vector": vector, "payload": point.get("payload") or {}}
+            return self._reply({"operation_id": 0, "status": "completed"})
+        if rest == "/points" and method == "POST":
+            with_payload = body.get("with_payload", True)
+            return self._reply([
+                {"id": pid, "payload": collection.select_payload(collection.points[pid]["payload"], with_payload)}
+                for pid in body.get("ids", []) if pid in collection.points
+            ])
+        if rest == "/points/search" and method == "POST":
+            return self._reply(collection.search(body))
+        if rest == "/points/search/batch" and method == "POST":
+            return self._reply([collection.search(search) for search in body.get("searches", [])])
+        if rest == "/points/scroll" and method == "POST":
+            ids = sorted(
+                (pid for pid, point in collection.points.items()
+                 if match_filter(point["payload"], pid, body.get("filter"))),
+                key=str,
+            )
+            offset = body.get("offset")
+            start = 0 if offset is None else next((i for i, pid in enumerate(ids) if str(pid) >= str(offset)), len(ids))
+            limit = int(body.get("limit", 10))
+            page = ids[start:start + limit]
+            with_payload = body.get("with_payload", True)
+            points = [
+                {"id": pid, "payload": collection.select_payload(collection.points[pid]["payload"], with_payload)}
+                for pid in page
+            ]
+            next_offset = ids[start + limit] if start + limit < len(ids) else None
+            return self._reply({"points": points, "next_page_offset": next_offset})
+        if rest == "/points/batch" and method == "POST":
+            with state.lock:
+                for operation in body.get("operations", []):
+                    update = operation.get("set_payload")
+                    if update is None:
+                        return self._reply({"error": f"Unsupported operation {list(operation)}"}, 400)
+                    for pid in update.get("points", []):
+                        if pid in collection.points:
+                            collection.points[pid]["payload"].update(update["payload"])
+            return self._reply([{"operation_id": 0, "status": "completed"}])
+        if rest == "/points/payload/delete" and method == "POST":
+            with state.lock:
+                for pid in body.get("points", []):
+                    if pid in collection.points:
+                        for key in body.get("keys", []):
+                            collection.points[pid]["payload"].pop(key, None)
+            return self._reply({"operation_id": 0, "status": "completed"})
+        if rest == "/points/delete" and method == "POST":
+            with state.lock:
+                if "points" in body:
+                    for pid in body["points"]:
+                        collection.points.pop(pid, None)
+                else:
+                    for pid in [pid for pid, point in collection.points.items()
+                                if match_filter(point["payload"], pid, body.get("filter"))]:
+                        del collection.points[pid]
+            return self._reply({"operation_id": 0, "status": "completed"})
+        return self._reply({"error": f"Unsupported route {method} {path}"}, 404)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class StubQdrantServer:
+    """Run the stub on a background thread; use as a context manager"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 upsert_failure_rate: float = 0.0, api_key: Optional[str] = None):
+        self.state = StubQdrantState(latency, upsert_failure_rate, api_key)
+        handler = type("BoundStubQdrantHandler", (StubQdrantHandler,), {"state": self.state})
+        self.server = StubHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubQdrantServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubQdrantServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    parser.add_argument("--upsert-failure-rate", type=float, default=0.0, help="fraction of upserts answered with 503")
+    parser.add_argument("--api-key", help="answer requests without this api-key header with 403")
+    args = parser.parse_args()
+    stub = StubQdrantServer(port=args.port, latency=args.latency, upsert_failure_rate=args.upsert_failure_rate,
+                            api_key=args.api_key)
+    print(f"Stub Qdrant listening on {stub.url}")
+    stub.server.serve_forever()
@@ -0,0 +1,154 @@
+"""Compare one JSON body per document with batched, compact, retried upserts
+
+Upserts the points of one large synthetic document to a stub Qdrant server
+running in a separate process, first the old way (a single PUT with full-precision float lists) and then
+through AsyncCustomQdrantClient.upsert. Reports request bytes, points/sec,
+peak Python memory for encoding, and retries absorbed when the stub fails
+a fraction of upserts.
+
+    python -m benchmarks.upsert_throughput --points 20000 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+
+import httpx
+import numpy as np
+
+from app.qdrant_http import AsyncCustomQdrantClient
+
+
+class Point:
+    def __init__(self, id, vector, payload):
+        self.id = id
+        self.vector = vector
+        self.payload = payload
+
+
+class VectorsConfig:
+    def __init__(self, size):
+        self.size = size
+
+    class distance:
+        value = "Cosine"
+
+
+def make_points(count: int, dimensions: int, chunk_chars: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.uniform(-1, 1, size=(count, dimensions)).astype(np.float32)
+    text = ("lorem ipsum dolor sit amet " * (chunk_chars // 27 + 1))[:chunk_chars]
+    return [
+        Point(str(uuid.uuid4()), vectors[i].tolist(), {"document_id": "doc", "chunk_index": i, "text": text})
+        for i in range(count)
+    ]
+
+
+class RequestBytes:
+    """httpx request hook that totals the body bytes sent"""
+
+    def __init__(self):
+        self.total = 0
+
+    async def __call__(self, request: httpx.Request):
+        self.total += int(request.headers.get("content-length", 0))
+
+
+async def legacy_upsert(url: str, collection: str, points, sent: RequestBytes):
+    body = {"points": [{"id": p.id, "vector": p.vector, "payload": p.payload} for p in points]}
+    async with httpx.AsyncClient(base_url=url, timeout=300, event_hooks={"request": [sent]}) as client:
+        response = await client.put(f"/collections/{collection}/points", json=body)
+        response.raise_for_status()
+
+
+async def batched_upsert(url: str, collection: str, points, concurrency: int, sent: RequestBytes):
+    client = AsyncCustomQdrantClient(url)
+    client.client.event_hooks["request"].append(sent)
+    try:
+        await client.upsert(collection, points, concurrency=concurrency)
+        return client.connection_stats()["upsert_retries"]
+    finally:
+        await client.aclose()
+
+
+def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = asyncio.run(run())
+        error = None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, error, elapsed, peak
+
+
+def start_stub(latency: float, failure_rate: float):
+    """Run the stub out of process so its parsing does not skew timings or memory"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_qdrant", "--port", str(port),
+        "--latency", str(latency), "--upsert-failure-rate", str(failure_rate),
+    ], stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{url}/collections")
+            return process, url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("stub Qdrant server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    points = make_points(args.points, args.dimensions, args.chunk_chars)
+    results = {"points": args.points, "dimensions": args.dimensions, "upsert_failure_rate": args.failure_rate}
+    process, url = start_stub(args.latency, args.failure_rate)
+    try:
+        with httpx.Client(base_url=url) as http:
+            for name in ("legacy", "batched"):
+                http.put(f"/collections/{name}", json={"vectors": {"size": args.dimensions, "distance": "Cosine"}})
+
+            for name, run in (
+                ("legacy", lambda sent: legacy_upsert(url, "legacy", points, sent)),
+                ("batched", lambda sent: batched_upsert(url, "batched", points, args.concurrency, sent)),
+            ):
+                sent = RequestBytes()
+                retries, error, elapsed, peak = measure(lambda: run(sent))
+                stored = http.get(f"/collections/{name}").json()["result"]["points_count"]
+                results[name] = {
+                    "error": error,
+                    "points_stored": stored,
+                    "wall_seconds": round(elapsed, 3),
+                    "points_per_second": round(stored / elapsed, 1),
+                    "request_megabytes": round(sent.total / 1e6, 2),
+                    "peak_encode_megabytes": round(peak / 1e6, 1),
+                    "retries": retries,
+                }
+    finally:
+        process.terminate()
+        process.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Search throughput of the backend run with 1, 2, 4, ... uvicorn worker processes
+
+Ingests a synthetic corpus (see benchmarks.corpora) through a server with
+the most workers, which also exercises the coordination between them:
+uploads land on one worker while their jobs are polled through any.
+Then, for each worker count, it starts ``uvicorn --workers N`` on the same
+data and drives it for ``--duration`` seconds from several load-generating
+processes. It reports queries/sec, latency percentiles and the speed-up
+and efficiency against one worker. The search cache is off, so every query
+does its full work.
+
+The default ``lexical`` mode keeps each search inside the workers. The
+``vector`` and ``hybrid`` modes also call the stub Qdrant and fake
+embedding servers in this process, which can cap the throughput. Scaling
+stops at the number of cores, so run it on a machine with several.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --duration 10
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --size medium --mode hybrid --clients 8
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from . import corpora
+from .fake_embeddings import FakeEmbeddingServer
+from .pipeline_suite import SEARCH_MODES, configure_backend, percentiles, run_ingest
+from .stub_qdrant import StubQdrantServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_NAME = "scaling"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def backend_server(workers: int, timeout: float = 60.0) -> Iterator[str]:
+    """Run ``uvicorn app.main:app --workers N`` with the current environment and yield its base URL"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Backend exited with status {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/healthz", timeout=1.0).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Backend did not start in time")
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def load_process(options: Tuple[int, str, List[str], str, float, int]) -> Tuple[int, int, List[float]]:
+    """Send searches from ``threads`` keep-alive connections until the deadline; (ok, errors, latencies)"""
+    port, qdrant_url, queries, mode, duration, threads = options
+    path = f"/search/{INDEX_NAME}?qdrant_url={quote(qdrant_url, safe='')}"
+    deadline = time.perf_counter() + duration
+    results: List[Tuple[int, int, List[float]]] = []
+
+    def run(offset: int):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        ok = errors = 0
+        latencies: List[float] = []
+        i = offset
+        while time.perf_counter() < deadline:
+            body = json.dumps({"query": queries[i % len(queries)], "limit": 10, "mode": mode})
+            i += threads
+            started = time.perf_counter()
+            try:
+                connection.request("POST", path, body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            if response.status == 200:
+                ok += 1
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        connection.close()
+        results.append((ok, errors, latencies))
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (sum(ok for ok, _, _ in results), sum(errors for _, errors, _ in results),
+            [latency for _, _, latencies in results for latency in latencies])
+
+
+def run_load(pool, base_url: str, qdrant_url: str, queries: List[str], args, duration: float) -> Dict[str, Any]:
+    port = int(base_url.rsplit(":", 1)[1])
+    # Each process starts at a different query so they do not move in step
+    jobs = [(port, qdrant_url, queries[i:] + queries[:i], args.mode, duration, args.threads)
+            for i in range(args.clients)]
+    started = time.perf_counter()
+    outcomes = pool.map(load_process, jobs)
+    seconds = time.perf_counter() - started
+    latencies = [latency for _, _, samples in outcomes for latency in samples]
+    ok = sum(count for count, _, _ in outcomes)
+    return {
+        "queries": ok,
+        "errors": sum(errors for _, errors, _ in outcomes),
+        "seconds": round(seconds, 3),
+        "queries_per_second": round(ok / seconds, 1),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="worker counts to measure")
+    parser.add_argument("--size", choices=list(corpora.CORPUS_SIZES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="lexical")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries cycled through")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1),
+                        help="load-generating processes")
+    parser.add_argument("--threads", type=int, default=8, help="connections per load-generating process")
+    parser.add_argument("--concurrency", type=int, default=8, help="upload jobs kept in flight while ingesting")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="worker-scaling-"))
+        embeddings = stack.enter_context(FakeEmbeddingServer())
+        stub = stack.enter_context(StubQdrantServer())
+        configure_backend(workdir, embeddings.base_url)
+        os.environ["SEARCH_CACHE_ITEMS"] = "0"
+        pool = stack.enter_context(multiprocessing.get_context("spawn").Pool(args.clients))
+
+        documents = list(corpora.generate(args.size, args.seed))
+        with backend_server(max(args.workers)) as base_url, httpx.Client(base_url=base_url, timeout=60) as client:
+            ingest = run_ingest(client, stub.url, INDEX_NAME, documents, args.concurrency)
+        queries = corpora.queries(args.queries, args.seed)
+
+        result: Dict[str, Any] = {
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "cpu_count": os.cpu_count(),
+            "ingest": {key: ingest[key] for key in ("documents", "chunks", "seconds", "docs_per_second")},
+            "workers": {},
+        }
+        for workers in args.workers:
+            with backend_server(workers) as base_url:
+                run_load(pool, base_url, stub.url, queries, args, args.warmup)
+                result["workers"][str(workers)] = run_load(pool, base_url, stub.url, queries, args, args.duration)
+            print(f"{workers} workers: {result['workers'][str(workers)]['queries_per_second']} queries/s",
+                  file=sys.stderr)
+
+        single = result["workers"].get("1", {}).get("queries_per_second")
+        for workers, report in result["workers"].items():
+            if single:
+                report["speedup"] = round(report["queries_per_second"] / single, 2)
+                report["efficiency"] = round(report["speedup"] / int(workers), 2)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
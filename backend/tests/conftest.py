@@ -0,0 +1,20 @@
+"""Shared test set-up
+
+The app reads its configuration when it is imported, so every store is
+pointed at a temporary directory and embeddings at a local fake server
+before any test module imports it.
+"""
+import shutil
+import tempfile
+
+from benchmarks.fake_embeddings import FakeEmbeddingServer
+from benchmarks.pipeline_suite import configure_backend
+
+WORKDIR = tempfile.mkdtemp(prefix="backend-tests-")
+EMBEDDINGS = FakeEmbeddingServer().start()
+configure_backend(WORKDIR, EMBEDDINGS.base_url)
+
+
+def pytest_unconfigure(config):
+    EMBEDDINGS.stop()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
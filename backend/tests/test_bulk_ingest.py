@@ -0,0 +1,83 @@
+import io
+import json
+import tarfile
+import time
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.stub_qdrant import StubQdrantServer
+
+MEMBERS = {
+    "notes/alpha.txt": b"Alpha notes about quarterly planning. " * 40,
+    "notes/beta.md": b"# Beta\n\nA short markdown file about release checklists.\n",
+    "broken.pdf": b"this is not a pdf",
+    "gamma.txt": b"Gamma covers onboarding and access requests. " * 30,
+}
+GOOD = {"notes/alpha.txt", "notes/beta.md", "gamma.txt"}
+
+
+def make_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar() -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def wait_for_job(client: TestClient, job_id: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish in {timeout}s")
+
+
+@pytest.mark.parametrize("archive_name, make_archive", [
+    ("corpus.zip", make_zip),
+    ("corpus.tar.gz", make_tar),
+])
+def test_bulk_archive_with_one_bad_member(archive_name, make_archive):
+    index_name = "bulk-" + archive_name.split(".", 1)[1].replace(".", "-")
+    metadata = json.dumps({"index_name": index_name, "chunk_size": 200, "chunk_overlap": 20})
+    with StubQdrantServer() as stub, TestClient(app) as client:
+        response = client.post(
+            "/upload/bulk",
+            files=[("files", (archive_name, make_archive(), "application/octet-stream"))],
+            data={"metadata": metadata, "qdrant_url": stub.url},
+        )
+        assert response.status_code == 200
+        job = wait_for_job(client, response.json()["job_id"])
+
+        assert job["status"] == "succeeded"
+        result = job["result"]
+        statuses = {entry["filename"]: entry for entry in result["files"]}
+        assert set(statuses) == set(MEMBERS)
+        assert statuses["broken.pdf"]["status"] == "failed"
+        assert statuses["broken.pdf"]["error"]
+        assert all(statuses[name]["status"] == "success" for name in GOOD)
+        assert (result["files_total"], result["files_succeeded"], result["files_failed"]) == (4, 3, 1)
+
+        points = stub.state.collections[index_name].points.values()
+        assert len(points) == result["chunks_processed"] > 0
+        assert {point["payload"]["filename"] for point in points} == GOOD
+        # The collection is checked once for the whole batch, and points are coalesced across files
+        assert stub.state.requests["PUT /collections/{name}"] == 1
+        assert stub.state.requests["PUT /collections/{name}/points"] < len(GOOD)
+
+        documents = client.get(f"/indexes/{index_name}/documents").json()
+        assert {document["filename"] for document in documents} == GOOD
@@ -0,0 +1,24 @@
+from app.chunking import iter_chunks, split_recursive
+
+
+def utf8_length(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def test_fixed_windows_fit_when_units_outnumber_characters():
+    text = "漢字かな交じり文😀" * 40
+    pieces = list(split_recursive(text, 16, length=utf8_length))
+    assert "".join(pieces) == text
+    assert all(utf8_length(piece) <= 16 for piece in pieces)
+
+
+def test_character_too_long_for_a_window_still_progresses():
+    pieces = list(split_recursive("😀😀😀", 2, length=utf8_length))
+    assert pieces == ["😀", "😀", "😀"]
+
+
+def test_chunks_of_unbroken_text_stay_within_chunk_size():
+    text = "x" * 1000
+    chunks = list(iter_chunks(text, 100, 10))
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
@@ -0,0 +1,73 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.stub_qdrant import StubQdrantServer
+
+from .conftest import EMBEDDINGS
+from .test_bulk_ingest import wait_for_job
+
+PARAGRAPHS = [f"Dedup paragraph {i} covers clause {i} of the supply agreement. " * 3 for i in range(30)]
+
+
+def upload(client: TestClient, stub: StubQdrantServer, index_name: str, filename: str, paragraphs):
+    metadata = json.dumps({"index_name": index_name, "chunk_size": 200, "chunk_overlap": 0})
+    response = client.post("/upload", files={"file": (filename, "\n\n".join(paragraphs).encode())},
+                           data={"metadata": metadata, "qdrant_url": stub.url})
+    assert response.status_code == 200
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    return job
+
+
+def point_ids(stub: StubQdrantServer, index_name: str):
+    return set(stub.state.collections[index_name].points)
+
+
+def test_identical_upload_is_unchanged_and_embeds_nothing():
+    index_name = "dedup-identical"
+    with StubQdrantServer() as stub, TestClient(app) as client:
+        first = upload(client, stub, index_name, "contract.txt", PARAGRAPHS)
+        before = point_ids(stub, index_name)
+        embedded = EMBEDDINGS.state.items
+        upserts = stub.state.requests["PUT /collections/{name}/points"]
+
+        again = upload(client, stub, index_name, "contract.txt", PARAGRAPHS)
+
+        assert again["result"]["status"] == "unchanged"
+        assert again["result"]["document_id"] == first["result"]["document_id"]
+        assert again["progress"]["chunks_embedded"] == 0
+        assert EMBEDDINGS.state.items == embedded
+        assert stub.state.requests["PUT /collections/{name}/points"] == upserts
+        assert point_ids(stub, index_name) == before
+
+
+def test_edited_document_embeds_only_changed_chunks_and_drops_removed_points():
+    index_name = "dedup-edited"
+    with StubQdrantServer() as stub, TestClient(app) as client:
+        first = upload(client, stub, index_name, "terms.txt", PARAGRAPHS)
+        assert first["result"]["chunks_embedded"] == len(PARAGRAPHS)
+        before = point_ids(stub, index_name)
+
+        inserted = "An inserted paragraph about late payment fees. " * 3
+        edited = PARAGRAPHS[:10] + [inserted] + PARAGRAPHS[10:20] + PARAGRAPHS[21:]
+        embedded = EMBEDDINGS.state.items
+        second = upload(client, stub, index_name, "terms.txt", edited)
+        result = second["result"]
+        after = point_ids(stub, index_name)
+
+        assert result["document_id"] == first["result"]["document_id"]
+        assert (result["chunks_processed"], result["chunks_embedded"], result["chunks_unchanged"],
+                result["chunks_removed"]) == (len(edited), 1, len(edited) - 1, 1)
+        assert EMBEDDINGS.state.items - embedded == 1
+        assert len(after - before) == 1
+        assert len(before - after) == 1
+        assert len(after) == len(edited)
+        # Unchanged chunks keep their point ids and are renumbered in place
+        points = stub.state.collections[index_name].points.values()
+        indexes = sorted(point["payload"]["chunk_index"] for point in points)
+        assert indexes == list(range(len(edited)))
+
+        documents = client.get(f"/indexes/{index_name}/documents").json()
+        assert [(d["filename"], d["chunks_count"]) for d in documents] == [("terms.txt", len(edited))]
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import openai
+import pytest
+
+from app.embeddings import (
+    EmbeddingPipeline,
+    EmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    pack_batches,
+    retry_delay,
+)
+from benchmarks.fake_embeddings import FakeEmbeddingServer, fake_vector
+
+MODEL = "text-embedding-3-small"
+DIMENSIONS = 1536
+
+
+def fake_provider(server: FakeEmbeddingServer) -> OpenAIEmbeddingProvider:
+    return OpenAIEmbeddingProvider(MODEL, client_factory=lambda: openai.AsyncOpenAI(
+        base_url=server.base_url, api_key="test", max_retries=0))
+
+
+def texts(count: int):
+    return [f"chunk {i} " + "word " * (i % 7) for i in range(count)]
+
+
+def test_pack_batches_bounds_items():
+    assert pack_batches([10] * 7, max_items=3, max_tokens=1000) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_pack_batches_bounds_tokens_and_isolates_oversize_texts():
+    assert pack_batches([40, 40, 40, 200, 10], max_items=10, max_tokens=100) == [[0, 1], [2], [3], [4]]
+
+
+def test_retry_delay_honours_retry_after():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "2"}))
+    assert retry_delay(0, error, base=0.5, cap=30) == 2.0
+    assert retry_delay(0, error, base=0.5, cap=1) == 1.0
+
+
+def test_retry_delay_uses_full_jitter_within_the_cap():
+    for attempt in range(8):
+        delay = retry_delay(attempt, base=0.5, cap=4)
+        assert 0 <= delay <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_pipeline_returns_embeddings_in_input_order_within_limits():
+    inputs = texts(50)
+    with FakeEmbeddingServer(dimensions=DIMENSIONS, latency=0.01) as server:
+        pipeline = EmbeddingPipeline(fake_provider(server), max_items=4, concurrency=3)
+        embeddings, stats = asyncio.run(pipeline.embed(inputs))
+
+    assert embeddings.shape == (50, DIMENSIONS)
+    assert np.allclose(embeddings, [fake_vector(text, DIMENSIONS) for text in inputs], atol=1e-6)
+    assert stats.batches == 13
+    assert stats.retries == 0
+    assert max(server.state.batch_sizes) <= 4
+    assert sum(server.state.batch_sizes) == 50
+    assert server.state.max_in_flight <= 3
+
+
+def test_pipeline_retries_transient_failures():
+    inputs = texts(40)
+    with FakeEmbeddingServer(dimensions=DIMENSIONS, failure_rate=0.4, seed=7) as server:
+        pipeline = EmbeddingPipeline(fake_provider(server), max_items=5, concurrency=4, max_retries=20)
+        embeddings, stats = asyncio.run(pipeline.embed(inputs))
+
+    assert np.allclose(embeddings, [fake_vector(text, DIMENSIONS) for text in inputs], atol=1e-6)
+    assert server.state.failures > 0
+    assert stats.retries == server.state.failures
+    assert server.state.requests == stats.batches + stats.retries
+
+
+def test_pipeline_gives_up_after_max_retries():
+    with FakeEmbeddingServer(dimensions=DIMENSIONS, failure_rate=1.0) as server:
+        pipeline = EmbeddingPipeline(fake_provider(server), max_items=10, max_retries=2)
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(pipeline.embed(texts(3)))
+
+    assert server.state.requests == 3
+
+
+def test_pipeline_does_not_retry_permanent_errors():
+    class BrokenProvider(EmbeddingProvider):
+        model = "broken"
+        dimensions = 8
+        calls = 0
+
+        async def embed_batch(self, batch):
+            BrokenProvider.calls += 1
+            raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(EmbeddingPipeline(BrokenProvider(), max_retries=5).embed(["a", "b"]))
+    assert BrokenProvider.calls == 1
@@ -0,0 +1,144 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.local_vector_store import LocalCollection
+from app.qdrant_http import PointStruct
+
+DIMENSIONS = 32
+
+
+def clustered_vectors(count: int, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIMENSIONS))
+    noise = 0.3 * rng.standard_normal((count, DIMENSIONS))
+    return (centers[rng.integers(0, clusters, count)] + noise).astype(np.float32)
+
+
+def points(vectors: np.ndarray, start: int = 0, payload=lambda i: {"n": i}):
+    return [PointStruct(id=start + i, vector=vector, payload=payload(start + i)) for i, vector in enumerate(vectors)]
+
+
+def ids(hits):
+    return [hit["id"] for hit in hits]
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "collection")
+
+
+def test_ivf_top_k_agrees_with_exact_search(directory):
+    LocalCollection.create(directory, DIMENSIONS, "Cosine").close()
+    collection = LocalCollection(directory, ivf_threshold=1000, nprobe=8)
+    vectors = clustered_vectors(5000)
+    collection.upsert(points(vectors))
+    deadline = time.monotonic() + 30
+    while collection.info()["local"]["ivf_lists"] == 0:
+        assert time.monotonic() < deadline, "IVF index was not trained"
+        time.sleep(0.05)
+
+    queries = clustered_vectors(50, seed=1)
+    approximate = collection.search_batch([{"vector": query, "limit": 10} for query in queries])
+    exact = collection.search_batch([{"vector": query, "limit": 10, "exact": True} for query in queries])
+    recall = np.mean([len(set(ids(a)) & set(ids(e))) / 10 for a, e in zip(approximate, exact)])
+    assert recall >= 0.9
+    assert all(hits[0]["score"] >= hits[-1]["score"] for hits in exact)
+    collection.close()
+
+
+def test_scalar_quantized_search_is_rescored_with_float_vectors(directory):
+    collection = LocalCollection.create(directory, DIMENSIONS, "Cosine", quantization="scalar")
+    vectors = clustered_vectors(3000)
+    collection.upsert(points(vectors))
+    queries = clustered_vectors(20, seed=2)
+    rescored = collection.search_batch([{"vector": query, "limit": 10,
+                                         "params": {"quantization": {"oversampling": 3.0}}} for query in queries])
+    exact = collection.search_batch([{"vector": query, "limit": 10,
+                                      "params": {"quantization": {"ignore": True}}} for query in queries])
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query, hits, expected in zip(queries, rescored, exact):
+        assert len(set(ids(hits)) & set(ids(expected))) >= 8
+        scores = normalized[ids(hits)] @ (query / np.linalg.norm(query))
+        assert np.allclose([hit["score"] for hit in hits], scores, atol=1e-5)
+    collection.close()
+
+
+def test_delete_compacts_and_survives_reopen(directory):
+    collection = LocalCollection.create(directory, DIMENSIONS, "Cosine")
+    vectors = clustered_vectors(3000)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection.upsert(points(vectors))
+    collection.delete(list(range(0, 3000, 3)) + list(range(1, 3000, 3)))
+
+    kept = list(range(2, 3000, 3))
+    local = collection.info()["local"]
+    assert (local["generation"], local["rows"], local["dead_rows"]) == (1, len(kept), 0)
+    collection.close()
+
+    reopened = LocalCollection(directory)
+    assert reopened.live == len(kept)
+    assert reopened.retrieve([0, 1, 2, 5]) == [{"id": 2, "payload": {"n": 2}}, {"id": 5, "payload": {"n": 5}}]
+    scrolled, _ = reopened.scroll(limit=10000, with_vectors=True)
+    assert ids(scrolled) == kept
+    assert np.allclose([point["vector"] for point in scrolled], normalized[kept], atol=1e-6)
+    # Renumbered rows still answer searches with the right point
+    for point_id in kept[:20]:
+        hits = reopened.search_batch([{"vector": vectors[point_id], "limit": 1, "exact": True}])[0]
+        assert hits[0]["id"] == point_id
+    reopened.close()
+
+
+def test_must_should_and_must_not_filters(directory):
+    collection = LocalCollection.create(directory, DIMENSIONS, "Cosine")
+    kinds = ["a", "b", "c"]
+    collection.upsert(points(clustered_vectors(60), payload=lambda i: {"kind": kinds[i % 3], "tags": [f"t{i % 4}"]}))
+
+    def matching(query_filter):
+        found, _ = collection.scroll(query_filter, limit=1000)
+        return set(ids(found))
+
+    def key(field, value):
+        return {"key": field, "match": {"value": value}}
+
+    everything = set(range(60))
+    assert matching({"must": [key("kind", "a")]}) == {i for i in everything if i % 3 == 0}
+    assert matching({"should": [key("kind", "a"), key("kind", "b")]}) == {i for i in everything if i % 3 != 2}
+    assert matching({"must_not": [key("kind", "a")]}) == {i for i in everything if i % 3 != 0}
+    assert matching({"must": [key("tags", "t1")], "must_not": [key("kind", "b")]}) == \
+        {i for i in everything if i % 4 == 1 and i % 3 != 1}
+    assert matching({"must": [{"key": "kind", "match": {"any": ["b", "c"]}}]}) == {i for i in everything if i % 3}
+    assert matching({"must": [{"key": "kind", "match": {"except": ["c"]}}]}) == {i for i in everything if i % 3 != 2}
+    assert matching({"must": [{"has_id": [1, 2, 99]}, {"should": [key("kind", "c")]}]}) == {2}
+
+    hits = collection.search_batch([{"vector": clustered_vectors(1, seed=3)[0], "limit": 60,
+                                     "filter": {"must_not": [key("kind", "a")]}}])[0]
+    assert hits and all(hit["payload"]["kind"] != "a" for hit in hits)
+    collection.close()
+
+
+def test_torn_journal_line_is_dropped_on_reopen(directory):
+    collection = LocalCollection.create(directory, DIMENSIONS, "Cosine")
+    vectors = clustered_vectors(20)
+    collection.upsert(points(vectors[:10]))
+    collection.upsert(points(vectors[10:], start=10))
+    collection.close()
+
+    journal = os.path.join(directory, "points.0.log")
+    intact = os.path.getsize(journal)
+    with open(journal, "a") as f:
+        f.write('{"op": "delete", "ids": [1, 2')
+
+    reopened = LocalCollection(directory)
+    assert reopened.live == 20
+    assert os.path.getsize(journal) == intact
+    reopened.upsert(points(clustered_vectors(1, seed=4), start=20))
+    reopened.close()
+
+    again = LocalCollection(directory)
+    assert again.live == 21
+    assert ids(again.retrieve([1, 2, 20])) == [1, 2, 20]
+    again.close()
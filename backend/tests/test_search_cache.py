@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.stub_qdrant import StubQdrantServer
+
+from .test_bulk_ingest import wait_for_job
+
+INDEX = "cached"
+API_KEY = "secret"
+SEARCHES = "POST /collections/{name}/points/search"
+
+
+def upload(client: TestClient, stub: StubQdrantServer, filename: str, text: str) -> str:
+    metadata = json.dumps({"index_name": INDEX, "chunk_size": 200, "chunk_overlap": 0})
+    response = client.post("/upload", files={"file": (filename, text.encode())},
+                           data={"metadata": metadata, "qdrant_url": stub.url, "qdrant_api_key": API_KEY})
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    return job["result"]["document_id"]
+
+
+def search(client: TestClient, stub: StubQdrantServer, api_key=API_KEY):
+    params = {"qdrant_url": stub.url}
+    if api_key is not None:
+        params["qdrant_api_key"] = api_key
+    return client.post(f"/search/{INDEX}", params=params, json={"query": "supply agreement", "limit": 10})
+
+
+def filenames(response):
+    assert response.status_code == 200
+    return {hit["filename"] for hit in response.json()["results"]}
+
+
+@pytest.fixture
+def stub():
+    with StubQdrantServer(api_key=API_KEY) as server:
+        yield server
+
+
+def test_cached_results_are_dropped_after_an_upload_or_delete(stub):
+    with TestClient(app) as client:
+        first = upload(client, stub, "first.txt", "The supply agreement for the first site. " * 10)
+        assert filenames(search(client, stub)) == {"first.txt"}
+        assert filenames(search(client, stub)) == {"first.txt"}
+        assert stub.state.requests[SEARCHES] == 1
+
+        upload(client, stub, "second.txt", "The supply agreement for the second site. " * 10)
+        assert filenames(search(client, stub)) == {"first.txt", "second.txt"}
+        assert stub.state.requests[SEARCHES] == 2
+
+        response = client.delete(f"/indexes/{INDEX}/documents/{first}",
+                                 params={"qdrant_url": stub.url, "qdrant_api_key": API_KEY})
+        assert response.status_code == 200
+        assert filenames(search(client, stub)) == {"second.txt"}
+        assert stub.state.requests[SEARCHES] == 3
+
+
+def test_cached_results_are_not_served_to_other_credentials(stub):
+    with TestClient(app) as client:
+        upload(client, stub, "third.txt", "A supply agreement kept behind an API key. " * 10)
+        assert search(client, stub).status_code == 200
+        searches = stub.state.requests[SEARCHES]
+
+        assert search(client, stub, api_key="wrong").status_code == 400
+        assert search(client, stub, api_key=None).status_code == 400
+        assert search(client, stub).status_code == 200
+        assert stub.state.requests[SEARCHES] == searches
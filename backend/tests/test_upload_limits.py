@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.document_api import BULK_MAX_ARCHIVE_BYTES, MAX_UPLOAD_BYTES, UPLOAD_FORM_OVERHEAD
+from app.main import app
+
+
+@pytest.mark.parametrize("path, limit", [
+    ("/upload", MAX_UPLOAD_BYTES),
+    ("/upload/bulk", BULK_MAX_ARCHIVE_BYTES),
+])
+def test_oversized_content_length_is_refused_before_the_body_is_read(path, limit):
+    received = []
+
+    def body():
+        received.append(True)
+        yield b"x"
+
+    with TestClient(app) as client:
+        response = client.post(path, content=body(), headers={
+            "Content-Type": "multipart/form-data; boundary=limit",
+            "Content-Length": str(limit + UPLOAD_FORM_OVERHEAD + 1),
+        })
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == f"File size exceeds {limit // (1024 * 1024)}MB limit"
+    assert not received
+
+
+@pytest.mark.parametrize("path", ["/upload", "/upload/bulk"])
+def test_content_length_within_the_limit_reaches_the_endpoint(path):
+    with TestClient(app) as client:
+        response = client.post(path, files={"file": ("a.txt", b"hello")}, data={"metadata": "{}"})
+
+    assert response.status_code == 422
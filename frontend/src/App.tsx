@@ -10,6 +10,7 @@ import { Progress } from '@/components/ui/progress'
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8001'
+const MAX_UPLOAD_MB = Number(import.meta.env.VITE_MAX_UPLOAD_MB || 20)
 
 interface IndexInfo {
   name: string
@@ -27,6 +28,22 @@ interface DocumentInfo {
   uploaded_at: string
 }
 
+interface IngestionJob {
+  job_id: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled'
+  stage: string | null
+  progress: {
+    pages_total: number
+    pages_extracted: number
+    chunks_embedded: number
+    points_upserted: number
+  }
+  result: { chunks_processed: number } | null
+  error: string | null
+}
+
+const JOB_POLL_INTERVAL_MS = 1000
+
 interface UploadMetadata {
   index_name: string
   description: string
@@ -40,6 +57,7 @@ function App() {
   const [selectedIndex, setSelectedIndex] = useState<string>('')
   const [documents, setDocuments] = useState<DocumentInfo[]>([])
   const [uploadProgress, setUploadProgress] = useState(0)
+  const [uploadStage, setUploadStage] = useState<string>('')
   const [isUploading, setIsUploading] = useState(false)
   const [error, setError] = useState<string>('')
   const [success, setSuccess] = useState<string>('')
@@ -169,8 +187,8 @@ function App() {
   const handleFileSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0]
     if (file) {
-      if (file.size > 20 * 1024 * 1024) {
-        setError('File size exceeds 20MB limit')
+      if (file.size > MAX_UPLOAD_MB * 1024 * 1024) {
+        setError(`File size exceeds ${MAX_UPLOAD_MB}MB limit`)
         return
       }
       setSelectedFile(file)
@@ -178,6 +196,29 @@ function App() {
     }
   }
 
+  const waitForJob = async (jobId: string): Promise<IngestionJob> => {
+    while (true) {
+      const response = await fetch(`${API_URL}/jobs/${jobId}`)
+      if (!response.ok) {
+        const errorData = await response.json()
+        throw new Error(errorData.detail)
+      }
+      const job: IngestionJob = await response.json()
+      if (job.status === 'succeeded' || job.status === 'failed' || job.status === 'cancelled') {
+        return job
+      }
+      const { pages_total, pages_extracted, points_upserted } = job.progress
+      if (pages_total > 0) {
+        // Extraction dominates; hold back the last few percent until the final upsert
+        setUploadProgress(Math.min(95, Math.round((pages_extracted / pages_total) * 95)))
+      }
+      setUploadStage(job.status === 'queued'
+        ? 'Queued...'
+        : `Processing: ${pages_extracted} pages extracted, ${points_upserted} chunks indexed`)
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+    }
+  }
+
   const handleUpload = async (e: React.FormEvent) => {
     e.preventDefault()
     if (!selectedFile || isUploading || !qdrantConnection.isConnected) return
@@ -187,6 +228,7 @@ function App() {
 
     setIsUploading(true)
     setUploadProgress(0)
+    setUploadStage('Uploading...')
     setError('')
     setSuccess('')
 
@@ -208,8 +250,14 @@ function App() {
       })
 
       if (response.ok) {
-        const result = await response.json()
-        setSuccess(`Document uploaded successfully! Processed ${result.chunks_processed} chunks.`)
+        const { job_id } = await response.json()
+        const job = await waitForJob(job_id)
+        if (job.status !== 'succeeded' || !job.result) {
+          setError(`Upload failed: ${job.error || job.status}`)
+          return
+        }
+        setUploadProgress(100)
+        setSuccess(`Document uploaded successfully! Processed ${job.result.chunks_processed} chunks.`)
         setSelectedFile(null)
         setUploadMetadata({
           index_name: '',
@@ -229,6 +277,7 @@ function App() {
     } finally {
       setIsUploading(false)
       setUploadProgress(0)
+      setUploadStage('')
     }
   }
 
@@ -456,7 +505,7 @@ function App() {
                     {isUploading && (
                       <div className="space-y-2">
                         <div className="flex justify-between text-sm">
-                          <span>Uploading...</span>
+                          <span>{uploadStage}</span>
                           <span>{uploadProgress}%</span>
                         </div>
                         <Progress value={uploadProgress} className="w-full" />